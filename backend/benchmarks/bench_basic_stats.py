@@ -0,0 +1,70 @@
+"""
+Benchmark: StatisticsCalculator.calculate_basic_stats (NumPy engine) vs the
+previous pure-Python `statistics` implementation.
+
+Usage (from backend/):
+    python -m benchmarks.bench_basic_stats
+    python -m benchmarks.bench_basic_stats --sizes 1000 100000 10000000
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from statistics_calculator import StatisticsCalculator  # noqa: E402
+
+
+def legacy_basic_stats(data):
+    numeric_data = [float(x) for x in data if x is not None]
+    result = {
+        "mean": statistics.mean(numeric_data),
+        "median": statistics.median(numeric_data),
+        "range": max(numeric_data) - min(numeric_data),
+        "min": min(numeric_data),
+        "max": max(numeric_data),
+        "count": len(numeric_data)
+    }
+    result["mode"] = statistics.mode(numeric_data)
+    if len(numeric_data) > 1:
+        result["variance"] = statistics.variance(numeric_data)
+        result["stdDev"] = statistics.stdev(numeric_data)
+    return result
+
+
+def best_of(fn, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-above", type=int, default=None,
+                        help="no medir la versión anterior por encima de este tamaño")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'n':>12} {'legacy (s)':>12} {'numpy (s)':>12} {'speedup':>10}")
+    for n in args.sizes:
+        # Rounded values so the mode is meaningful, as in classroom data
+        data = np.round(rng.normal(50, 15, n), 1).tolist()
+        new = best_of(StatisticsCalculator.calculate_basic_stats, data, args.repeat)
+        if args.skip_legacy_above is not None and n > args.skip_legacy_above:
+            print(f"{n:>12} {'-':>12} {new:>12.4f} {'-':>10}")
+            continue
+        old = best_of(legacy_basic_stats, data, 1 if n >= 1_000_000 else args.repeat)
+        print(f"{n:>12} {old:>12.4f} {new:>12.4f} {old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
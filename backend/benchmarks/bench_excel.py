@@ -0,0 +1,82 @@
+"""
+Benchmark: /api/upload/excel readers on generated workbooks of 10k, 100k and
+1M cells (3 sheets, 10 columns each).
+
+Compares the previous path (pandas.read_excel of the whole first sheet +
+to_dict) with the streaming zip/XML reader (excel_reader.py), both for the full sheet and
+with sheet/column/row projection.
+
+Usage (from backend/):
+    python -m benchmarks.bench_excel
+    python -m benchmarks.bench_excel --cells 10000 100000
+"""
+import argparse
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from excel_reader import read_excel_projection  # noqa: E402
+
+COLUMNS = 10
+SHEETS = 3
+
+
+def build_workbook(cells: int) -> bytes:
+    rows = max(1, cells // COLUMNS)
+    rng = np.random.default_rng(0)
+    wb = Workbook(write_only=True)
+    for s in range(SHEETS):
+        ws = wb.create_sheet(f"Hoja{s + 1}")
+        ws.append([f"col{c}" for c in range(COLUMNS)])
+        values = np.round(rng.normal(50, 15, (rows, COLUMNS)), 2).tolist()
+        for i, row in enumerate(values):
+            row[0] = f"estudiante_{i}"
+            ws.append(row)
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def legacy(contents: bytes):
+    df = pd.read_excel(BytesIO(contents))
+    return df.to_dict(orient='records')
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'cells/sheet':>12} {'pandas':>10} {'streaming':>10} {'2 cols':>10} {'sheet 3':>10} {'1k rows':>10}")
+    for cells in args.cells:
+        contents = build_workbook(cells)
+        repeat = 1 if cells >= 1_000_000 else args.repeat
+        results = [
+            timed(lambda: legacy(contents), repeat),
+            timed(lambda: read_excel_projection(contents), repeat),
+            timed(lambda: read_excel_projection(contents, columns=["col0", "col3"]), repeat),
+            timed(lambda: read_excel_projection(contents, sheet="Hoja3", columns=["col1"]), repeat),
+            timed(lambda: read_excel_projection(contents, row_start=0, row_limit=1000), repeat),
+        ]
+        print(f"{cells:>12} " + " ".join(f"{r:>9.3f}s" for r in results))
+
+
+if __name__ == "__main__":
+    main()
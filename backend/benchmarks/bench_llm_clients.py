@@ -0,0 +1,158 @@
+"""
+Benchmark: per-message overhead of the Profe Marce chat path against a local
+stub LLM server (OpenAI-style /v1/chat/completions that answers at once).
+
+Compares the previous path (system prompt rebuilt and a new LlmChat with its
+own HTTP client per message) with the shared path (precomputed prompt and a
+new LlmChat per message over one shared keep-alive HTTP client, as litellm's
+session gives the real one). The stub LlmChat stands in for
+emergentintegrations, which is not needed here.
+
+Usage (from backend/):
+    python -m benchmarks.bench_llm_clients
+    python -m benchmarks.bench_llm_clients --messages 2000 --concurrency 1 40
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deepseek_service import SYSTEM_MESSAGES, _system_message  # noqa: E402
+from llm_clients import LlmClients  # noqa: E402
+
+REPLY = json.dumps({"choices": [{"message": {"role": "assistant", "content": "Hola"}}]}).encode()
+
+
+class StubServer:
+    connections = 0
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    StubServer.connections += 1
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(REPLY)).encode() + b"\r\n\r\n" + REPLY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+class UserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubLlmChat:
+    """LlmChat look-alike: one SDK/HTTP client per instance, message history kept in memory."""
+    base_url = ""
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.session_id = session_id
+        self.messages = [{"role": "system", "content": system_message}]
+        self.http = self._client()
+        self.model = None
+
+    def _client(self):
+        return httpx.AsyncClient(base_url=self.base_url)
+
+    def with_model(self, provider, model):
+        self.model = model
+        return self
+
+    async def send_message(self, message):
+        self.messages.append({"role": "user", "content": message.text})
+        response = await self.http.post("/v1/chat/completions", json={"model": self.model, "messages": self.messages})
+        return response.json()["choices"][0]["message"]["content"]
+
+
+class SharedStubLlmChat(StubLlmChat):
+    """Same client, sending through one shared HTTP client like litellm.aclient_session."""
+    session = None
+
+    def _client(self):
+        return self.session
+
+
+async def legacy(level: str, text: str, session_id: str):
+    chat = StubLlmChat(api_key="k", session_id=session_id, system_message=_system_message(level))
+    chat.with_model("openai", "gpt-5.1")
+    try:
+        return await chat.send_message(UserMessage(text))
+    finally:
+        await chat.http.aclose()
+
+
+def shared_sender(clients: LlmClients):
+    async def send(level: str, text: str, session_id: str):
+        async with clients.client(level, SYSTEM_MESSAGES[level], session_id) as chat:
+            return await chat.send_message(UserMessage(text))
+    return send
+
+
+async def run(send, messages: int, concurrency: int):
+    levels = list(SYSTEM_MESSAGES)
+    latencies = []
+    queue = iter(range(messages))
+
+    async def worker():
+        for i in queue:
+            start = time.perf_counter()
+            await send(levels[i % len(levels)], f"¿Qué es la mediana? ({i})", f"s{i % 40}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def describe(elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    return f"{statistics.mean(latencies) * 1e3:>8.3f}ms {p95 * 1e3:>8.3f}ms {len(latencies) / elapsed:>9.0f}/s"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 40])
+    args = parser.parse_args()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    StubLlmChat.base_url = f"http://{host}:{port}"
+
+    print(f"{'path':>8} {'conc':>5} {'mean':>10} {'p95':>10} {'throughput':>11} {'connections':>12}")
+    SharedStubLlmChat.session = httpx.AsyncClient(base_url=StubLlmChat.base_url)
+    async with server:
+        for concurrency in args.concurrency:
+            clients = LlmClients(SharedStubLlmChat, "k")
+            for name, send in (("legacy", legacy), ("shared", shared_sender(clients))):
+                StubServer.connections = 0
+                await run(send, min(50, args.messages), concurrency)  # warm-up
+                StubServer.connections = 0
+                elapsed, latencies = await run(send, args.messages, concurrency)
+                print(f"{name:>8} {concurrency:>5} {describe(elapsed, latencies)} {StubServer.connections:>12}")
+            print(f"{'':>8} {clients.metrics()['created']} clients created over one shared session")
+    await SharedStubLlmChat.session.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,469 @@
+"""
+Load suite: scripted student traffic against the whole FastAPI app, with
+local stand-ins for MongoDB and the LLM, and regression thresholds.
+
+Every simulated student creates a project, uploads a generated CSV,
+analyses it (summary, batch statistics, frequency table, stored
+statistics) and asks Profe Marce questions, half of them over the
+streaming endpoint; the `informes` profile also generates a report
+through the job queue. Students start spread over a ramp-up and pause
+between steps, and retry after a 503 with Retry-After (CPU-pool load
+shedding) the way a well-behaved client would. Latency p50/p95/p99 and
+throughput are reported per endpoint and compared with
+load_thresholds.json, which --update-thresholds rewrites from the worst
+of three runs; the exit status is 1 when a threshold is exceeded.
+
+MongoDB is mongomock-motor by default (in-process, so it measures the
+app and not the database), an ephemeral mongod started from PATH with
+--mongod, or any server with --mongo-url. The LLM is StubLlmServer
+(benchmarks/stub_llm.py) with the latency given on the command line. The
+app runs in-process over httpx's ASGI transport, which buffers streamed
+responses; first-token times are reported only against --url, a server
+started separately (whose Mongo and LLM are then its own).
+
+Usage (from backend/):
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --profile smoke
+    python -m benchmarks.bench_load --profile informes --mongod
+    python -m benchmarks.bench_load --json results.json
+    python -m benchmarks.bench_load --update-thresholds   # after an intended change
+Thresholds assume this suite's defaults; LOAD_THRESHOLD_SLACK (or --slack)
+scales the latency limits on slower machines.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.stub_llm import StubLlmChat, StubLlmServer, install_emergentintegrations  # noqa: E402
+
+THRESHOLDS_FILE = Path(__file__).resolve().parent / "load_thresholds.json"
+# Room left above the observed numbers when thresholds are rewritten
+HEADROOM = 1.5
+# ...but never less than this many milliseconds above them
+FLOOR_MS = 50
+# Runs whose worst numbers become the thresholds
+UPDATE_RUNS = 3
+# 503 + Retry-After (CPU-pool load shedding) is retried like a well-behaved client would
+MAX_RETRIES = 3
+# Stub LLM latency the thresholds were recorded with
+LLM_FIRST_TOKEN = 0.4
+LLM_TOKEN_INTERVAL = 0.015
+LLM_TOKENS = 80
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "smoke": {"students": 5, "rows": 300, "questions": 2, "reports": False, "ramp": 0.5, "think": (0.0, 0.05)},
+    "classroom": {"students": 40, "rows": 2000, "questions": 3, "reports": False, "ramp": 5.0, "think": (0.2, 1.0)},
+    "informes": {"students": 40, "rows": 2000, "questions": 1, "reports": True, "ramp": 5.0, "think": (0.2, 1.0)},
+}
+
+LEVELS = ("primario", "secundario", "superior")
+SPORTS = ("fútbol", "básquet", "vóley", "natación", "hockey", "ninguno")
+# A class asks much the same things, so repeated questions exercise the chat cache
+QUESTIONS = (
+    "¿Qué es la mediana?",
+    "¿Cuál es la diferencia entre media y mediana?",
+    "¿Cómo interpreto el desvío estándar?",
+    "¿Qué muestra un histograma?",
+    "¿Para qué sirve la tabla de frecuencias?",
+    "¿Qué es un valor atípico?",
+)
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p * len(values)) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # Why calls failed: status code or exception name, per endpoint
+        self.reasons: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.retries: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool, reason: str = ""):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+            self.reasons[endpoint][reason or "failed"] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[endpoint] = {
+                "count": len(values),
+                "errors": self.errors[endpoint],
+                "errorRate": self.errors[endpoint] / len(values),
+                "failures": dict(self.reasons[endpoint]),
+                "retries": self.retries[endpoint],
+                "p50Ms": percentile(values, 0.50) * 1e3,
+                "p95Ms": percentile(values, 0.95) * 1e3,
+                "p99Ms": percentile(values, 0.99) * 1e3,
+                "maxMs": values[-1] * 1e3,
+                "rps": len(values) / elapsed,
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        result["total"] = {
+            "count": total,
+            "errors": sum(self.errors.values()),
+            "errorRate": sum(self.errors.values()) / total if total else 0.0,
+            "rps": total / elapsed,
+        }
+        return result
+
+
+def make_csv(rng: random.Random, rows: int) -> str:
+    lines = ["estudiante,edad,altura,horas_estudio,deporte,nota"]
+    for i in range(rows):
+        lines.append(",".join([
+            f"e{i}", str(rng.randint(12, 18)), f"{rng.gauss(160, 9):.1f}",
+            f"{max(0.0, rng.gauss(6, 2.5)):.1f}", rng.choice(SPORTS), str(rng.randint(1, 10)),
+        ]))
+    return "\n".join(lines) + "\n"
+
+
+class Student:
+    """One scripted student; every call is timed under its endpoint name."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, profile: Dict[str, Any],
+                 index: int, seed: int, first_token: bool):
+        self.client = client
+        self.recorder = recorder
+        self.profile = profile
+        self.index = index
+        self.rng = random.Random(seed * 1000 + index)
+        self.level = LEVELS[index % len(LEVELS)]
+        self.first_token = first_token
+
+    async def think(self):
+        await asyncio.sleep(self.rng.uniform(*self.profile["think"]))
+
+    async def call(self, endpoint: str, url: str, **kwargs) -> Optional[Any]:
+        method = endpoint.split(" ", 1)[0]
+        start = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                ok, reason = response.status_code < 400, str(response.status_code)
+            except httpx.HTTPError as e:
+                response, ok, reason = None, False, type(e).__name__
+                break
+            retry_after = response.headers.get("retry-after")
+            if response.status_code != 503 or retry_after is None or attempt == MAX_RETRIES:
+                break
+            self.recorder.retries[endpoint] += 1
+            await asyncio.sleep(float(retry_after))
+        self.recorder.record(endpoint, time.perf_counter() - start, ok, reason)
+        return response.json() if ok else None
+
+    async def stream(self, endpoint: str, url: str, **kwargs) -> bool:
+        start = time.perf_counter()
+        first = None
+        ok = False
+        reason = "no done event"
+        try:
+            async with self.client.stream("POST", url, **kwargs) as response:
+                async for line in response.aiter_lines():
+                    if first is None and line == "event: token":
+                        first = time.perf_counter() - start
+                    if line in ("event: done", "event: error"):
+                        ok = line == "event: done"
+                        reason = line[7:]
+                if response.status_code >= 400:
+                    ok, reason = False, str(response.status_code)
+        except httpx.HTTPError as e:
+            reason = type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - start, ok, reason)
+        if self.first_token and first is not None:
+            self.recorder.record(f"{endpoint} (first token)", first, True)
+        return ok
+
+    async def report(self, project_id: str):
+        start = time.perf_counter()
+        job = await self.call("POST /api/reports/jobs", "/api/reports/jobs",
+                              params={"project_id": project_id, "education_level": self.level})
+        if job is not None and job.get("status") not in ("succeeded", "failed"):
+            # The events stream ends when the job finishes; its last status is the result
+            try:
+                async with self.client.stream("GET", f"/api/reports/jobs/{job['id']}/events") as response:
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            job = json.loads(line[6:])
+            except httpx.HTTPError:
+                job = None
+        status = job.get("status") if job else "not submitted"
+        self.recorder.record("report job (submit to result)", time.perf_counter() - start,
+                             status == "succeeded", status)
+
+    async def run(self):
+        await asyncio.sleep(self.profile["ramp"] * self.index / max(1, self.profile["students"]))
+        project = await self.call("POST /api/projects", "/api/projects", json={
+            "name": f"Encuesta del curso {self.index}", "educationLevel": self.level
+        })
+        if project is None:
+            return
+        project_id = project["id"]
+
+        await self.think()
+        upload = await self.call(
+            "POST /api/upload/csv", "/api/upload/csv", params={"projectId": project_id},
+            files={"file": ("encuesta.csv", make_csv(self.rng, self.profile["rows"]), "text/csv")}
+        )
+        if upload is None:
+            return
+        dataset_id = upload["datasetId"]
+
+        await self.think()
+        await self.call("GET /api/datasets/{dataset_id}/summary", f"/api/datasets/{dataset_id}/summary")
+        await self.call("POST /api/statistics/batch", "/api/statistics/batch",
+                        json={"datasetId": dataset_id, "projectId": project_id})
+        await self.think()
+        sports = [self.rng.choice(SPORTS) for _ in range(self.profile["rows"])]
+        await self.call("POST /api/statistics/frequency", "/api/statistics/frequency",
+                        params={"projectId": project_id, "variableName": "deporte"}, json=sports)
+        await self.call("GET /api/statistics/{project_id}", f"/api/statistics/{project_id}")
+
+        for q in range(self.profile["questions"]):
+            await self.think()
+            message = {
+                "message": self.rng.choice(QUESTIONS), "sessionId": f"alumno-{self.index}",
+                "educationLevel": self.level,
+            }
+            if q % 2:
+                await self.stream("POST /api/chat/stream", "/api/chat/stream", json=message)
+            else:
+                await self.call("POST /api/chat", "/api/chat", json=message)
+
+        if self.profile["reports"]:
+            await self.think()
+            await self.report(project_id)
+
+
+async def run_profile(client: httpx.AsyncClient, profile: Dict[str, Any], seed: int,
+                      first_token: bool) -> Dict[str, Dict[str, Any]]:
+    recorder = Recorder()
+    students = [
+        Student(client, recorder, profile, i, seed, first_token) for i in range(profile["students"])
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(student.run() for student in students))
+    return recorder.summary(time.perf_counter() - start)
+
+
+def check(summary: Dict[str, Dict[str, Any]], limits: Dict[str, Dict[str, float]], slack: float) -> List[str]:
+    """Threshold violations, one message each. Endpoints without limits are
+    not checked; an endpoint with limits that saw no traffic is."""
+    failures = []
+    for endpoint, limit in limits.items():
+        observed = summary.get(endpoint)
+        if observed is None:
+            failures.append(f"{endpoint}: no requests recorded")
+            continue
+        for key in ("p50Ms", "p95Ms", "p99Ms"):
+            if key in limit and observed[key] > limit[key] * slack:
+                failures.append(f"{endpoint}: {key} {observed[key]:.0f} > {limit[key] * slack:.0f}")
+        if "errorRate" in limit and observed["errorRate"] > limit["errorRate"]:
+            failures.append(f"{endpoint}: errorRate {observed['errorRate']:.3f} > {limit['errorRate']:.3f}")
+        if "minRps" in limit and observed["rps"] < limit["minRps"] / slack:
+            failures.append(f"{endpoint}: rps {observed['rps']:.1f} < {limit['minRps'] / slack:.1f}")
+    return failures
+
+
+def thresholds_from(summaries: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, float]]:
+    """Limits from the worst of several runs: latency HEADROOM times (and
+    at least FLOOR_MS above) the observed value, throughput HEADROOM below
+    it. Errors are not expected at all, so the limit is whatever was seen."""
+    limits: Dict[str, Dict[str, float]] = {}
+    for endpoint in summaries[0]:
+        observed = [summary[endpoint] for summary in summaries if endpoint in summary]
+        error_rate = math.ceil(max(o["errorRate"] for o in observed) * 100) / 100
+        if endpoint == "total":
+            limits[endpoint] = {
+                "errorRate": error_rate, "minRps": round(min(o["rps"] for o in observed) / HEADROOM, 1)
+            }
+            continue
+        limits[endpoint] = {"errorRate": error_rate}
+        for key in ("p95Ms", "p99Ms"):
+            worst = max(o[key] for o in observed)
+            limits[endpoint][key] = float(math.ceil(max(worst * HEADROOM, worst + FLOOR_MS)))
+    return limits
+
+
+def print_summary(name: str, summary: Dict[str, Dict[str, Any]]):
+    print(f"\nprofile: {name}")
+    print(f"{'endpoint':<44} {'count':>6} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'req/s':>7}")
+    for endpoint, s in summary.items():
+        if endpoint == "total":
+            continue
+        print(f"{endpoint:<44} {s['count']:>6} {s['errors']:>4} {s['p50Ms']:>7.1f}ms {s['p95Ms']:>7.1f}ms "
+              f"{s['p99Ms']:>7.1f}ms {s['maxMs']:>7.1f}ms {s['rps']:>7.1f}")
+    total = summary["total"]
+    print(f"{'total':<44} {total['count']:>6} {total['errors']:>4} {'':>39} {total['rps']:>7.1f}")
+    for endpoint, s in summary.items():
+        if s.get("failures"):
+            reasons = ", ".join(f"{reason} x{count}" for reason, count in sorted(s["failures"].items()))
+            print(f"  failed {endpoint}: {reasons}")
+        if s.get("retries"):
+            print(f"  retried {endpoint}: {s['retries']} time(s) after 503 Retry-After")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def ephemeral_mongod():
+    """A throwaway mongod on a free port with a temporary data directory."""
+    binary = shutil.which("mongod")
+    if binary is None:
+        raise SystemExit("mongod not found on PATH")
+    with tempfile.TemporaryDirectory() as dbpath:
+        port = _free_port()
+        process = subprocess.Popen(
+            [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.time() > deadline or process.poll() is not None:
+                        raise SystemExit("mongod did not start")
+                    time.sleep(0.2)
+            yield f"mongodb://127.0.0.1:{port}"
+        finally:
+            process.terminate()
+            process.wait(10)
+
+
+def load_server(mongo_url: Optional[str]):
+    """Import server.py against the stand-ins. Done inside a function so the
+    spawned CPU-pool workers, which import this module, do not build an app."""
+    install_emergentintegrations()
+    if mongo_url is None:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+        mongo_url = "mongodb://mongomock"
+    os.environ["MONGO_URL"] = mongo_url
+    os.environ["DB_NAME"] = f"load_{uuid.uuid4().hex[:8]}"
+
+    import deepseek_service
+    import server
+    deepseek_service.llm_clients.factory = StubLlmChat
+    return server
+
+
+@asynccontextmanager
+async def app_client(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+            yield client
+        return
+
+    llm = StubLlmServer(args.llm_first_token, args.llm_token_interval, args.llm_tokens, seed=args.seed)
+    StubLlmChat.base_url = await llm.start()
+    server = load_server(args.mongo_url)
+    try:
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=300) as client:
+                yield client
+    finally:
+        await StubLlmChat.close()
+        await llm.close()
+
+
+async def main_async(args) -> int:
+    profile = PROFILES[args.profile]
+    if args.students:
+        profile = {**profile, "students": args.students}
+
+    runs = UPDATE_RUNS if args.update_thresholds else 1
+    summaries = []
+    async with app_client(args) as client:
+        # Untimed: starts the CPU-pool workers and warms imports and connections
+        await run_profile(client, {**profile, "students": 2, "ramp": 0, "think": (0, 0)}, -1, False)
+        for run in range(runs):
+            # A new seed per run, so uploads are not answered from the statistics cache
+            summaries.append(await run_profile(client, profile, args.seed + run, first_token=bool(args.url)))
+            print_summary(args.profile if runs == 1 else f"{args.profile} (run {run + 1}/{runs})", summaries[-1])
+    summary = summaries[0]
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"profile": args.profile, "summary": summary}, indent=2))
+
+    stored = json.loads(THRESHOLDS_FILE.read_text()) if THRESHOLDS_FILE.exists() else {}
+    if args.update_thresholds:
+        stored[args.profile] = thresholds_from(summaries)
+        THRESHOLDS_FILE.write_text(json.dumps(stored, indent=2, ensure_ascii=False, sort_keys=True) + "\n")
+        print(f"\nthresholds for {args.profile} written to {THRESHOLDS_FILE.name}")
+        return 0
+    llm = (args.llm_first_token, args.llm_token_interval, args.llm_tokens)
+    if args.students or args.url or args.mongo_url or llm != (LLM_FIRST_TOKEN, LLM_TOKEN_INTERVAL, LLM_TOKENS):
+        print("\nthresholds not checked: they apply to the default profile, mongomock-motor and the default stub LLM")
+        return 0
+    if args.profile not in stored:
+        print(f"\nno thresholds for {args.profile}; run with --update-thresholds to record them")
+        return 0
+
+    failures = check(summary, stored[args.profile], args.slack)
+    print()
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print(f"{len(failures)} threshold(s) exceeded" if failures else "all thresholds met")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="classroom")
+    parser.add_argument("--students", type=int, help="override the profile's student count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-url", help="use this MongoDB instead of mongomock-motor")
+    parser.add_argument("--mongod", action="store_true", help="start an ephemeral mongod from PATH")
+    parser.add_argument("--url", help="load an already running server instead of the in-process app")
+    parser.add_argument("--llm-first-token", type=float, default=LLM_FIRST_TOKEN, help="seconds")
+    parser.add_argument("--llm-token-interval", type=float, default=LLM_TOKEN_INTERVAL, help="seconds")
+    parser.add_argument("--llm-tokens", type=int, default=LLM_TOKENS, help="tokens per answer")
+    parser.add_argument("--slack", type=float, default=float(os.environ.get("LOAD_THRESHOLD_SLACK", 1.0)))
+    parser.add_argument("--json", help="write the per-endpoint summary to this file")
+    parser.add_argument("--update-thresholds", action="store_true")
+    args = parser.parse_args()
+
+    if args.mongod:
+        with ephemeral_mongod() as url:
+            args.mongo_url = url
+            sys.exit(asyncio.run(main_async(args)))
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: median + quartiles through the shared-selection quantile subsystem
+vs the previous sort-twice path (statistics.median, then sorted() for q1/q3).
+
+Then one numeric variable of the batch endpoint with approximate=True on a
+stored dataset, which answers from the stored summary and quantile sketch,
+against the exact path over the column (and against building a sketch on
+the spot, for reference). The run fails if the stored answer is not faster
+than the exact one from --assert-above values on.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantiles
+    python -m benchmarks.bench_quantiles --sizes 1000 100000 1000000 --preset deciles
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ingestion import ColumnProfile  # noqa: E402
+from quantile_sketch import KLLSketch, build_sketch  # noqa: E402
+from quantiles import QUANTILE_PRESETS, compute_quantile_groups  # noqa: E402
+from statistics_calculator import StatisticsCalculator  # noqa: E402
+
+
+def sort_twice(data):
+    numeric_data = [float(x) for x in data if x is not None]
+    median = statistics.median(numeric_data)
+    sorted_data = sorted(numeric_data)
+    n = len(sorted_data)
+    return median, sorted_data[n // 4], sorted_data[3 * n // 4]
+
+
+def numpy_sort_twice(arr, probs):
+    return np.median(arr), np.quantile(np.sort(arr), probs)
+
+
+def selection(arr, probs):
+    return compute_quantile_groups(arr, [((0.5,), "linear"), (probs, "linear")])
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--preset", choices=sorted(QUANTILE_PRESETS), default="quartiles")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--assert-above", type=int, default=1_000_000,
+                        help="tamaño desde el que la respuesta aproximada debe ganarle al cálculo exacto")
+    args = parser.parse_args()
+
+    probs = QUANTILE_PRESETS[args.preset]
+    rng = np.random.default_rng(42)
+    print(f"preset={args.preset} ({len(probs)} cuantiles + mediana)")
+    print(f"{'n':>12} {'python sort x2':>15} {'numpy sort x2':>15} {'selection':>12} {'vs python':>10} {'vs numpy':>10}")
+    for n in args.sizes:
+        arr = rng.normal(50, 15, n)
+        data = arr.tolist()
+        legacy = best_of(lambda: sort_twice(data), 1 if n >= 1_000_000 else args.repeat)
+        np_sort = best_of(lambda: numpy_sort_twice(arr, probs), args.repeat)
+        new = best_of(lambda: selection(arr, probs), args.repeat)
+        print(f"{n:>12} {legacy:>15.4f} {np_sort:>15.4f} {new:>12.4f} {legacy / new:>9.1f}x {np_sort / new:>9.1f}x")
+
+    print(f"\n{'n':>12} {'exact':>12} {'stored':>12} {'built sketch':>13} {'speedup':>10}")
+    slower = []
+    for n in args.sizes:
+        arr = rng.normal(50, 15, n)
+        profile = ColumnProfile("x")
+        profile.update(pd.Series(arr))
+        stored_profile, stored_sketch = profile.to_dict(), build_sketch(arr).to_dict()
+
+        def from_storage():
+            # What approximate=True does per variable once both documents are read
+            moments = ColumnProfile.from_dict(stored_profile).moments
+            return StatisticsCalculator.stats_from_moments(
+                moments, advanced=True, sketch=KLLSketch.from_dict(stored_sketch)
+            )
+
+        exact = best_of(lambda: StatisticsCalculator.calculate_variable_stats(arr, include_frequency=False),
+                        args.repeat)
+        approximate = best_of(from_storage, args.repeat)
+        built = best_of(lambda: StatisticsCalculator.calculate_advanced_stats(arr, approximate=True), args.repeat)
+        print(f"{n:>12} {exact:>12.4f} {approximate:>12.4f} {built:>13.4f} {exact / approximate:>9.1f}x")
+        if n >= args.assert_above and approximate >= exact:
+            slower.append(n)
+
+    assert not slower, f"la respuesta aproximada no es más rápida que el cálculo exacto para n={slower}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: report prompt size before and after the budgeted data digest.
+
+"Before" fills the report templates the way they used to be filled: the repr
+of every variable with all its values, the first rows and the whole
+statistics document. "After" is `report_prompt` on the same data, built from
+column profiles and a spread sample. Token counts use tiktoken when it is
+installed and a 4-characters-per-token estimate otherwise.
+
+Usage (from backend/):
+    python -m benchmarks.bench_report_prompt
+    python -m benchmarks.bench_report_prompt --rows 50 5000 200000 --columns 4 12 30
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deepseek_service import GENERIC_REPORT_PROMPT, REPORT_PROMPTS, report_digest, report_prompt  # noqa: E402
+from project_context import PROJECT_CONTEXT_SAMPLE_ROWS  # noqa: E402
+from report_digest import count_tokens, profile_values, token_budget, tokenizer_name  # noqa: E402
+
+LEVELS = ("primario", "secundario", "superior")
+CATEGORIES = ["futbol", "hockey", "voley", "tenis", "natacion", "basquet", "rugby", "nada", "ajedrez", "patin"]
+
+
+def make_dataset(rows: int, columns: int, rng) -> pd.DataFrame:
+    data = {}
+    for i in range(columns):
+        kind = i % 3
+        if kind == 0:
+            data[f"edad_{i}"] = rng.integers(10, 19, rows)
+        elif kind == 1:
+            data[f"medida_{i}"] = rng.normal(160, 12, rows).round(2)
+        else:
+            data[f"categoria_{i}"] = rng.choice(CATEGORIES, rows)
+    return pd.DataFrame(data)
+
+
+def project_data(df: pd.DataFrame) -> dict:
+    profiles = profile_values({name: df[name].tolist() for name in df.columns})
+    first = next(p for p in profiles.values() if p.is_numeric)
+    stats = first.statistics()
+    return {
+        "id": "bench",
+        "name": "Encuesta del curso",
+        "analysisType": "univariado",
+        "variables": [{"name": name, "type": "columna", "values": df[name].tolist()} for name in df.columns],
+        "rowCount": len(df),
+        "profiles": profiles,
+        "sampleData": df.iloc[np.linspace(0, len(df) - 1, min(PROJECT_CONTEXT_SAMPLE_ROWS, len(df))).astype(int)]
+                        .to_dict(orient="records"),
+        "statistics": {
+            "id": "4f1c2a9e-0000-4000-8000-000000000000",
+            "projectId": "bench",
+            "variableName": first.name,
+            **{k: stats.get(k) for k in ("mean", "median", "range", "variance", "stdDev")},
+            "calculations": stats,
+            "createdAt": datetime.utcnow(),
+        },
+    }
+
+
+def legacy_prompt(data: dict, education_level: str) -> str:
+    variables = data["variables"]
+    names = [var["name"] for var in variables]
+    fields = {
+        "name": data["name"],
+        "analysisType": data["analysisType"],
+        "variables": variables,
+        "sampleData": [dict(zip(names, row)) for row in zip(*(var["values"][:10] for var in variables))],
+        "statistics": data["statistics"],
+    }
+    template = REPORT_PROMPTS.get(education_level)
+    if template is None:
+        return GENERIC_REPORT_PROMPT.format(education_level=education_level, **fields)
+    return template.format(**fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[30, 2_000, 100_000])
+    parser.add_argument("--columns", type=int, nargs="+", default=[3, 8, 20])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    print(f"tokens: {tokenizer_name()}")
+    print(f"{'filas':>8} {'cols':>5} {'nivel':>11} {'antes':>10} {'después':>8} {'datos':>6} "
+          f"{'presupuesto':>11} {'detalle':>7} {'omitidas':>8} {'ms':>7}")
+    for rows, columns in zip(args.rows, args.columns):
+        data = project_data(make_dataset(rows, columns, rng))
+        for level in LEVELS:
+            before = count_tokens(legacy_prompt(data, level))
+            start = time.perf_counter()
+            prompt = report_prompt(data, level)
+            elapsed = (time.perf_counter() - start) * 1000
+            digest = report_digest(data, level)
+            print(f"{rows:>8} {columns:>5} {level:>11} {before:>10} {count_tokens(prompt):>8} "
+                  f"{digest['tokens']:>6} {token_budget(level):>11} {digest['detail']:>7} "
+                  f"{digest['omitted']:>8} {elapsed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
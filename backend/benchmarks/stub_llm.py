@@ -0,0 +1,195 @@
+"""
+Stand-in for the LLM provider used by the benchmarks: a local
+OpenAI-style /v1/chat/completions server with scripted latency, and an
+LlmChat look-alike that talks to it.
+
+The server waits `first_token` seconds before the first token and
+`token_interval` between tokens (both scaled by a seeded log-normal
+jitter), so plain requests take as long as a streamed answer of the same
+length, as with the real provider. With "stream": true it answers with
+server-sent chunks in the OpenAI format.
+"""
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import types
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+WORDS = (
+    "La media resume el centro de los datos y la mediana no se deja llevar por los valores extremos, "
+    "así que conviene mirar las dos antes de sacar conclusiones sobre la encuesta del curso."
+).split()
+
+
+class UserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubLlmServer:
+    def __init__(self, first_token: float = 0.4, token_interval: float = 0.015, tokens: int = 80,
+                 jitter: float = 0.25, seed: int = 0):
+        self.first_token = first_token
+        self.token_interval = token_interval
+        self.tokens = tokens
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._open: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self.connections = 0
+        self.requests = 0
+        self.streams = 0
+
+    def _scale(self) -> float:
+        return math.exp(self._random.gauss(0, self.jitter)) if self.jitter else 1.0
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Pooled clients keep their connections open until told otherwise
+            for writer in self._open:
+                writer.close()
+            await asyncio.gather(*self._open.values(), return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._open[writer] = asyncio.current_task()
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = json.loads(await reader.readexactly(length) or b"{}")
+                await self._answer(writer, bool(body.get("stream")))
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            self._open.pop(writer, None)
+            writer.close()
+
+    async def _answer(self, writer: asyncio.StreamWriter, stream: bool):
+        self.requests += 1
+        scale = self._scale()
+        words = [WORDS[i % len(WORDS)] for i in range(self.tokens)]
+        await asyncio.sleep(self.first_token * scale)
+        if not stream:
+            await asyncio.sleep(self.token_interval * scale * (len(words) - 1))
+            reply = json.dumps({"choices": [{"message": {"role": "assistant", "content": " ".join(words)}}]}).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(reply)).encode() + b"\r\n\r\n" + reply
+            )
+            await writer.drain()
+            return
+
+        self.streams += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_interval * scale)
+            piece = json.dumps({"choices": [{"delta": {"content": word if i == 0 else " " + word}}]})
+            self._chunk(writer, f"data: {piece}\n\n".encode())
+            await writer.drain()
+        self._chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+class StubLlmChat:
+    """LlmChat look-alike against StubLlmServer, with the streaming method
+    the chat and report endpoints use when a client offers one. Like
+    LlmChat over litellm, every instance sends through one process-wide
+    keep-alive client; `close` shuts it down."""
+    base_url = ""
+    _session: Optional[httpx.AsyncClient] = None
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.api_key = api_key
+        self.session_id = session_id
+        self.messages = [{"role": "system", "content": system_message}]
+        if StubLlmChat._session is None:
+            StubLlmChat._session = httpx.AsyncClient(base_url=self.base_url, timeout=120)
+        self.http = StubLlmChat._session
+        self.model = None
+
+    @classmethod
+    async def close(cls):
+        if cls._session is not None:
+            await cls._session.aclose()
+            cls._session = None
+
+    def with_model(self, provider, model):
+        self.model = model
+        return self
+
+    async def send_message(self, message):
+        self.messages.append({"role": "user", "content": message.text})
+        response = await self.http.post(
+            "/v1/chat/completions", json={"model": self.model, "messages": self.messages}
+        )
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream_message(self, message) -> AsyncIterator[str]:
+        self.messages.append({"role": "user", "content": message.text})
+        async with self.http.stream(
+            "POST", "/v1/chat/completions", json={"model": self.model, "messages": self.messages, "stream": True}
+        ) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                yield json.loads(line[6:])["choices"][0]["delta"].get("content", "")
+
+
+def install_emergentintegrations():
+    """Register this module as emergentintegrations.llm.chat when the real
+    package is not installed, so server.py can be imported; the suites
+    point the LLM pool at StubLlmChat either way."""
+    try:
+        import emergentintegrations.llm.chat  # noqa: F401
+        return
+    except ImportError:
+        pass
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = StubLlmChat
+    chat.UserMessage = UserMessage
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.chat = chat
+    package = types.ModuleType("emergentintegrations")
+    package.llm = llm
+    sys.modules.update({
+        "emergentintegrations": package, "emergentintegrations.llm": llm, "emergentintegrations.llm.chat": chat
+    })
+
+
+async def _demo():
+    server = StubLlmServer()
+    StubLlmChat.base_url = await server.start()
+    chat = StubLlmChat(system_message="Sos la Profe Marce").with_model("openai", "stub")
+    start = time.perf_counter()
+    first = None
+    async for piece in chat.stream_message(UserMessage("¿Qué es la mediana?")):
+        first = first or time.perf_counter() - start
+    print(f"first token {first * 1e3:.0f}ms, whole answer {(time.perf_counter() - start) * 1e3:.0f}ms")
+    await StubLlmChat.close()
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Every collection whose documents belong to a project through `projectId`
+PROJECT_COLLECTIONS = (
+    "datasets", "datasetChunks", "datasetSummaries", "quantileSketches",
+    "statistics", "frequencyTables", "reports", "reportJobs",
+)
+# Collections that also hang off a single dataset through `datasetId`
+DATASET_COLLECTIONS = ("datasetChunks", "datasetSummaries", "quantileSketches")
+
+ORPHAN_SWEEP_INTERVAL = float(os.environ.get('ORPHAN_SWEEP_INTERVAL', 3600))
+ORPHAN_SWEEP_BATCH = int(os.environ.get('ORPHAN_SWEEP_BATCH', 500))
+# Streaming ingestion writes chunks before their dataset document, so
+# documents younger than this are not taken for orphans
+ORPHAN_GRACE_SECONDS = float(os.environ.get('ORPHAN_GRACE_SECONDS', 24 * 3600))
+
+
+def _batches(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CascadeDeleter:
+    """Deletes a project together with every document that references it.
+
+    On a replica set or sharded cluster the whole cascade runs in one
+    multi-document transaction. On a standalone server the project document
+    goes first and the dependent collections are cleared concurrently; if
+    one of those fails, what is left is an orphan the sweeper collects.
+    """
+
+    def __init__(self, client, db, forget: Optional[Callable[[str], Any]] = None,
+                 batch_size: int = ORPHAN_SWEEP_BATCH, grace_seconds: float = ORPHAN_GRACE_SECONDS):
+        self.client = client
+        self.db = db
+        self.forget = forget
+        self.batch_size = max(1, batch_size)
+        self.grace_seconds = grace_seconds
+        self._transactions: Optional[bool] = None
+        self.projects_deleted = 0
+        self.transactional_deletes = 0
+        self.partial_failures = 0
+        self.sweeps = 0
+        self.orphans_deleted: Dict[str, int] = {name: 0 for name in PROJECT_COLLECTIONS}
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    async def supports_transactions(self) -> bool:
+        if self._transactions is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+            except Exception:
+                self._transactions = False
+        return self._transactions
+
+    async def _delete_in_transaction(self, project_id: str) -> Optional[Dict[str, int]]:
+        async def cascade(session):
+            result = await self.db.projects.delete_one({"id": project_id}, session=session)
+            if result.deleted_count == 0:
+                return None
+            # Operations on one session must not overlap, so these run in turn
+            counts = {}
+            for name in PROJECT_COLLECTIONS:
+                deleted = await self.db[name].delete_many({"projectId": project_id}, session=session)
+                counts[name] = deleted.deleted_count
+            return counts
+
+        async with await self.client.start_session() as session:
+            counts = await session.with_transaction(cascade)
+        if counts is not None:
+            self.transactional_deletes += 1
+        return counts
+
+    async def _delete_concurrently(self, project_id: str) -> Optional[Dict[str, int]]:
+        result = await self.db.projects.delete_one({"id": project_id})
+        if result.deleted_count == 0:
+            return None
+
+        results = await asyncio.gather(
+            *(self.db[name].delete_many({"projectId": project_id}) for name in PROJECT_COLLECTIONS),
+            return_exceptions=True
+        )
+        failed = [name for name, res in zip(PROJECT_COLLECTIONS, results) if isinstance(res, BaseException)]
+        if failed:
+            self.partial_failures += 1
+            logger.warning(f"Borrado incompleto del proyecto {project_id} en {', '.join(failed)}; "
+                           "el barrido de huérfanos lo completará")
+        return {
+            name: res.deleted_count
+            for name, res in zip(PROJECT_COLLECTIONS, results) if not isinstance(res, BaseException)
+        }
+
+    async def delete_project(self, project_id: str) -> Optional[Dict[str, int]]:
+        """Deleted document counts per collection, or None if the project does
+        not exist."""
+        if await self.supports_transactions():
+            counts = await self._delete_in_transaction(project_id)
+        else:
+            counts = await self._delete_concurrently(project_id)
+        if counts is not None:
+            self.projects_deleted += 1
+            if self.forget:
+                self.forget(project_id)
+        return counts
+
+    async def _missing(self, parent: str, ids: List[str]) -> List[str]:
+        missing = []
+        for batch in _batches(ids, self.batch_size):
+            found = await self.db[parent].distinct("id", {"id": {"$in": batch}})
+            present = set(found)
+            missing.extend(i for i in batch if i not in present)
+        return missing
+
+    def _settled(self) -> Dict[str, Any]:
+        """Filter for the documents old enough to be judged orphans.
+
+        A dataset document is written after its chunks, and nothing should
+        be lost to a write racing a project's creation, so only documents
+        past the grace period count. `createdAt` is a datetime on newer
+        documents and an ISO string on older ones; unstamped documents
+        predate the grace period altogether.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+        return {"$or": [
+            {"createdAt": {"$lt": cutoff}},
+            {"createdAt": {"$lt": cutoff.isoformat()}},
+            {"createdAt": {"$exists": False}},
+        ]}
+
+    async def find_orphans(self) -> Dict[str, Dict[str, List[str]]]:
+        """Referenced ids with no parent document, per collection and key."""
+        orphans: Dict[str, Dict[str, List[str]]] = {}
+        for name in PROJECT_COLLECTIONS:
+            project_ids = [i for i in await self.db[name].distinct("projectId", self._settled()) if i is not None]
+            entry = {"projectId": await self._missing("projects", project_ids)}
+            if name in DATASET_COLLECTIONS:
+                dataset_ids = [
+                    i for i in await self.db[name].distinct("datasetId", self._settled())
+                    if i is not None
+                ]
+                entry["datasetId"] = await self._missing("datasets", dataset_ids)
+            orphans[name] = entry
+        return orphans
+
+    async def sweep(self) -> Dict[str, Any]:
+        """Delete every orphan found by `find_orphans`, one delete_many per batch of ids."""
+        orphans = await self.find_orphans()
+        deleted: Dict[str, int] = {}
+        projects = set()
+        for name, keys in orphans.items():
+            count = 0
+            for key, ids in keys.items():
+                for batch in _batches(ids, self.batch_size):
+                    result = await self.db[name].delete_many({key: {"$in": batch}, **self._settled()})
+                    count += result.deleted_count
+            deleted[name] = count
+            self.orphans_deleted[name] += count
+            projects.update(keys["projectId"])
+
+        if self.forget:
+            for project_id in projects:
+                self.forget(project_id)
+        self.sweeps += 1
+        self.last_sweep = {"deleted": deleted, "orphanProjects": len(projects)}
+        return self.last_sweep
+
+    async def run_sweeper(self, interval: float = ORPHAN_SWEEP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await self.sweep()
+                if any(result["deleted"].values()):
+                    logger.info(f"Barrido de huérfanos: {result['deleted']}")
+            except Exception as e:
+                logger.warning(f"Falló el barrido de huérfanos: {str(e)}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "transactions": self._transactions,
+            "projectsDeleted": self.projects_deleted,
+            "transactionalDeletes": self.transactional_deletes,
+            "partialFailures": self.partial_failures,
+            "sweeps": self.sweeps,
+            "orphansDeleted": self.orphans_deleted,
+            "lastSweep": self.last_sweep,
+        }
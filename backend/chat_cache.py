@@ -0,0 +1,225 @@
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+CHAT_CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', 1800))
+CHAT_CACHE_ENTRIES = int(os.environ.get('CHAT_CACHE_ENTRIES', 512))
+# Empty disables the similarity tier, e.g. "paraphrase-multilingual-MiniLM-L12-v2"
+CHAT_CACHE_EMBEDDING_MODEL = os.environ.get('CHAT_CACHE_EMBEDDING_MODEL', '')
+CHAT_CACHE_SIMILARITY = float(os.environ.get('CHAT_CACHE_SIMILARITY', 0.92))
+
+# Questions about the student's own data or the conversation so far have
+# answers that only make sense for that session
+SESSION_MARKERS = re.compile(
+    r"\b(mis?|m[ií]os?|m[ií]as?|nuestros?|nuestras?|anterior|reci[eé]n|dijiste|dije)\b",
+    re.IGNORECASE
+)
+
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, without accents, punctuation or repeated spaces:
+    "¿Qué es la MEDIANA?" and "que es la mediana" share a key."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def session_dependent(question: str) -> bool:
+    return bool(SESSION_MARKERS.search(question))
+
+
+def load_embedder(model_name: str = CHAT_CACHE_EMBEDDING_MODEL) -> Optional[Embedder]:
+    """Local sentence-transformers model returning unit vectors, or None when
+    not configured or not installed."""
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("sentence-transformers no está instalado; caché semántica desactivada")
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda texts: np.asarray(model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+class _Entry:
+    __slots__ = ("response", "stored_at", "vector")
+
+    def __init__(self, response: str, stored_at: float, vector: Optional[np.ndarray]):
+        self.response = response
+        self.stored_at = stored_at
+        self.vector = vector
+
+
+class _LevelStats:
+    __slots__ = ("exact", "semantic", "misses", "bypassed", "shared")
+
+    def __init__(self):
+        self.exact = 0
+        self.semantic = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.shared = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        hits = self.exact + self.semantic + self.shared
+        lookups = hits + self.misses
+        return {
+            "exactHits": self.exact,
+            "semanticHits": self.semantic,
+            "sharedInFlight": self.shared,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hitRate": hits / lookups if lookups else None,
+        }
+
+
+class ChatCache:
+    """Answers to general questions, per education level.
+
+    The exact tier matches normalized questions; the optional similarity
+    tier compares embeddings from a local model against the cached
+    questions of the same level. Entries expire after `ttl` seconds and the
+    least recently used go first once `max_entries` is reached. Identical
+    questions arriving while the first is still at the LLM wait for that
+    answer instead of asking again.
+    """
+
+    def __init__(self, ttl: float = CHAT_CACHE_TTL, max_entries: int = CHAT_CACHE_ENTRIES,
+                 embedder: Optional[Embedder] = None, similarity: float = CHAT_CACHE_SIMILARITY,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.embedder = embedder
+        self.similarity = similarity
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._stats: Dict[str, _LevelStats] = defaultdict(_LevelStats)
+
+    def _expired(self, entry: _Entry) -> bool:
+        return self.clock() - entry.stored_at > self.ttl
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embedder is None:
+            return None
+        return (await run_in_threadpool(self.embedder, [text]))[0]
+
+    def _exact(self, key: Tuple[str, str]) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _similar(self, level: str, vector: np.ndarray) -> Optional[_Entry]:
+        keys: List[Tuple[str, str]] = []
+        vectors = []
+        for key, entry in self._entries.items():
+            if key[0] == level and entry.vector is not None and not self._expired(entry):
+                keys.append(key)
+                vectors.append(entry.vector)
+        if not vectors:
+            return None
+        scores = np.stack(vectors) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]]
+
+    async def lookup(self, level: str, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Cached answer (or None) and the question's embedding when the
+        similarity tier is on, so a following `store` does not embed twice."""
+        key = (level, normalize_question(question))
+        entry = self._exact(key)
+        if entry is not None:
+            self._stats[level].exact += 1
+            return entry.response, entry.vector
+        vector = await self._embed(key[1])
+        if vector is not None:
+            entry = self._similar(level, vector)
+            if entry is not None:
+                self._stats[level].semantic += 1
+                return entry.response, vector
+        self._stats[level].misses += 1
+        return None, vector
+
+    def store(self, level: str, question: str, response: str, vector: Optional[np.ndarray] = None):
+        key = (level, normalize_question(question))
+        self._entries[key] = _Entry(response, self.clock(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def cacheable(self, level: str, question: str, use_cache: bool = True) -> bool:
+        if use_cache and not session_dependent(question):
+            return True
+        self._stats[level].bypassed += 1
+        return False
+
+    async def get_or_ask(self, level: str, question: str, ask: Callable[[], Awaitable[str]],
+                         use_cache: bool = True) -> str:
+        if not self.cacheable(level, question, use_cache):
+            return await ask()
+
+        response, vector = await self.lookup(level, question)
+        if response is not None:
+            return response
+
+        key = (level, normalize_question(question))
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            # Counted as a miss by lookup; it still costs no LLM call
+            stats = self._stats[level]
+            stats.misses -= 1
+            stats.shared += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await ask()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            self.store(level, question, response, vector)
+            return response
+        finally:
+            self._in_flight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "semanticTier": self.embedder is not None,
+            "similarity": self.similarity,
+            "levels": {level: stats.to_dict() for level, stats in self._stats.items()},
+        }
@@ -0,0 +1,172 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Encoded column layout (BSON-friendly):
+#   {"type": "float64" | "int64" | "bool", "length": n, "data": <bytes>, "nulls": <bitmap bytes> | None}
+#   {"type": "string", "length": n, "dictionary": [...], "codes": <int32 bytes, -1 = null>}
+#   {"type": "null", "length": n}
+#   {"type": "mixed", "length": n, "values": [...]}   (fallback, stored as-is)
+_DTYPES = {"float64": "<f8", "int64": "<i8", "bool": "u1"}
+# BSON array element: type byte plus the index as a key ("123456\0").
+# Strings add a length prefix and a terminator; other values count as the
+# widest scalar
+_BSON_ELEMENT = 8
+_BSON_STRING = 5
+_BSON_SCALAR = 8
+
+
+def _as_object_array(values: Sequence[Any]) -> np.ndarray:
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def _null_bitmap(nulls: np.ndarray) -> Optional[bytes]:
+    return np.packbits(nulls).tobytes() if nulls.any() else None
+
+
+def _encode_native(arr: np.ndarray) -> Optional[Dict[str, Any]]:
+    # Fast path for arrays that already have a numeric dtype (pandas chunks)
+    kind = arr.dtype.kind
+    if kind in "iu":
+        return {"type": "int64", "length": arr.size, "data": arr.astype("<i8").tobytes(), "nulls": None}
+    if kind == "b":
+        return {"type": "bool", "length": arr.size, "data": arr.astype("u1").tobytes(), "nulls": None}
+    if kind == "f":
+        nulls = np.isnan(arr)
+        return {"type": "float64", "length": arr.size, "data": arr.astype("<f8").tobytes(), "nulls": _null_bitmap(nulls)}
+    return None
+
+
+def encode_column(values: Sequence[Any]) -> Dict[str, Any]:
+    if isinstance(values, (np.ndarray, pd.Series)):
+        values = np.asarray(values)
+        encoded = _encode_native(values)
+        if encoded is not None:
+            return encoded
+
+    obj = _as_object_array(values)
+    n = obj.size
+    nulls = pd.isna(obj)
+    kind = pd.api.types.infer_dtype(obj, skipna=True)
+
+    if kind == "empty":
+        return {"type": "null", "length": n}
+
+    if kind == "string":
+        codes, dictionary = pd.factorize(obj)
+        return {
+            "type": "string",
+            "length": n,
+            "dictionary": dictionary.tolist(),
+            "codes": codes.astype("<i4").tobytes(),
+        }
+
+    try:
+        if kind == "boolean":
+            data = np.where(nulls, False, obj).astype(np.bool_).astype("u1")
+            col_type = "bool"
+        elif kind == "integer":
+            data = np.where(nulls, 0, obj).astype("<i8")
+            col_type = "int64"
+        elif kind in ("floating", "mixed-integer-float", "decimal", "integer-na"):
+            data = np.where(nulls, np.nan, obj).astype("<f8")
+            col_type = "float64"
+        else:
+            data = None
+    except (OverflowError, TypeError, ValueError):
+        data = None
+
+    if data is None:
+        return {
+            "type": "mixed",
+            "length": n,
+            "values": [None if is_null else v for v, is_null in zip(obj.tolist(), nulls)],
+        }
+
+    return {
+        "type": col_type,
+        "length": n,
+        "data": data.tobytes(),
+        "nulls": _null_bitmap(nulls),
+    }
+
+
+def encoded_size(col: Dict[str, Any]) -> int:
+    """Approximate BSON size in bytes of an encoded column. Binary fields
+    count as they are; every dictionary entry or mixed value is counted
+    with its own overhead as an array element."""
+    size = sum(len(col[key]) for key in ("data", "nulls", "codes") if col.get(key))
+    for key in ("dictionary", "values"):
+        for value in col.get(key) or ():
+            size += _BSON_ELEMENT + (
+                len(value.encode()) + _BSON_STRING if isinstance(value, str) else _BSON_SCALAR
+            )
+    return size
+
+
+def _nulls(col: Dict[str, Any]) -> Optional[np.ndarray]:
+    bitmap = col.get("nulls")
+    if not bitmap:
+        return None
+    return np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), count=col["length"]).astype(bool)
+
+
+def decode_column(col: Dict[str, Any]) -> List[Any]:
+    """Back to a list of plain Python values with None for missing cells."""
+    col_type = col["type"]
+    n = col["length"]
+
+    if col_type == "null":
+        return [None] * n
+    if col_type == "mixed":
+        return list(col["values"])
+    if col_type == "string":
+        codes = np.frombuffer(col["codes"], dtype="<i4")
+        dictionary = np.asarray(col["dictionary"] + [None], dtype=object)
+        # code -1 indexes the trailing None
+        return dictionary[codes].tolist()
+
+    arr = np.frombuffer(col["data"], dtype=_DTYPES[col_type])
+    if col_type == "bool":
+        arr = arr.astype(bool)
+    values = arr.tolist()
+    nulls = _nulls(col)
+    if nulls is not None:
+        for i in np.flatnonzero(nulls).tolist():
+            values[i] = None
+    return values
+
+
+def column_to_array(col: Dict[str, Any]) -> Optional[np.ndarray]:
+    """Numeric view of a column as float64 with NaN for missing cells.
+
+    Returns None for qualitative columns.
+    """
+    col_type = col["type"]
+    if col_type not in _DTYPES:
+        return None
+    arr = np.frombuffer(col["data"], dtype=_DTYPES[col_type]).astype(np.float64)
+    nulls = _nulls(col)
+    if nulls is not None:
+        arr[nulls] = np.nan
+    return arr
+
+
+def rows_to_columns(rows: Iterable[Dict[str, Any]]) -> Tuple[List[str], Dict[str, List[Any]]]:
+    rows = list(rows)
+    order: Dict[str, None] = {}
+    for row in rows:
+        for key in row:
+            if key not in order:
+                order[key] = None
+    names = list(order)
+    return names, {name: [row.get(name) for row in rows] for name in names}
+
+
+def columns_to_rows(names: Sequence[str], columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    if not names:
+        return []
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
@@ -0,0 +1,407 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import datetime
+import asyncio
+import bisect
+import os
+
+import numpy as np
+from pymongo import ReturnDocument
+
+from profiling import stage
+
+from columnar import (
+    encode_column, decode_column, encoded_size,
+    rows_to_columns, columns_to_rows
+)
+
+# Encoded columns of a chunk document stay within CHUNK_BYTES, well below
+# the 16 MB BSON limit; datasets that fit in one chunk are stored inline in
+# the dataset document
+CHUNK_BYTES = int(os.environ.get('DATASET_CHUNK_BYTES', 8 * 1024 * 1024))
+# Leading rows kept encoded in the dataset document, so previews never
+# read the dataset's data
+HEAD_ROWS = int(os.environ.get('DATASET_HEAD_ROWS', 20))
+# Fields of an inline dataset document that hold its data (up to CHUNK_BYTES)
+INLINE_DATA_FIELDS = ("columns", "variableValues")
+# The dataset document without any of its rows: what appends and summaries
+# read, so their cost does not grow with the stored data
+HEADER_PROJECTION = {"_id": 0, "rawData": 0, "head": 0, **{field: 0 for field in INLINE_DATA_FIELDS}}
+# No cell encodes in fewer bytes than a number, so this bounds the rows of a
+# chunk; strings and mixed columns are measured once encoded
+_BYTES_PER_CELL = 8
+
+
+def _chunk_rows(series_count: int) -> int:
+    return max(1, CHUNK_BYTES // (_BYTES_PER_CELL * max(series_count, 1)))
+
+
+def _encode_chunk(series: Dict[str, Sequence[Any]], start: int, stop: int) -> Dict[str, Any]:
+    return {name: encode_column(values[start:stop]) for name, values in series.items()}
+
+
+def encode_chunks(length: int, max_rows: int, *groups: Dict[str, Sequence[Any]]
+                  ) -> Iterator[Tuple[int, int, List[Dict[str, Any]]]]:
+    """(row start, row count, encoded groups) for consecutive row ranges of
+    at most `max_rows` rows whose encoded columns, across all `groups`, take
+    at most CHUNK_BYTES. A range that encodes larger is halved until it
+    fits, and later ranges start from the smaller size. Yields one empty
+    range when `length` is 0."""
+    start = 0
+    limit = max(1, max_rows)
+    while True:
+        rows = min(limit, length - start)
+        encoded = [_encode_chunk(series, start, start + rows) for series in groups]
+        while rows > 1 and sum(encoded_size(col) for part in encoded for col in part.values()) > CHUNK_BYTES:
+            rows = (rows + 1) // 2
+            encoded = [_encode_chunk(series, start, start + rows) for series in groups]
+        limit = min(limit, max(rows, 1))
+        yield start, rows, encoded
+        start += rows
+        if start >= length:
+            return
+
+
+def spread_indices(length: int, count: int) -> List[int]:
+    """Up to `count` row indexes evenly spaced over [0, length)."""
+    if count <= 0 or length <= 0:
+        return []
+    return np.unique(np.linspace(0, length - 1, min(count, length)).round().astype(int)).tolist()
+
+
+class DatasetStore:
+    """Columnar persistence for datasets.
+
+    Rows are stored as one typed array per column (strings dictionary
+    encoded) and variable values the same way. Large datasets are split by
+    row range into `datasetChunks` documents. The first HEAD_ROWS rows are
+    also kept in the dataset document as `head`. Documents written before
+    the columnar format (with `rawData`) are still read as they are.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, meta: Dict[str, Any], rows: Optional[List[Dict[str, Any]]] = None,
+                     columns: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Any]:
+        with stage("dataset_store.columnize"):
+            if columns is None:
+                column_order, columns = rows_to_columns(rows or [])
+            else:
+                column_order = list(columns)
+            row_count = max((len(v) for v in columns.values()), default=0)
+            # Short columns are padded so every row has every key
+            columns = {
+                name: values + [None] * (row_count - len(values)) for name, values in columns.items()
+            }
+
+        variables = meta.get('variables', [])
+        variable_values = {str(i): var.get('values', []) for i, var in enumerate(variables)}
+        length = max([row_count] + [len(v) for v in variable_values.values()])
+
+        chunk_rows = _chunk_rows(len(columns) + len(variable_values))
+        with stage("dataset_store.encode"):
+            pieces = list(encode_chunks(length, chunk_rows, columns, variable_values))
+
+        doc = {
+            **{k: v for k, v in meta.items() if k not in ('rawData', 'columns', 'variables')},
+            "storage": "columnar",
+            "rowCount": row_count,
+            "columnOrder": column_order,
+            "variables": [
+                {"name": var['name'], "type": var['type'], "length": len(var.get('values', []))}
+                for var in variables
+            ],
+            "chunkRows": chunk_rows,
+            "chunkCount": len(pieces),
+            "inline": len(pieces) == 1,
+            "head": {"rows": min(row_count, HEAD_ROWS), "columns": _encode_chunk(columns, 0, HEAD_ROWS)},
+        }
+
+        if len(pieces) == 1:
+            _, _, (doc["columns"], doc["variableValues"]) = pieces[0]
+        else:
+            created_at = datetime.utcnow()
+            chunks = [
+                {
+                    "datasetId": doc['id'],
+                    "projectId": doc['projectId'],
+                    "index": i,
+                    "rowStart": start,
+                    "createdAt": created_at,
+                    "columns": encoded_columns,
+                    "variableValues": encoded_values,
+                }
+                for i, (start, _, (encoded_columns, encoded_values)) in enumerate(pieces)
+            ]
+            with stage("dataset_store.write"):
+                await self.db.datasetChunks.insert_many(chunks)
+
+        with stage("dataset_store.write"):
+            await self.db.datasets.insert_one(doc)
+        return doc
+
+    def writer(self, meta: Dict[str, Any]) -> "DatasetWriter":
+        return DatasetWriter(self, meta)
+
+    async def _chunks(self, doc: Dict[str, Any], max_rows: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        if 'columns' in doc:
+            yield doc
+            # Appended rows live in datasetChunks even for inline datasets
+            if doc.get('chunkCount', 1) <= 1:
+                return
+        query = {"datasetId": doc['id']}
+        if max_rows is not None:
+            query["rowStart"] = {"$lt": max_rows}
+        cursor = self.db.datasetChunks.find(query, {"_id": 0}).sort("index", 1)
+        async for chunk in cursor:
+            yield chunk
+
+    async def with_data(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """`doc` with its inline data, when it was read without INLINE_DATA_FIELDS."""
+        if doc.get('storage') != 'columnar' or 'columns' in doc or doc.get('inline') is False:
+            return doc
+        data = await self.db.datasets.find_one({"id": doc['id']}, {"_id": 0, **{f: 1 for f in INLINE_DATA_FIELDS}})
+        return {**doc, **(data or {})}
+
+    async def head(self, doc: Dict[str, Any], rows: int) -> Dict[str, List[Any]]:
+        """The first `rows` rows of every table column, from the stored head
+        when it covers them (appends to a short dataset outgrow it)."""
+        head = doc.get('head')
+        if head is not None and head['rows'] >= min(rows, doc['rowCount']):
+            return {name: decode_column(head['columns'][name])[:rows] for name in doc['columnOrder']}
+        return await self.load_columns(await self.with_data(doc), max_rows=rows)
+
+    async def load_columns(self, doc: Dict[str, Any], names: Optional[Sequence[str]] = None,
+                           max_rows: Optional[int] = None) -> Dict[str, List[Any]]:
+        """Decoded table columns, optionally only some of them and the first rows."""
+        if doc.get('storage') != 'columnar':
+            column_order, columns = rows_to_columns(doc.get('rawData', [])[:max_rows])
+            return {name: columns[name] for name in (names or column_order) if name in columns}
+
+        names = [name for name in (names or doc['columnOrder']) if name in doc['columnOrder']]
+        result: Dict[str, List[Any]] = {name: [] for name in names}
+        async for chunk in self._chunks(doc, max_rows):
+            for name in names:
+                result[name].extend(decode_column(chunk['columns'][name]))
+        if max_rows is not None:
+            result = {name: values[:max_rows] for name, values in result.items()}
+        else:
+            result = {name: values[:doc['rowCount']] for name, values in result.items()}
+        return result
+
+    async def load_variables(self, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if doc.get('storage') != 'columnar':
+            return doc.get('variables', [])
+
+        # Variables either carry their own values or point at a table column
+        own = [str(i) for i, var in enumerate(doc['variables']) if 'column' not in var]
+        referenced = [var['column'] for var in doc['variables'] if 'column' in var]
+        values: Dict[str, List[Any]] = {key: [] for key in own}
+        async for chunk in self._chunks(doc):
+            for key in own:
+                if key in chunk['variableValues']:
+                    values[key].extend(decode_column(chunk['variableValues'][key]))
+        columns = await self.load_columns(doc, referenced) if referenced else {}
+
+        return [
+            {
+                "name": var['name'],
+                "type": var['type'],
+                "values": columns[var['column']] if 'column' in var else values[str(i)][:var['length']]
+            }
+            for i, var in enumerate(doc['variables'])
+        ]
+
+    async def sample_rows(self, doc: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+        """`count` rows spread evenly over the whole dataset, decoding only
+        the chunks that hold them."""
+        if doc.get('storage') != 'columnar':
+            rows = doc.get('rawData', [])
+            return [rows[i] for i in spread_indices(len(rows), count)]
+
+        wanted = spread_indices(doc['rowCount'], count)
+        if not wanted:
+            return []
+        pieces = []
+        if 'columns' in doc:
+            pieces.append((0, doc['columns']))
+        if 'columns' not in doc or doc.get('chunkCount', 1) > 1:
+            starts = await self.db.datasetChunks.find(
+                {"datasetId": doc['id']}, {"_id": 0, "index": 1, "rowStart": 1}
+            ).sort("rowStart", 1).to_list(None)
+            bounds = [chunk['rowStart'] for chunk in starts]
+            needed = sorted({
+                starts[bisect.bisect_right(bounds, i) - 1]['index']
+                for i in wanted if bisect.bisect_right(bounds, i)
+            })
+            async for chunk in self.db.datasetChunks.find(
+                {"datasetId": doc['id'], "index": {"$in": needed}}, {"_id": 0, "rowStart": 1, "columns": 1}
+            ):
+                pieces.append((chunk['rowStart'], chunk['columns']))
+
+        if not pieces:
+            return []
+        pieces.sort(key=lambda piece: piece[0])
+        piece_starts = [start for start, _ in pieces]
+        rows = []
+        decoded: Dict[int, Dict[str, List[Any]]] = {}
+        for i in wanted:
+            p = bisect.bisect_right(piece_starts, i) - 1
+            start, columns = pieces[p]
+            if p not in decoded:
+                decoded[p] = {name: decode_column(columns[name]) for name in doc['columnOrder']}
+            values = decoded[p]
+            if i - start < len(next(iter(values.values()), [])):
+                rows.append({name: values[name][i - start] for name in doc['columnOrder']})
+        return rows
+
+    async def to_rows(self, doc: Dict[str, Any], max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """The dataset in the original row-oriented API shape."""
+        if doc.get('storage') != 'columnar':
+            return doc
+
+        columns = await self.load_columns(doc, max_rows=max_rows)
+        return {
+            "id": doc['id'],
+            "projectId": doc['projectId'],
+            "rawData": columns_to_rows(doc['columnOrder'], columns),
+            "variables": await self.load_variables(doc),
+            "source": doc.get('source', 'manual'),
+            "rowCount": doc['rowCount'],
+            "createdAt": doc.get('createdAt'),
+        }
+
+    async def to_columns(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        columns = await self.load_columns(doc)
+        return {
+            "id": doc['id'],
+            "projectId": doc['projectId'],
+            "columnOrder": list(columns),
+            "columns": columns,
+            "variables": await self.load_variables(doc),
+            "source": doc.get('source', 'manual'),
+            "rowCount": len(next(iter(columns.values()), [])),
+            "createdAt": doc.get('createdAt'),
+        }
+
+    async def append(self, doc: Dict[str, Any], columns: Dict[str, List[Any]], row_count: int) -> int:
+        """Add rows without touching the stored ones: the new rows become new
+        chunks, so appending k rows costs O(k). Returns the index of the first
+        new row. `columns` must hold every column of the dataset."""
+        if doc.get('storage') != 'columnar':
+            # Documents from before the columnar format grow in place
+            row_start = doc.get('rowCount')
+            if row_start is None:
+                sized = await self.db.datasets.aggregate([
+                    {"$match": {"id": doc['id']}},
+                    {"$project": {"n": {"$size": {"$ifNull": ["$rawData", []]}}}}
+                ]).to_list(1)
+                row_start = sized[0]['n'] if sized else 0
+            await self.db.datasets.update_one(
+                {"id": doc['id']},
+                {
+                    "$push": {"rawData": {"$each": columns_to_rows(list(columns), columns)}},
+                    "$set": {"rowCount": row_start + row_count}
+                }
+            )
+            return row_start
+
+        chunk_rows = doc.get('chunkRows') or _chunk_rows(len(doc['columnOrder']))
+        series = {name: columns[name] for name in doc['columnOrder']}
+        pieces = list(encode_chunks(row_count, chunk_rows, series))
+        # Reserving the row range and chunk indexes atomically keeps
+        # concurrent appends from overlapping
+        before = await self.db.datasets.find_one_and_update(
+            {"id": doc['id']},
+            {"$inc": {"rowCount": row_count, "chunkCount": len(pieces)}},
+            projection={"_id": 0, "rowCount": 1, "chunkCount": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        created_at = datetime.utcnow()
+        await self.db.datasetChunks.insert_many([
+            {
+                "datasetId": doc['id'],
+                "projectId": doc['projectId'],
+                "index": before['chunkCount'] + i,
+                "rowStart": before['rowCount'] + start,
+                "createdAt": created_at,
+                "columns": encoded,
+                "variableValues": {},
+            }
+            for i, (start, _, (encoded,)) in enumerate(pieces)
+        ])
+        return before['rowCount']
+
+    async def delete_for_project(self, project_id: str) -> int:
+        result, *_ = await asyncio.gather(
+            self.db.datasets.delete_many({"projectId": project_id}),
+            self.db.datasetChunks.delete_many({"projectId": project_id}),
+            self.db.datasetSummaries.delete_many({"projectId": project_id}),
+            self.db.quantileSketches.delete_many({"projectId": project_id}),
+        )
+        return result.deleted_count
+
+
+class DatasetWriter:
+    """Appends already-encoded column chunks straight into `datasetChunks`.
+
+    Used by streaming ingestion so a dataset never has to exist in memory as
+    a whole; the dataset document is written last, once the row count is known.
+    Until then the chunks have no parent, so they carry `createdAt` and the
+    orphan sweeper leaves young ones alone.
+    """
+
+    def __init__(self, store: DatasetStore, meta: Dict[str, Any]):
+        self.store = store
+        self.meta = meta
+        self.column_order: List[str] = []
+        self.row_count = 0
+        self.chunk_count = 0
+        self.head: Dict[str, List[Any]] = {}
+
+    def chunk_rows(self, column_count: int) -> int:
+        """Most rows a chunk may hold; see `encode_chunks` for the byte limit."""
+        return _chunk_rows(column_count)
+
+    async def append(self, columns: Dict[str, Dict[str, Any]], row_count: int):
+        if not self.column_order:
+            self.column_order = list(columns)
+        if self.row_count < HEAD_ROWS:
+            for name, col in columns.items():
+                self.head.setdefault(name, []).extend(decode_column(col)[:HEAD_ROWS - self.row_count])
+        await self.store.db.datasetChunks.insert_one({
+            "datasetId": self.meta['id'],
+            "projectId": self.meta['projectId'],
+            "index": self.chunk_count,
+            "rowStart": self.row_count,
+            "createdAt": datetime.utcnow(),
+            "columns": columns,
+            "variableValues": {},
+        })
+        self.chunk_count += 1
+        self.row_count += row_count
+
+    async def finish(self, variables: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """`variables` are {name, type, column} entries that reuse table columns."""
+        doc = {
+            **self.meta,
+            "storage": "columnar",
+            "rowCount": self.row_count,
+            "columnOrder": self.column_order,
+            "variables": [
+                {"name": var['name'], "type": var['type'], "column": var['column'], "length": self.row_count}
+                for var in variables
+            ],
+            "chunkRows": _chunk_rows(len(self.column_order)),
+            "chunkCount": self.chunk_count,
+            "inline": False,
+            "head": {
+                "rows": min(self.row_count, HEAD_ROWS),
+                "columns": {name: encode_column(self.head.get(name, [])) for name in self.column_order},
+            },
+        }
+        await self.store.db.datasets.insert_one(doc)
+        return doc
+
+    async def abort(self):
+        await self.store.db.datasetChunks.delete_many({"datasetId": self.meta['id']})
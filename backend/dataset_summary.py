@@ -0,0 +1,123 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+
+import pandas as pd
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from dataset_store import DatasetStore
+from ingestion import ColumnProfile
+
+_APPLY_RETRIES = 5
+
+
+def _profile_columns(columns: Dict[str, List[Any]], profiles: Optional[Dict[str, ColumnProfile]] = None
+                     ) -> Dict[str, ColumnProfile]:
+    profiles = dict(profiles or {})
+    for name, values in columns.items():
+        profiles.setdefault(name, ColumnProfile(name)).update(pd.Series(values))
+    return profiles
+
+
+class DatasetSummaries:
+    """Sufficient statistics of every dataset column (moments, quantile
+    sketch, frequency counts) kept in `datasetSummaries`.
+
+    Appends update them from the new rows only. The summary carries the row
+    count it covers, which doubles as an optimistic-concurrency version so
+    interleaved appends never apply on top of each other. Profiles of the
+    variables typed in by hand are kept in the same document under
+    `variables`; appends never change those.
+    """
+
+    def __init__(self, db, store: DatasetStore, run: Callable = run_in_threadpool):
+        self.db = db
+        self.store = store
+        self.run = run
+
+    async def _load(self, dataset_id: str) -> Optional[Tuple[int, Dict[str, ColumnProfile]]]:
+        doc = await self.db.datasetSummaries.find_one({"datasetId": dataset_id}, {"_id": 0, "variables": 0})
+        # A document holding only variable profiles has no table summary yet
+        if doc is None or 'rowCount' not in doc:
+            return None
+        return doc['rowCount'], {col['name']: ColumnProfile.from_dict(col) for col in doc['columns']}
+
+    async def _upsert(self, dataset_id: str, fields: Dict[str, Any]):
+        try:
+            await self.db.datasetSummaries.update_one({"datasetId": dataset_id}, {"$set": fields}, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent upsert created the document first
+            await self.db.datasetSummaries.update_one({"datasetId": dataset_id}, {"$set": fields})
+
+    async def save(self, dataset: Dict[str, Any], row_count: int, profiles: Dict[str, ColumnProfile],
+                   expected_rows: Optional[int] = None) -> bool:
+        summary = {
+            "projectId": dataset['projectId'],
+            "rowCount": row_count,
+            "columns": [profile.to_dict() for profile in profiles.values()],
+        }
+        if expected_rows is None:
+            await self._upsert(dataset['id'], summary)
+            return True
+        result = await self.db.datasetSummaries.update_one(
+            {"datasetId": dataset['id'], "rowCount": expected_rows}, {"$set": summary}
+        )
+        return result.matched_count == 1
+
+    async def rebuild(self, dataset: Dict[str, Any]) -> Tuple[int, Dict[str, ColumnProfile]]:
+        """Full O(n) pass, only for datasets stored before summaries existed
+        or after a lost race."""
+        dataset = await self.db.datasets.find_one({"id": dataset['id']}, {"_id": 0}) or dataset
+        columns = await self.store.load_columns(dataset)
+        profiles = await self.run(_profile_columns, columns)
+        # Count what was actually read: a concurrent append may have reserved
+        # rows whose chunk is not written yet
+        row_count = max((len(v) for v in columns.values()), default=0)
+        await self.save(dataset, row_count, profiles)
+        return row_count, profiles
+
+    async def variable_profiles(self, dataset: Dict[str, Any]) -> Dict[str, ColumnProfile]:
+        """Profiles of the variables that carry their own values instead of
+        pointing at a table column. Those are typed in by hand and never
+        appended to, so they are profiled once and then read from the summary."""
+        own = {var['name'] for var in dataset.get('variables', []) if 'column' not in var}
+        if not own:
+            return {}
+        doc = await self.db.datasetSummaries.find_one({"datasetId": dataset['id']}, {"_id": 0, "variables": 1})
+        if doc is not None and 'variables' in doc:
+            return {var['name']: ColumnProfile.from_dict(var) for var in doc['variables']}
+
+        variables = await self.store.load_variables(await self.store.with_data(dataset))
+        columns = {var['name']: var['values'] for var in variables if var['name'] in own and var.get('values')}
+        profiles = await self.run(_profile_columns, columns)
+        await self._upsert(dataset['id'], {
+            "projectId": dataset['projectId'],
+            "variables": [profile.to_dict() for profile in profiles.values()],
+        })
+        return profiles
+
+    async def get(self, dataset: Dict[str, Any]) -> Tuple[int, Dict[str, ColumnProfile]]:
+        return await self._load(dataset['id']) or await self.rebuild(dataset)
+
+    async def apply(self, dataset: Dict[str, Any], columns: Dict[str, List[Any]],
+                    row_start: int, row_count: int) -> Tuple[int, Dict[str, ColumnProfile]]:
+        """Fold rows [row_start, row_start + row_count) into the summary."""
+        for attempt in range(_APPLY_RETRIES):
+            loaded = await self._load(dataset['id'])
+            if loaded is None:
+                # Storage already holds the new rows, a rebuild includes them
+                return await self.rebuild(dataset)
+
+            covered, profiles = loaded
+            if covered >= row_start + row_count:
+                return loaded
+            if covered == row_start:
+                profiles = await self.run(_profile_columns, columns, profiles)
+                if await self.save(dataset, covered + row_count, profiles, expected_rows=covered):
+                    return covered + row_count, profiles
+            elif covered > row_start:
+                break
+            # An earlier append has not been folded in yet
+            await asyncio.sleep(0.01 * (attempt + 1))
+
+        return await self.rebuild(dataset)
@@ -1,90 +1,86 @@
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import os
+from typing import AsyncIterator, Dict, Optional
 from dotenv import load_dotenv
 from pathlib import Path
 
+from chat_cache import ChatCache, load_embedder
+from llm_clients import LlmClients
+from metrics import LlmMetrics
+from report_digest import build_digest, count_tokens, profile_values, token_budget
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 EMERGENT_API_KEY = os.getenv('EMERGENT_LLM_KEY')
 
-class ProfeMarceChat:
-    def __init__(self, education_level: str = "secundario"):
-        self.education_level = education_level
-        self.system_message = self._get_system_message()
-    
-    def _get_system_message(self) -> str:
-        base = "Sos 'Profe Marce', una asistente educativa especializada en estadística. "
-        base += "Hablás en español argentino de forma clara, amable y respetuosa. "
-        base += "Tu objetivo es enseñar pensamiento estadístico, no dar respuestas directas sin explicación. "
-        base += "IMPORTANTE: No uses modismos como 'che', 'piola', 'copado' o jerga informal. Mantené un tono amable pero educado y formal. "
-        base += "Podés usar markdown para dar formato (negritas, listas, etc.) y LaTeX para fórmulas matemáticas. "
-        base += "Para LaTeX usá $formula$ para inline y $$formula$$ para display. "
-        
-        if self.education_level == "primario":
-            base += "Estás hablando con estudiantes de 6 a 12 años. "
-            base += "REGLAS IMPORTANTES: "
-            base += "1. Respuestas MUY CORTAS (máximo 3-4 oraciones simples). "
-            base += "2. Usá palabras simples que un niño entienda. "
-            base += "3. Un solo concepto por vez. "
-            base += "4. Ejemplos con cosas que los niños conocen (juguetes, animales, comida). "
-            base += "5. Si usás fórmulas, explicá cada parte en palabras muy simples. "
-        elif self.education_level == "secundario":
-            base += "Estás hablando con estudiantes de secundaria (13 a 17 años). "
-            base += "REGLAS IMPORTANTES: "
-            base += "1. Usá un lenguaje académico pero accesible para adolescentes. "
-            base += "2. Explicá los conceptos paso a paso con ejemplos prácticos. "
-            base += "3. Cuando uses fórmulas, explicá cada componente claramente. "
-            base += "4. Relacioná los conceptos con situaciones cotidianas que los adolescentes entiendan. "
-            base += "5. Podés usar terminología técnica pero siempre con una explicación. "
-            base += "6. Las respuestas deben ser completas pero no excesivamente largas. "
-            base += "7. NO uses modismos informales ni jerga de internet. Mantené un tono respetuoso y profesional. "
-        elif self.education_level == "superior":
-            base += "Estás hablando con estudiantes universitarios y profesionales. "
-            base += "REGLAS IMPORTANTES: "
-            base += "1. Usá un lenguaje académico formal apropiado para nivel universitario. "
-            base += "2. Podés usar terminología técnica avanzada: inferencia, estimadores, distribuciones muestrales, etc. "
-            base += "3. Explicá con rigor matemático usando notación estándar (LaTeX). "
-            base += "4. Incluí fórmulas cuando sea relevante, explicando cada componente. "
-            base += "5. Hacé referencia a conceptos como: pruebas de hipótesis, intervalos de confianza, regresión, correlación, ANOVA, distribuciones de probabilidad. "
-            base += "6. Discutí supuestos, limitaciones y consideraciones metodológicas. "
-            base += "7. Mantené un tono profesional y académico, sin modismos informales. "
-            base += "8. Las respuestas pueden ser más extensas y detalladas si el tema lo requiere. "
-        else:
-            base += "Usá terminología técnica cuando sea apropiado, pero siempre explicá el razonamiento. "
-            base += "Mantené un nivel académico apropiado con notación matemática estándar."
-        
-        return base
-    
-    async def chat(self, user_message: str, session_id: str) -> str:
-        try:
-            chat = LlmChat(
-                api_key=EMERGENT_API_KEY,
-                session_id=session_id,
-                system_message=self.system_message
-            ).with_model("openai", "gpt-5.1")
-            
-            message = UserMessage(text=user_message)
-            response = await chat.send_message(message)
-            return response
-        except Exception as e:
-            return f"Lo siento, tuve un problema: {str(e)}"
-
-class ReportGenerator:
-    @staticmethod
-    async def generate_report(project_data: dict, education_level: str) -> str:
-        try:
-            if education_level == "primario":
-                latex_example = r"$\text{Media} = \frac{\text{Suma}}{\text{Cantidad}}$"
-                prompt = f"""
+EDUCATION_LEVELS = ("primario", "secundario", "superior")
+
+def _system_message(education_level: str) -> str:
+    base = "Sos 'Profe Marce', una asistente educativa especializada en estadística. "
+    base += "Hablás en español argentino de forma clara, amable y respetuosa. "
+    base += "Tu objetivo es enseñar pensamiento estadístico, no dar respuestas directas sin explicación. "
+    base += "IMPORTANTE: No uses modismos como 'che', 'piola', 'copado' o jerga informal. Mantené un tono amable pero educado y formal. "
+    base += "Podés usar markdown para dar formato (negritas, listas, etc.) y LaTeX para fórmulas matemáticas. "
+    base += "Para LaTeX usá $formula$ para inline y $$formula$$ para display. "
+
+    if education_level == "primario":
+        base += "Estás hablando con estudiantes de 6 a 12 años. "
+        base += "REGLAS IMPORTANTES: "
+        base += "1. Respuestas MUY CORTAS (máximo 3-4 oraciones simples). "
+        base += "2. Usá palabras simples que un niño entienda. "
+        base += "3. Un solo concepto por vez. "
+        base += "4. Ejemplos con cosas que los niños conocen (juguetes, animales, comida). "
+        base += "5. Si usás fórmulas, explicá cada parte en palabras muy simples. "
+    elif education_level == "secundario":
+        base += "Estás hablando con estudiantes de secundaria (13 a 17 años). "
+        base += "REGLAS IMPORTANTES: "
+        base += "1. Usá un lenguaje académico pero accesible para adolescentes. "
+        base += "2. Explicá los conceptos paso a paso con ejemplos prácticos. "
+        base += "3. Cuando uses fórmulas, explicá cada componente claramente. "
+        base += "4. Relacioná los conceptos con situaciones cotidianas que los adolescentes entiendan. "
+        base += "5. Podés usar terminología técnica pero siempre con una explicación. "
+        base += "6. Las respuestas deben ser completas pero no excesivamente largas. "
+        base += "7. NO uses modismos informales ni jerga de internet. Mantené un tono respetuoso y profesional. "
+    elif education_level == "superior":
+        base += "Estás hablando con estudiantes universitarios y profesionales. "
+        base += "REGLAS IMPORTANTES: "
+        base += "1. Usá un lenguaje académico formal apropiado para nivel universitario. "
+        base += "2. Podés usar terminología técnica avanzada: inferencia, estimadores, distribuciones muestrales, etc. "
+        base += "3. Explicá con rigor matemático usando notación estándar (LaTeX). "
+        base += "4. Incluí fórmulas cuando sea relevante, explicando cada componente. "
+        base += "5. Hacé referencia a conceptos como: pruebas de hipótesis, intervalos de confianza, regresión, correlación, ANOVA, distribuciones de probabilidad. "
+        base += "6. Discutí supuestos, limitaciones y consideraciones metodológicas. "
+        base += "7. Mantené un tono profesional y académico, sin modismos informales. "
+        base += "8. Las respuestas pueden ser más extensas y detalladas si el tema lo requiere. "
+    else:
+        base += "Usá terminología técnica cuando sea apropiado, pero siempre explicá el razonamiento. "
+        base += "Mantené un nivel académico apropiado con notación matemática estándar."
+
+    return base
+
+
+# Built once per process; any other level gets the generic message
+SYSTEM_MESSAGES: Dict[str, str] = {level: _system_message(level) for level in EDUCATION_LEVELS}
+DEFAULT_SYSTEM_MESSAGE = _system_message("")
+
+REPORT_SYSTEM_MESSAGE = "Sos una experta en estadística educativa que genera reportes claros y pedagógicos en español argentino. Usás un tono formal, amable y respetuoso. Nunca usás modismos informales."
+
+# Bump whenever REPORT_SYSTEM_MESSAGE or a template changes: cached reports
+# are keyed by it
+REPORT_PROMPT_VERSION = 2
+
+# str.format templates filled with name, analysisType, variables, sampleData, statistics
+REPORT_PROMPTS: Dict[str, str] = {
+    "primario": """
 Generá un reporte estadístico educativo en español argentino para estudiantes de nivel primario (6 a 12 años).
 
 Datos del proyecto:
-- Nombre: {project_data.get('name', 'Sin nombre')}
-- Tipo de análisis: {project_data.get('analysisType', 'univariado')}
-- Variables: {project_data.get('variables', [])}
-- Datos: {project_data.get('sampleData', [])}
-- Estadísticas calculadas: {project_data.get('statistics', {})}
+- Nombre: {name}
+- Tipo de análisis: {analysisType}
+- Variables: {variables}
+- Datos: {sampleData}
+- Estadísticas calculadas: {statistics}
 
 IMPORTANTE: Este reporte es PARA LOS ESTUDIANTES, no para el docente.
 - Extensión: 10-15 oraciones simples (podés usar más si es necesario para explicar bien)
@@ -105,18 +101,17 @@ Podés usar:
 - **LaTeX** para fórmulas: usa $formula$ para inline y $$formula$$ para display
 - Explicá las fórmulas en palabras simples
 
-Ejemplo: {latex_example}
-"""
-            elif education_level == "secundario":
-                prompt = f"""
+Ejemplo: $\\text{{Media}} = \\frac{{\\text{{Suma}}}}{{\\text{{Cantidad}}}}$
+""",
+    "secundario": """
 Generá un reporte estadístico educativo completo en español argentino para estudiantes de nivel secundario (13 a 17 años).
 
 Datos del proyecto:
-- Nombre del proyecto: {project_data.get('name', 'Sin nombre')}
-- Tipo de análisis: {project_data.get('analysisType', 'univariado')}
-- Variables analizadas: {project_data.get('variables', [])}
-- Muestra de datos: {project_data.get('sampleData', [])}
-- Estadísticas calculadas: {project_data.get('statistics', {})}
+- Nombre del proyecto: {name}
+- Tipo de análisis: {analysisType}
+- Variables analizadas: {variables}
+- Muestra de datos: {sampleData}
+- Estadísticas calculadas: {statistics}
 
 IMPORTANTE: Este reporte es PARA LOS ESTUDIANTES, no para el docente.
 
@@ -157,17 +152,16 @@ Usá:
 - Ejemplo de fórmula: $\\bar{{x}} = \\frac{{\\sum x_i}}{{n}}$
 
 El reporte debe tener aproximadamente 15-20 oraciones en total.
-"""
-            elif education_level == "superior":
-                prompt = f"""
+""",
+    "superior": """
 Generá un informe estadístico académico completo en español argentino para estudiantes universitarios y profesionales.
 
 Datos del proyecto:
-- Nombre del proyecto: {project_data.get('name', 'Sin nombre')}
-- Tipo de análisis: {project_data.get('analysisType', 'univariado')}
-- Variables analizadas: {project_data.get('variables', [])}
-- Muestra de datos: {project_data.get('sampleData', [])}
-- Estadísticas calculadas: {project_data.get('statistics', {})}
+- Nombre del proyecto: {name}
+- Tipo de análisis: {analysisType}
+- Variables analizadas: {variables}
+- Muestra de datos: {sampleData}
+- Estadísticas calculadas: {statistics}
 
 IMPORTANTE: Este informe es para nivel universitario/profesional.
 
@@ -226,17 +220,18 @@ Usá:
 - Notación estadística estándar
 
 El informe debe ser completo y riguroso, aproximadamente 25-35 oraciones.
-"""
-            else:
-                prompt = f"""
+""",
+}
+
+GENERIC_REPORT_PROMPT = """
 Generá un reporte estadístico educativo en español argentino para nivel {education_level}.
 
 Datos del proyecto:
-- Nombre: {project_data.get('name', 'Sin nombre')}
-- Tipo de análisis: {project_data.get('analysisType', 'univariado')}
-- Variables: {project_data.get('variables', [])}
-- Datos: {project_data.get('sampleData', [])}
-- Estadísticas calculadas: {project_data.get('statistics', {})}
+- Nombre: {name}
+- Tipo de análisis: {analysisType}
+- Variables: {variables}
+- Datos: {sampleData}
+- Estadísticas calculadas: {statistics}
 
 El reporte debe incluir:
 1. Descripción del dataset
@@ -249,15 +244,141 @@ El reporte debe incluir:
 
 Adaptá el lenguaje al nivel educativo. No uses modismos informales.
 """
-            
-            chat = LlmChat(
-                api_key=EMERGENT_API_KEY,
-                session_id=f"report_{project_data.get('id', 'temp')}",
-                system_message="Sos una experta en estadística educativa que genera reportes claros y pedagógicos en español argentino. Usás un tono formal, amable y respetuoso. Nunca usás modismos informales."
-            ).with_model("openai", "gpt-5.1")
-            
+
+
+def report_digest(project_data: dict, education_level: str) -> dict:
+    """Data section of the prompt within the level's token budget. Uses the
+    stored column profiles when the caller loaded them; otherwise the
+    variables are profiled from their values."""
+    sample = project_data.get('sampleData', [])
+    profiles = project_data.get('profiles')
+    row_count = project_data.get('rowCount')
+    if profiles is None:
+        columns = {
+            var['name']: var.get('values', []) for var in project_data.get('variables', [])
+            if isinstance(var, dict) and 'name' in var
+        }
+        profiles = profile_values(columns)
+        if row_count is None:
+            row_count = max((len(values) for values in columns.values()), default=len(sample))
+    return build_digest(
+        profiles,
+        row_count if row_count is not None else len(sample),
+        sample,
+        project_data.get('statistics', {}),
+        token_budget(education_level)
+    )
+
+
+def report_fields(project_data: dict, education_level: str) -> dict:
+    """The part of `project_data` that reaches the prompt."""
+    digest = report_digest(project_data, education_level)
+    return {
+        "name": project_data.get('name', 'Sin nombre'),
+        "analysisType": project_data.get('analysisType', 'univariado'),
+        "variables": digest['variables'],
+        "sampleData": digest['sampleData'],
+        "statistics": digest['statistics'],
+    }
+
+
+def report_prompt(project_data: dict, education_level: str) -> str:
+    fields = report_fields(project_data, education_level)
+    template = REPORT_PROMPTS.get(education_level)
+    if template is None:
+        return GENERIC_REPORT_PROMPT.format(education_level=education_level, **fields)
+    return template.format(**fields)
+
+
+llm_metrics = LlmMetrics(count_tokens)
+llm_clients = LlmClients(LlmChat, EMERGENT_API_KEY, instrument=llm_metrics.wrap)
+chat_cache = ChatCache(embedder=load_embedder())
+
+
+async def _stream_reply(chat, message: UserMessage) -> AsyncIterator[str]:
+    # Clients stream through litellm when LLM_API_BASE or
+    # LLM_PROVIDER_KEY is set; otherwise they answer in one piece
+    stream = getattr(chat, "stream_message", None)
+    if stream is None:
+        yield await chat.send_message(message)
+        return
+    async for piece in stream(message):
+        if piece:
+            yield piece
+
+
+class ProfeMarceChat:
+    _instances: Dict[str, "ProfeMarceChat"] = {}
+
+    def __init__(self, education_level: str = "secundario", clients: Optional[LlmClients] = None,
+                 cache: Optional[ChatCache] = None):
+        self.education_level = education_level
+        self.system_message = SYSTEM_MESSAGES.get(education_level, DEFAULT_SYSTEM_MESSAGE)
+        # Levels without their own message share one key for clients and cache
+        self.client_key = education_level if education_level in SYSTEM_MESSAGES else "general"
+        self.clients = clients or llm_clients
+        self.cache = cache or chat_cache
+
+    @classmethod
+    def for_level(cls, education_level: str) -> "ProfeMarceChat":
+        if education_level not in SYSTEM_MESSAGES:
+            return cls(education_level)
+        profe = cls._instances.get(education_level)
+        if profe is None:
+            profe = cls._instances[education_level] = cls(education_level)
+        return profe
+
+    async def _ask(self, user_message: str, session_id: str) -> str:
+        async with self.clients.client(self.client_key, self.system_message, session_id) as chat:
+            message = UserMessage(text=user_message)
+            return await chat.send_message(message)
+
+    async def chat(self, user_message: str, session_id: str, use_cache: bool = True) -> str:
+        try:
+            return await self.cache.get_or_ask(
+                self.client_key, user_message, lambda: self._ask(user_message, session_id), use_cache
+            )
+        except Exception as e:
+            return f"Lo siento, tuve un problema: {str(e)}"
+
+    async def chat_stream(self, user_message: str, session_id: str, use_cache: bool = True) -> AsyncIterator[str]:
+        cacheable = self.cache.cacheable(self.client_key, user_message, use_cache)
+        vector = None
+        if cacheable:
+            cached, vector = await self.cache.lookup(self.client_key, user_message)
+            if cached is not None:
+                yield cached
+                return
+
+        pieces = []
+        async with self.clients.client(self.client_key, self.system_message, session_id) as chat:
+            async for piece in _stream_reply(chat, UserMessage(text=user_message)):
+                pieces.append(piece)
+                yield piece
+        if cacheable:
+            self.cache.store(self.client_key, user_message, "".join(pieces), vector)
+
+class ReportGenerator:
+    @staticmethod
+    async def generate(project_data: dict, education_level: str, clients: Optional[LlmClients] = None) -> str:
+        prompt = report_prompt(project_data, education_level)
+        session_id = f"report_{project_data.get('id', 'temp')}"
+        async with (clients or llm_clients).client("report", REPORT_SYSTEM_MESSAGE, session_id) as chat:
             message = UserMessage(text=prompt)
-            response = await chat.send_message(message)
-            return response
+            return await chat.send_message(message)
+
+    @staticmethod
+    async def generate_report(project_data: dict, education_level: str, clients: Optional[LlmClients] = None) -> str:
+        try:
+            return await ReportGenerator.generate(project_data, education_level, clients)
         except Exception as e:
-            return f"Error generando reporte: {str(e)}"
\ No newline at end of file
+            return f"Error generando reporte: {str(e)}"
+
+    @staticmethod
+    async def stream_report(project_data: dict, education_level: str,
+                            clients: Optional[LlmClients] = None) -> AsyncIterator[str]:
+        prompt = report_prompt(project_data, education_level)
+        session_id = f"report_{project_data.get('id', 'temp')}"
+        async with (clients or llm_clients).client("report", REPORT_SYSTEM_MESSAGE, session_id) as chat:
+            async for piece in _stream_reply(chat, UserMessage(text=prompt)):
+                yield piece
@@ -0,0 +1,313 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from xml.etree.ElementTree import ParseError, iterparse
+from zipfile import BadZipFile, ZipFile
+import math
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+
+from profiling import stage
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW = _MAIN + "row"
+_VALUE = _MAIN + "v"
+_INLINE = _MAIN + "is"
+_TEXT = _MAIN + "t"
+
+# Built-in number formats that render as dates or times (ECMA-376 18.8.30)
+_DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+_FORMAT_NOISE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+_CELL_REF = re.compile(r"[A-Z]+")
+
+
+# A workbook as bytes, a path or a seekable binary file
+ExcelSource = Union[bytes, str, BinaryIO]
+
+
+class ExcelFormatError(ValueError):
+    pass
+
+
+def _open(source: ExcelSource):
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+
+def spool_to_disk(fileobj: BinaryIO, suffix: str = "") -> Tuple[str, int]:
+    """Copy an upload to a named temporary file in blocks, so a worker
+    process can open it by path. Returns the path and the size in bytes;
+    the caller removes the file."""
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as out:
+        shutil.copyfileobj(fileobj, out)
+        return out.name, out.tell()
+
+
+def remove_spooled(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _header_names(raw: Sequence[Any]) -> List[str]:
+    # Same naming pandas uses: blank headers become "Unnamed: i" and
+    # repeated ones get a ".n" suffix
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(raw):
+        name = f"Unnamed: {i}" if value is None or value == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _column_index(ref: str, cache: Dict[str, int]) -> int:
+    letters = _CELL_REF.match(ref).group()
+    index = cache.get(letters)
+    if index is None:
+        index = 0
+        for ch in letters:
+            index = index * 26 + ord(ch) - 64
+        index -= 1
+        cache[letters] = index
+    return index
+
+
+def _text(elem) -> str:
+    # Rich text runs split one string over several <t> elements
+    return "".join(t.text or "" for t in elem.iter(_TEXT))
+
+
+class _Workbook:
+    """Just enough of the package to stream one worksheet: sheet names,
+    shared strings and which cell styles are dates."""
+
+    def __init__(self, archive: ZipFile):
+        self.archive = archive
+        try:
+            root = self._xml("xl/workbook.xml")
+            rels = self._xml("xl/_rels/workbook.xml.rels")
+        except KeyError as exc:
+            raise ExcelFormatError("El archivo no es un libro .xlsx") from exc
+
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(_PKG_REL + "Relationship")}
+        self.sheets: List[Tuple[str, str]] = []
+        for sheet in root.iter(_MAIN + "sheet"):
+            target = targets.get(sheet.get(_REL + "id"), "")
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            self.sheets.append((sheet.get("name"), path))
+        if not self.sheets:
+            raise ExcelFormatError("El libro no tiene hojas")
+
+        props = root.find(_MAIN + "workbookPr")
+        date1904 = props is not None and props.get("date1904") in ("1", "true")
+        self.epoch = datetime(1904, 1, 1) if date1904 else datetime(1899, 12, 30)
+        self._strings: Optional[List[str]] = None
+        self.date_styles = self._date_styles()
+
+    def _xml(self, name: str):
+        with self.archive.open(name) as fh:
+            for _, elem in iterparse(fh):
+                pass
+        return elem
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [name for name, _ in self.sheets]
+
+    def sheet(self, sheet: Optional[str]) -> Tuple[str, str]:
+        if sheet is None:
+            return self.sheets[0]
+        for name, path in self.sheets:
+            if name == sheet:
+                return name, path
+        if sheet.isdigit() and int(sheet) < len(self.sheets):
+            return self.sheets[int(sheet)]
+        raise ValueError(f"Hoja no encontrada: {sheet}")
+
+    @property
+    def strings(self) -> List[str]:
+        # Loaded on the first shared-string cell; numeric-only sheets never pay for it
+        if self._strings is None:
+            self._strings = []
+            if "xl/sharedStrings.xml" in self.archive.namelist():
+                with self.archive.open("xl/sharedStrings.xml") as fh:
+                    for _, elem in iterparse(fh):
+                        if elem.tag == _MAIN + "si":
+                            self._strings.append(_text(elem))
+                            elem.clear()
+        return self._strings
+
+    def _date_styles(self) -> Set[int]:
+        if "xl/styles.xml" not in self.archive.namelist():
+            return set()
+        root = self._xml("xl/styles.xml")
+        custom = {}
+        for fmt in root.iter(_MAIN + "numFmt"):
+            code = _FORMAT_NOISE.sub("", fmt.get("formatCode", "")).lower()
+            custom[int(fmt.get("numFmtId"))] = any(ch in code for ch in "dmyhs")
+        xfs = root.find(_MAIN + "cellXfs")
+        if xfs is None:
+            return set()
+        styles = set()
+        for i, xf in enumerate(xfs.iter(_MAIN + "xf")):
+            fmt_id = int(xf.get("numFmtId", 0))
+            if fmt_id in _DATE_FORMAT_IDS or custom.get(fmt_id):
+                styles.add(i)
+        return styles
+
+    def value(self, cell) -> Any:
+        kind = cell.get("t", "n")
+        if kind == "inlineStr":
+            inline = cell.find(_INLINE)
+            return _text(inline) if inline is not None else None
+        raw = cell.findtext(_VALUE)
+        if not raw or kind == "e":
+            return None
+        if kind == "s":
+            return self.strings[int(raw)]
+        if kind in ("str", "d"):
+            return raw
+        if kind == "b":
+            return raw == "1"
+
+        number = float(raw)
+        style = cell.get("s")
+        if style is not None and int(style) in self.date_styles:
+            return self.epoch + timedelta(days=number)
+        if math.isnan(number):
+            return None
+        return int(number) if number.is_integer() and "." not in raw and "E" not in raw.upper() else number
+
+
+def _iter_rows(book: _Workbook, path: str, wanted: Optional[Set[int]]) -> Iterator[Tuple[int, Dict[int, Any]]]:
+    """Yield (row number, {column index: value}) in sheet order.
+
+    Cells outside `wanted` are skipped before their value is decoded, and each
+    row is dropped from the tree once yielded so memory stays flat.
+    """
+    cache: Dict[str, int] = {}
+    sheet_data = None
+    last_row = 0
+    with book.archive.open(path) as fh:
+        for event, elem in iterparse(fh, events=("start", "end")):
+            if event == "start":
+                if sheet_data is None and elem.tag == _MAIN + "sheetData":
+                    sheet_data = elem
+                continue
+            if elem.tag != _ROW:
+                continue
+
+            ref = elem.get("r")
+            last_row = int(ref) if ref else last_row + 1
+            values: Dict[int, Any] = {}
+            position = -1
+            for cell in elem:
+                cell_ref = cell.get("r")
+                position = _column_index(cell_ref, cache) if cell_ref else position + 1
+                if wanted is None or position in wanted:
+                    value = book.value(cell)
+                    if value is not None and value != "":
+                        values[position] = value
+            if sheet_data is not None:
+                sheet_data.remove(elem)
+            yield last_row, values
+
+
+def read_xlsx_projection(source: ExcelSource, sheet: Optional[str] = None,
+                         columns: Optional[Sequence[str]] = None,
+                         row_start: int = 0, row_limit: Optional[int] = None) -> Dict[str, Any]:
+    """Stream one sheet of an .xlsx, keeping only the requested columns and
+    data rows.
+
+    Only the selected worksheet's XML is parsed, cells outside the projection
+    are never decoded and the scan stops at the end of the row range. Given a
+    path or file, the archive is read from it without loading it whole.
+
+    Two differences from pd.read_excel on the same sheet:
+      - rows with no value in the projected columns are dropped (pandas
+        keeps them as all-NaN rows; the pandas fallback drops them too), and
+        `row_start`/`row_limit` count sheet rows, blank ones included;
+      - columns are those of the header row: cells to the right of the
+        last header cell are discarded, where pandas adds "Unnamed: i"
+        columns for them.
+    """
+    with ZipFile(_open(source)) as archive:
+        with stage("excel.open"):
+            book = _Workbook(archive)
+            name, path = book.sheet(sheet)
+
+            rows = _iter_rows(book, path, None)
+            first_row = next(rows, None)
+            rows.close()
+        if first_row is None:
+            return {"data": [], "columns": [], "sheet": name, "sheets": book.sheet_names}
+
+        header_row, header = first_row
+        names = _header_names([header.get(i) for i in range(max(header) + 1)] if header else [])
+        if columns:
+            missing = [c for c in columns if c not in names]
+            if missing:
+                raise ValueError(f"Columnas no encontradas: {', '.join(missing)}")
+            indexes = [names.index(c) for c in columns]
+            selected = list(columns)
+        else:
+            indexes = list(range(len(names)))
+            selected = names
+
+        data: List[Dict[str, Any]] = []
+        first = header_row + 1 + row_start
+        last = None if row_limit is None else first + row_limit - 1
+        with stage("excel.rows"):
+            for row_number, values in _iter_rows(book, path, set(indexes)):
+                if row_number < first:
+                    continue
+                if last is not None and row_number > last:
+                    break
+                if values:
+                    data.append({col: values.get(i) for col, i in zip(selected, indexes)})
+
+        return {"data": data, "columns": selected, "sheet": name, "sheets": book.sheet_names}
+
+
+def read_excel_projection(source: ExcelSource, sheet: Optional[str] = None,
+                          columns: Optional[Sequence[str]] = None,
+                          row_start: int = 0, row_limit: Optional[int] = None) -> Dict[str, Any]:
+    """Streaming reader for .xlsx with a pandas fallback for other formats."""
+    try:
+        return read_xlsx_projection(source, sheet, columns, row_start, row_limit)
+    except (BadZipFile, ExcelFormatError, ParseError):
+        pass
+
+    import pandas as pd
+
+    sheet_name: Any = 0
+    if sheet is not None:
+        sheet_name = int(sheet) if sheet.isdigit() else sheet
+    with stage("excel.pandas_read"):
+        df = pd.read_excel(
+            _open(source),
+            sheet_name=sheet_name,
+            usecols=list(columns) if columns else None,
+            skiprows=range(1, row_start + 1) if row_start else None,
+            nrows=row_limit
+        )
+    with stage("excel.to_dict"):
+        df = df.dropna(how='all')
+        data = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return {"data": data, "columns": [str(c) for c in df.columns], "sheet": str(sheet_name), "sheets": []}
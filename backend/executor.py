@@ -0,0 +1,185 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import multiprocessing
+import os
+import time
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from profiling import current_profile, current_stages, run_profiled
+
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+CPU_POOL_QUEUE_LIMIT = int(os.environ.get('CPU_POOL_QUEUE_LIMIT', 16))
+# Small inputs cost less to compute than to pickle into another process
+CPU_POOL_INLINE_BELOW = int(os.environ.get('CPU_POOL_INLINE_BELOW', 5000))
+
+_WAIT_SAMPLES = 1024
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict, submitted_at: float):
+    # Runs in the worker: wall clock is shared between processes on one host
+    started_at = time.time()
+    return started_at - submitted_at, fn(*args, **kwargs)
+
+
+class CpuPool:
+    """Bounded execution layer for CPU-heavy ingestion and statistics work.
+
+    At most `workers` jobs run at once and at most `queue_limit` more may
+    wait; beyond that callers get a 503 so load sheds instead of piling up
+    on the event loop.
+    """
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, queue_limit: int = CPU_POOL_QUEUE_LIMIT,
+                 inline_below: int = CPU_POOL_INLINE_BELOW):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.inline_below = inline_below
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.inline = 0
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+        self._wait_sum = 0.0
+        self._wait_count = 0
+        self._wait_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that owns an event loop and a Mongo client is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _admit(self):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                503,
+                "El servidor está procesando demasiados cálculos. Intentá de nuevo en unos segundos.",
+                headers={"Retry-After": "2"}
+            )
+        self.in_flight += 1
+        self.submitted += 1
+
+    def _record_wait(self, wait: float):
+        wait = max(0.0, wait)
+        self._waits.append(wait)
+        self._wait_sum += wait
+        self._wait_count += 1
+        self._wait_max = max(self._wait_max, wait)
+
+    async def run(self, fn: Callable, *args, work_size: Optional[int] = None, **kwargs) -> Any:
+        """Run a picklable module-level function in the process pool.
+
+        In a profiled request the worker profiles the call itself and its
+        stages and samples are merged under the caller's open stages."""
+        if work_size is not None and work_size < self.inline_below:
+            self.inline += 1
+            return fn(*args, **kwargs)
+
+        self._admit()
+        loop = asyncio.get_running_loop()
+        profile = current_profile()
+        if profile is not None:
+            fn, args = run_profiled, (fn, profile.interval) + args
+        try:
+            wait, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, args, kwargs, time.time()
+            )
+            self._record_wait(wait)
+            if profile is not None:
+                result, part = result
+                profile.merge(part, current_stages())
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def run_partitioned(self, fn: Callable, items: Dict[str, Any], *args,
+                              weight: Callable[[Any], int] = len, **kwargs) -> Dict[str, Any]:
+        """Spread a dict of independent work items over the workers.
+
+        Items are packed into at most `workers` groups of similar total
+        weight and `fn(group, *args)` runs once per group, so a wide dataset
+        uses every worker without one queue slot per item.
+        """
+        groups: List[Dict[str, Any]] = [{} for _ in range(max(1, min(self.workers, len(items))))]
+        loads = [0] * len(groups)
+        for key, value in sorted(items.items(), key=lambda item: -weight(item[1])):
+            i = loads.index(min(loads))
+            groups[i][key] = value
+            loads[i] += weight(value)
+
+        results = await asyncio.gather(*(
+            self.run(fn, group, *args, work_size=load, **kwargs)
+            for group, load in zip(groups, loads) if group
+        ))
+        merged: Dict[str, Any] = {}
+        for result in results:
+            merged.update(result)
+        return {key: merged[key] for key in items}
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs) -> Any:
+        """Same admission and metrics for work tied to in-process objects
+        (e.g. an open upload file), executed in the thread pool."""
+        self._admit()
+        if self._threads is None:
+            self._threads = asyncio.Semaphore(self.workers)
+        profile = current_profile()
+        if profile is not None:
+            fn = profile.attach(fn)
+        submitted_at = time.perf_counter()
+        try:
+            async with self._threads:
+                self._record_wait(time.perf_counter() - submitted_at)
+                result = await run_in_threadpool(fn, *args, **kwargs)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> Optional[float]:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else None
+
+        return {
+            "workers": self.workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "inline": self.inline,
+            "queueWaitSeconds": {
+                "count": self._wait_count,
+                "sum": self._wait_sum,
+                "max": self._wait_max,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+            },
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,176 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# "auto" bins numeric variables with more distinct values than this
+AUTO_BIN_THRESHOLD = 20
+MAX_BINS = 1000
+
+BINNING_METHODS = ("auto", "sturges", "scott", "fd", "width")
+
+# Columnar layout: one entry per class in every list
+#   {"type": "values", "values": [...], ...}
+#   {"type": "intervals", "lower": [...], "upper": [...], "classMark": [...], "labels": [...],
+#    "binning": {"method": ..., "bins": k, "width": h}, ...}
+# both with "count", "missing" and the lists "absolute", "relative",
+# "percentage", "cumulative", "cumulativeRelative", "cumulativePercentage"
+
+
+def _numeric(obj: np.ndarray) -> Optional[np.ndarray]:
+    if obj.dtype.kind in "iuf":
+        return obj.astype(np.float64, copy=False)
+    kind = pd.api.types.infer_dtype(obj, skipna=True)
+    if kind not in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return None
+    return pd.to_numeric(pd.Series(obj), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _bin_edges(arr: np.ndarray, method: str, width: Optional[float]) -> np.ndarray:
+    if method == "width":
+        if width is None or width <= 0:
+            raise ValueError("La amplitud de clase debe ser mayor que 0")
+        lo, hi = float(arr.min()), float(arr.max())
+        bins = max(1, int(np.ceil((hi - lo) / width)))
+        # A value equal to an upper edge belongs to the next class, so the
+        # maximum needs a class of its own when it lands exactly on an edge
+        if lo + bins * width <= hi:
+            bins += 1
+        if bins > MAX_BINS:
+            raise ValueError(f"La amplitud genera más de {MAX_BINS} clases")
+        return lo + width * np.arange(bins + 1)
+
+    if method == "fd" and np.subtract(*np.percentile(arr, [75, 25])) == 0:
+        # Zero IQR gives zero width; Sturges still describes the spread
+        method = "sturges"
+    edges = np.histogram_bin_edges(arr, bins=method)
+    if edges.size - 1 > MAX_BINS:
+        edges = np.histogram_bin_edges(arr, bins=MAX_BINS)
+    return edges
+
+
+def _label(value: float) -> str:
+    return f"{value:.6g}"
+
+
+def _first_seen(original: Sequence[Any], codes: np.ndarray, size: int,
+                present: Optional[np.ndarray] = None) -> List[Any]:
+    # Each class is labelled with the first value seen for it, keeping its own
+    # type, so [1, 2.5] gives 1 and 2.5 (and 1 and 1.0 share a class) as Counter did
+    seen = pd.Series(codes).drop_duplicates()
+    first = np.empty(size, dtype=np.int64)
+    first[seen.to_numpy()] = seen.index.to_numpy()
+    if present is not None:
+        first = np.flatnonzero(present)[first]
+    labels = [original[i] for i in first.tolist()]
+    return [v if isinstance(v, (int, float)) else float(v) for v in labels]
+
+
+def _with_frequencies(table: Dict[str, Any], counts: np.ndarray) -> Dict[str, Any]:
+    total = int(counts.sum())
+    cumulative = np.cumsum(counts)
+    relative = counts / total if total else counts.astype(np.float64)
+    cumulative_relative = cumulative / total if total else cumulative.astype(np.float64)
+    table.update({
+        "count": total,
+        "absolute": counts.tolist(),
+        "relative": relative.tolist(),
+        "percentage": (relative * 100).tolist(),
+        "cumulative": cumulative.tolist(),
+        "cumulativeRelative": cumulative_relative.tolist(),
+        "cumulativePercentage": (cumulative_relative * 100).tolist(),
+    })
+    return table
+
+
+def frequency_table(values: Sequence[Any], binning: Optional[str] = None,
+                    bin_width: Optional[float] = None, original: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """Frequency table of one variable in columnar form.
+
+    Values are factorized once (hash-based, no sorting of the raw data) and
+    every frequency kind is derived from the same count vector. Numeric
+    variables come out in ascending order so cumulative columns make sense;
+    qualitative ones keep first-appearance order. With `binning` numeric
+    data is grouped into class intervals [a, b), the last one closed.
+    `original` is the raw sequence a float array was converted from; value
+    classes then keep the int or float type they had there.
+    """
+    if binning is not None and binning not in BINNING_METHODS:
+        raise ValueError(f"Método de agrupamiento desconocido: {binning}")
+
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iuf":
+        obj = values
+    else:
+        # tolist() turns numpy scalars (np.str_ etc.) into plain Python values
+        obj = np.asarray(values.tolist() if isinstance(values, np.ndarray) else values, dtype=object)
+    arr = _numeric(obj)
+    if arr is not None:
+        missing = np.isnan(arr)
+        present = arr[~missing] if missing.any() else arr
+        n_missing = int(missing.sum())
+
+        if binning == "auto" and present.size and pd.unique(present).size <= AUTO_BIN_THRESHOLD:
+            binning = None
+        if binning == "auto":
+            binning = "sturges"
+
+        if binning is not None and present.size:
+            edges = _bin_edges(present, binning, bin_width)
+            counts, _ = np.histogram(present, bins=edges)
+            lower, upper = edges[:-1], edges[1:]
+            labels = [f"[{_label(a)}, {_label(b)})" for a, b in zip(lower.tolist(), upper.tolist())]
+            labels[-1] = labels[-1][:-1] + "]"
+            table = {
+                "type": "intervals",
+                "missing": n_missing,
+                "lower": lower.tolist(),
+                "upper": upper.tolist(),
+                "classMark": ((lower + upper) / 2).tolist(),
+                "labels": labels,
+                "binning": {"method": binning, "bins": int(counts.size), "width": float(upper[0] - lower[0])},
+            }
+            return _with_frequencies(table, counts)
+
+        codes, uniques = pd.factorize(present, sort=True)
+        counts = np.bincount(codes, minlength=uniques.size)
+        if original is not None or obj.dtype == object:
+            table_values = _first_seen(obj if original is None else original, codes, uniques.size,
+                                       ~missing if n_missing else None)
+        else:
+            integral = uniques.size and np.all(np.mod(uniques, 1) == 0) and np.abs(uniques).max() < 2 ** 53
+            table_values = uniques.astype(np.int64).tolist() if integral else uniques.tolist()
+        return _with_frequencies({"type": "values", "missing": n_missing, "values": table_values}, counts)
+
+    if binning not in (None, "auto"):
+        raise ValueError("Solo las variables numéricas se pueden agrupar en clases")
+    codes, uniques = pd.factorize(obj, use_na_sentinel=True)
+    present = codes[codes >= 0]
+    counts = np.bincount(present, minlength=len(uniques))
+    table = {"type": "values", "missing": int(codes.size - present.size), "values": list(uniques)}
+    return _with_frequencies(table, counts)
+
+
+def frequency_from_counts(values: Sequence[Any], counts: Sequence[int], missing: int = 0) -> Dict[str, Any]:
+    """Table from already aggregated counts (e.g. running counts kept per
+    dataset column); numeric values are put in ascending order."""
+    counts_arr = np.asarray(counts, dtype=np.int64)
+    obj = np.asarray(list(values), dtype=object)
+    arr = _numeric(obj) if obj.size else None
+    if arr is not None and not np.isnan(arr).any():
+        order = np.argsort(arr, kind="stable")
+        uniques, counts_arr = arr[order], counts_arr[order]
+        integral = np.all(np.mod(uniques, 1) == 0) and np.abs(uniques).max() < 2 ** 53
+        table_values = uniques.astype(np.int64).tolist() if integral else uniques.tolist()
+    else:
+        table_values = list(values)
+    return _with_frequencies({"type": "values", "missing": int(missing), "values": table_values}, counts_arr)
+
+
+def frequency_dicts(table: Dict[str, Any]) -> Dict[str, Dict[Any, Any]]:
+    """The original three-dict response shape, keyed by value or class label."""
+    keys: List[Any] = table["labels"] if table["type"] == "intervals" else table["values"]
+    return {
+        "absoluteFrequency": dict(zip(keys, table["absolute"])),
+        "relativeFrequency": dict(zip(keys, table["relative"])),
+        "percentageFrequency": dict(zip(keys, table["percentage"])),
+    }
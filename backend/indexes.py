@@ -0,0 +1,193 @@
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from profiling import PROFILE_TTL_SECONDS
+from stats_cache import STATS_CACHE_TTL_SECONDS
+
+# Rows written before content hashing have no contentHash and may repeat
+_HASHED = {"contentHash": {"$exists": True}}
+
+
+def _index(keys: List[Tuple[str, int]], **options) -> IndexModel:
+    options.setdefault("name", "_".join(field for field, _ in keys))
+    return IndexModel(keys, **options)
+
+
+# Every filter and sort used by the API, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "projects": [
+        _index([("id", ASCENDING)], unique=True),
+        _index([("userId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "datasets": [
+        _index([("id", ASCENDING)], unique=True),
+        _index([("projectId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "datasetChunks": [
+        _index([("datasetId", ASCENDING), ("index", ASCENDING)], unique=True),
+        _index([("projectId", ASCENDING)]),
+    ],
+    "datasetSummaries": [
+        _index([("datasetId", ASCENDING)], unique=True),
+        _index([("projectId", ASCENDING)]),
+    ],
+    "statistics": [
+        _index([("projectId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)]),
+        _index([("projectId", ASCENDING), ("variableName", ASCENDING), ("contentHash", ASCENDING)],
+               unique=True, partialFilterExpression=_HASHED),
+    ],
+    "frequencyTables": [
+        _index([("projectId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)]),
+        _index([("projectId", ASCENDING), ("variableName", ASCENDING), ("contentHash", ASCENDING)],
+               unique=True, partialFilterExpression=_HASHED),
+    ],
+    "quantileSketches": [
+        _index([("datasetId", ASCENDING), ("variableName", ASCENDING)], unique=True),
+        _index([("projectId", ASCENDING)]),
+    ],
+    "statsCache": [
+        _index([("key", ASCENDING)], unique=True),
+        _index([("createdAt", ASCENDING)], expireAfterSeconds=STATS_CACHE_TTL_SECONDS),
+    ],
+    "reportJobs": [
+        _index([("id", ASCENDING)], unique=True),
+        _index([("status", ASCENDING), ("runAt", ASCENDING)]),
+        _index([("projectId", ASCENDING), ("educationLevel", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "reports": [
+        _index([("projectId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)]),
+        _index([("projectId", ASCENDING), ("fingerprint", ASCENDING), ("createdAt", ASCENDING)]),
+    ],
+    "requestProfiles": [
+        _index([("id", ASCENDING)], unique=True),
+        _index([("createdAt", ASCENDING)], expireAfterSeconds=PROFILE_TTL_SECONDS),
+        _index([("route", ASCENDING), ("createdAt", DESCENDING)]),
+    ],
+}
+
+# The query each read path runs, with placeholder values, for explain()
+ROUTE_QUERIES: List[Dict[str, Any]] = [
+    {"route": "GET /projects", "collection": "projects",
+     "filter": {"userId": "demo_user"}, "sort": [("createdAt", ASCENDING), ("id", ASCENDING)]},
+    {"route": "GET /projects/{project_id}", "collection": "projects", "filter": {"id": "?"}},
+    {"route": "GET /datasets/{project_id}", "collection": "datasets",
+     "filter": {"projectId": "?"}, "sort": [("createdAt", ASCENDING), ("id", ASCENDING)]},
+    {"route": "GET /datasets/{dataset_id}/summary", "collection": "datasets", "filter": {"id": "?"}},
+    {"route": "dataset chunks", "collection": "datasetChunks",
+     "filter": {"datasetId": "?"}, "sort": [("index", ASCENDING)]},
+    {"route": "dataset summaries", "collection": "datasetSummaries", "filter": {"datasetId": "?"}},
+    {"route": "GET /statistics/{project_id}", "collection": "statistics",
+     "filter": {"projectId": "?"}, "sort": [("createdAt", ASCENDING), ("id", ASCENDING)]},
+    {"route": "POST /statistics/calculate (dedup)", "collection": "statistics",
+     "filter": {"projectId": "?", "variableName": "?", "contentHash": "?"}},
+    {"route": "POST /statistics/frequency (dedup)", "collection": "frequencyTables",
+     "filter": {"projectId": "?", "variableName": "?", "contentHash": "?"}},
+    {"route": "GET /datasets/{dataset_id}/quantiles", "collection": "quantileSketches",
+     "filter": {"datasetId": "?", "variableName": "?"}},
+    {"route": "stats cache", "collection": "statsCache", "filter": {"key": "?"}},
+    {"route": "GET /reports/{project_id}", "collection": "reports",
+     "filter": {"projectId": "?"}, "sort": [("createdAt", ASCENDING), ("id", ASCENDING)]},
+    {"route": "report job queue", "collection": "reportJobs",
+     "filter": {"status": "queued"}, "sort": [("runAt", ASCENDING)]},
+    {"route": "POST /reports/jobs (dedup)", "collection": "reportJobs",
+     "filter": {"projectId": "?", "educationLevel": "?", "status": "?"}},
+    {"route": "GET /reports/jobs/{job_id}", "collection": "reportJobs", "filter": {"id": "?"}},
+    {"route": "POST /reports/generate (cache)", "collection": "reports",
+     "filter": {"projectId": "?", "fingerprint": "?"}, "sort": [("createdAt", DESCENDING)]},
+    {"route": "GET /system/profiles", "collection": "requestProfiles",
+     "filter": {"route": "?"}, "sort": [("createdAt", DESCENDING)]},
+    {"route": "GET /system/profiles/{profile_id}", "collection": "requestProfiles", "filter": {"id": "?"}},
+]
+
+
+def _same_index(spec: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    return (
+        list(spec["key"].items()) == [tuple(k) for k in existing.get("key", [])]
+        and bool(spec.get("unique")) == bool(existing.get("unique"))
+        and spec.get("partialFilterExpression") == existing.get("partialFilterExpression")
+    )
+
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """Create missing indexes and report what each collection has.
+
+    Failures (e.g. duplicates blocking a unique index) are reported per index
+    instead of stopping the server.
+    """
+    report: Dict[str, Any] = {}
+    for collection, models in INDEXES.items():
+        entries = []
+        for model in models:
+            spec = model.document
+            try:
+                await db[collection].create_indexes([model])
+                error = None
+            except OperationFailure as e:
+                error = str(e)
+            entries.append({"name": spec["name"], "error": error})
+        report[collection] = entries
+    return report
+
+
+async def verify_indexes(db) -> Dict[str, List[Dict[str, Any]]]:
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        entries = []
+        for model in models:
+            spec = model.document
+            found = existing.get(spec["name"])
+            if found is None:
+                status = "missing"
+            elif not _same_index(spec, found):
+                status = "mismatch"
+            else:
+                status = "ok"
+            entries.append({"name": spec["name"], "status": status})
+        result[collection] = entries
+    return result
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    stages = [plan]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine plans nest the classic tree under queryPlan
+    stages = _plan_stages(winning.get("queryPlan", winning))
+    names = [stage.get("stage") for stage in stages]
+    index_names = [stage["indexName"] for stage in stages if stage.get("indexName")]
+    return {
+        "stages": names,
+        "indexes": index_names,
+        "collectionScan": "COLLSCAN" in names,
+    }
+
+
+async def explain_routes(db) -> List[Dict[str, Any]]:
+    """Run explain() on every read path's query and flag collection scans."""
+    results = []
+    for query in ROUTE_QUERIES:
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        entry: Dict[str, Any] = {"route": query["route"], "collection": query["collection"]}
+        try:
+            entry.update(summarize_plan(await cursor.explain()))
+        except Exception as e:
+            # A diagnostics endpoint reports, it does not fail
+            entry["error"] = str(e)
+        results.append(entry)
+    return results
+
+
+def collection_scans(explained: List[Dict[str, Any]]) -> List[str]:
+    return [entry["route"] for entry in explained if entry.get("collectionScan")]
+
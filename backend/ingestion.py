@@ -0,0 +1,225 @@
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+import os
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from dataset_store import DatasetStore, encode_chunks
+from frequency import frequency_from_counts
+from moments import MomentAccumulator
+from profiling import stage
+from quantile_sketch import KLLSketch
+from statistics_calculator import StatisticsCalculator
+
+INGEST_CHUNK_ROWS = int(os.environ.get('INGEST_CHUNK_ROWS', 20000))
+# Exact frequency counts are dropped once a column has more distinct values
+FREQUENCY_DISTINCT_LIMIT = int(os.environ.get('FREQUENCY_DISTINCT_LIMIT', 1000))
+PREVIEW_ROWS = 10
+# Compaction picks which half of a level survives at random; a fixed seed
+# makes the same values always give the same sketch (and report fingerprint)
+SKETCH_SEED = 0
+
+_NUMERIC_KINDS = ("integer", "floating")
+
+
+def _chunk_kind(series: pd.Series) -> str:
+    kind = series.dtype.kind
+    if kind in "iu":
+        return "integer"
+    if kind == "f":
+        # A float column without fractions is an integer column with gaps
+        values = series.to_numpy()
+        finite = values[~np.isnan(values)]
+        if finite.size == 0:
+            return "empty"
+        return "integer" if np.all(finite == np.round(finite)) else "floating"
+    if kind == "b":
+        return "boolean"
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred in ("string", "empty", "boolean"):
+        return inferred
+    return "mixed"
+
+
+def _merge_kinds(current: str, new: str) -> str:
+    if current == "empty" or current == new:
+        return new
+    if new == "empty":
+        return current
+    if current in _NUMERIC_KINDS and new in _NUMERIC_KINDS:
+        return "floating"
+    if "string" in (current, new) and "mixed" not in (current, new):
+        return "string"
+    return "mixed"
+
+
+def variable_type(kind: str) -> str:
+    if kind == "integer":
+        return "cuantitativa_discreta"
+    if kind == "floating":
+        return "cuantitativa_continua"
+    return "cualitativa_nominal"
+
+
+class ColumnProfile:
+    """Progressive type inference plus running moments, quantile sketch and
+    frequency counts: the sufficient statistics of one column."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.kind = "empty"
+        self.moments = MomentAccumulator()
+        self.sketch = KLLSketch(seed=SKETCH_SEED)
+        self.missing = 0
+        self.counts: Optional[Dict[Any, int]] = {}
+
+    def update(self, series: pd.Series):
+        self.kind = _merge_kinds(self.kind, _chunk_kind(series))
+        if self.kind in _NUMERIC_KINDS or self.kind == "empty":
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(values)
+            self.sketch.update(values)
+        self._count(series)
+
+    def _count(self, series: pd.Series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        present = codes[codes >= 0]
+        self.missing += int(codes.size - present.size)
+        if self.counts is None:
+            return
+        for value, count in zip(uniques.tolist(), np.bincount(present, minlength=len(uniques)).tolist()):
+            self.counts[value] = self.counts.get(value, 0) + count
+        if len(self.counts) > FREQUENCY_DISTINCT_LIMIT:
+            self.counts = None
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.kind in _NUMERIC_KINDS
+
+    def statistics(self) -> Dict[str, Any]:
+        if not self.is_numeric:
+            return {}
+        return StatisticsCalculator.stats_from_moments(self.moments, advanced=True, sketch=self.sketch)
+
+    def frequency(self) -> Optional[Dict[str, Any]]:
+        if self.counts is None:
+            return None
+        return frequency_from_counts(list(self.counts), list(self.counts.values()), self.missing)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "missing": self.missing,
+            "moments": self.moments.to_dict(),
+            "sketch": self.sketch.to_dict(),
+            "frequency": None if self.counts is None else {
+                "values": list(self.counts), "counts": list(self.counts.values())
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "ColumnProfile":
+        profile = cls(doc["name"])
+        profile.kind = doc["kind"]
+        profile.missing = doc.get("missing", 0)
+        profile.moments = MomentAccumulator.from_dict(doc["moments"])
+        profile.sketch = KLLSketch.from_dict(doc["sketch"], SKETCH_SEED)
+        frequency = doc.get("frequency")
+        profile.counts = None if frequency is None else dict(zip(frequency["values"], frequency["counts"]))
+        return profile
+
+
+def iter_csv_chunks(fileobj: BinaryIO, chunk_rows: int = INGEST_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    fileobj.seek(0)
+    return iter(pd.read_csv(fileobj, chunksize=chunk_rows, encoding='utf-8'))
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # NaN is not valid JSON; empty cells go out as null
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def _process_chunk(df: pd.DataFrame, profiles: Dict[str, ColumnProfile], chunk_rows: int):
+    with stage("ingest.profile"):
+        for name in df.columns:
+            profiles.setdefault(name, ColumnProfile(name)).update(df[name])
+    with stage("ingest.encode"):
+        series = {name: df[name].to_numpy() for name in df.columns}
+        return [(encoded, rows) for _, rows, (encoded,) in encode_chunks(len(df), chunk_rows, series) if rows]
+
+
+async def ingest_csv(fileobj: BinaryIO, store: DatasetStore, meta: Dict[str, Any],
+                     chunk_rows: int = INGEST_CHUNK_ROWS, run: Callable = run_in_threadpool) -> Dict[str, Any]:
+    """Parse a CSV upload chunk by chunk and write it straight to dataset storage.
+
+    Only one parsed chunk is alive at a time, parsing and encoding run in the
+    thread pool (or `run`), and the running moments/sketches give the
+    statistics of every numeric column when the last chunk is in.
+    """
+    reader = await run(iter_csv_chunks, fileobj, chunk_rows)
+    writer = store.writer(meta)
+    profiles: Dict[str, ColumnProfile] = {}
+    columns: List[str] = []
+    preview: List[Dict[str, Any]] = []
+
+    try:
+        while True:
+            with stage("ingest.parse"):
+                df = await run(next, reader, None)
+            if df is None:
+                break
+            if not columns:
+                columns = [str(c) for c in df.columns]
+            df.columns = columns
+            if len(preview) < PREVIEW_ROWS:
+                preview.extend(_records(df.head(PREVIEW_ROWS - len(preview))))
+
+            storage_rows = writer.chunk_rows(len(columns))
+            pieces = await run(_process_chunk, df, profiles, storage_rows)
+            with stage("ingest.write"):
+                for encoded, row_count in pieces:
+                    await writer.append(encoded, row_count)
+    except Exception:
+        await writer.abort()
+        raise
+
+    with stage("ingest.finish"):
+        doc = await writer.finish([
+            {"name": name, "type": variable_type(profiles[name].kind), "column": name}
+            for name in columns
+        ])
+
+    return {
+        "datasetId": doc['id'],
+        "columns": columns,
+        "columnTypes": {name: profiles[name].kind for name in columns},
+        "rowCount": doc['rowCount'],
+        "statistics": {name: profiles[name].statistics() for name in columns if profiles[name].is_numeric},
+        "sketches": {name: profiles[name].sketch for name in columns if profiles[name].is_numeric},
+        "profiles": profiles,
+        "preview": preview,
+    }
+
+
+def _read_csv_records(fileobj: BinaryIO, chunk_rows: int) -> Dict[str, Any]:
+    data: List[Dict[str, Any]] = []
+    columns: Optional[List[str]] = None
+    chunks = iter_csv_chunks(fileobj, chunk_rows)
+    while True:
+        with stage("csv.parse"):
+            df = next(chunks, None)
+        if df is None:
+            break
+        if columns is None:
+            columns = list(df.columns)
+        with stage("csv.to_dict"):
+            data.extend(_records(df))
+    return {"data": data, "columns": columns or []}
+
+
+async def parse_csv_records(fileobj: BinaryIO, chunk_rows: int = INGEST_CHUNK_ROWS,
+                            run: Callable = run_in_threadpool) -> Dict[str, Any]:
+    """Row output for clients that do not persist; parsing still happens off the event loop."""
+    return await run(_read_csv_records, fileobj, chunk_rows)
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+import os
+
+import httpx
+
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-5.1')
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 32))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_KEEPALIVE_EXPIRY', 60))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 120))
+# Streaming goes straight through litellm only when it has somewhere to
+# send the universal key (the proxy LlmChat uses) or a key of the provider's
+# own; otherwise streamed answers come from send_message in one piece
+LLM_API_BASE = os.environ.get('LLM_API_BASE') or None
+LLM_PROVIDER_KEY = os.environ.get('LLM_PROVIDER_KEY') or None
+
+ClientKey = Tuple[str, str, str]
+
+
+def shared_session() -> Optional[httpx.AsyncClient]:
+    """The keep-alive client litellm sends every request through, if any."""
+    try:
+        import litellm
+    except ImportError:
+        return None
+    return getattr(litellm, "aclient_session", None)
+
+
+def keepalive_session() -> Optional[httpx.AsyncClient]:
+    """Install one process-wide keep-alive HTTP client for litellm, which
+    LlmChat uses underneath, unless one is configured already."""
+    try:
+        import litellm
+    except ImportError:
+        return None
+    if getattr(litellm, "aclient_session", None) is None:
+        litellm.aclient_session = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+    return litellm.aclient_session
+
+
+def litellm_completion() -> Optional[Callable[..., Awaitable[Any]]]:
+    try:
+        import litellm
+    except ImportError:
+        return None
+    return litellm.acompletion
+
+
+class _StreamingChat:
+    """LlmChat plus the token streaming it does not offer: `stream_message`
+    sends the same system message and user turn through litellm's
+    `acompletion(stream=True)` and yields the content of each chunk as it
+    arrives. Everything else goes to the wrapped client."""
+
+    def __init__(self, chat: Any, completion: Callable[..., Awaitable[Any]], model: str,
+                 api_key: Optional[str], api_base: Optional[str], system_message: str):
+        self._chat = chat
+        self._completion = completion
+        self._model = model
+        self._api_key = api_key
+        self._api_base = api_base
+        self._system_message = system_message
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._chat, name)
+
+    async def send_message(self, message: Any) -> Any:
+        return await self._chat.send_message(message)
+
+    async def stream_message(self, message: Any) -> AsyncIterator[str]:
+        response = await self._completion(
+            model=self._model,
+            messages=[
+                {"role": "system", "content": self._system_message},
+                {"role": "user", "content": message.text},
+            ],
+            stream=True,
+            api_key=self._api_key,
+            api_base=self._api_base,
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class LlmClients:
+    """Per-request LlmChat factory over one shared HTTP session.
+
+    Nothing is pooled: `client` builds a new LlmChat with the request's
+    session id every time, so no conversation state can carry over from one
+    request to the next. Connection reuse is left to the process-wide
+    keep-alive session `keepalive_session` installs for litellm, which
+    LlmChat is built on; the metrics count clients built per (provider,
+    model, education level) and say whether that session is open.
+
+    Clients without a `stream_message` of their own get one that streams
+    through litellm (`completion`, litellm's `acompletion` by default), so
+    the streaming endpoints forward tokens as the provider produces them.
+    That needs `api_base` (the endpoint LlmChat sends the universal key to)
+    or a `provider_key` valid at the provider itself; without either, or
+    without litellm, streamed answers come from `send_message` in one piece.
+    """
+
+    def __init__(self, factory: Callable[..., Any], api_key: Optional[str],
+                 provider: str = LLM_PROVIDER, model: str = LLM_MODEL,
+                 instrument: Optional[Callable[[Any, ClientKey], Any]] = None,
+                 completion: Optional[Callable[..., Awaitable[Any]]] = None,
+                 api_base: Optional[str] = LLM_API_BASE, provider_key: Optional[str] = LLM_PROVIDER_KEY):
+        self.factory = factory
+        # Wraps each checked-out client, e.g. to time its calls
+        self.instrument = instrument
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.api_base = api_base
+        self.provider_key = provider_key
+        self.completion = None
+        if api_base or provider_key:
+            self.completion = completion or litellm_completion()
+        self.created: Dict[ClientKey, int] = defaultdict(int)
+        self.in_use = 0
+
+    def _create(self, key: ClientKey, system_message: str, session_id: str) -> Any:
+        provider, model, _ = key
+        chat = self.factory(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(provider, model)
+        self.created[key] += 1
+        if self.completion is not None and not hasattr(chat, "stream_message"):
+            chat = _StreamingChat(chat, self.completion, f"{provider}/{model}",
+                                  self.provider_key or self.api_key, self.api_base, system_message)
+        return chat
+
+    @asynccontextmanager
+    async def client(self, level: str, system_message: str, session_id: str,
+                     model: Optional[str] = None) -> AsyncIterator[Any]:
+        key = (self.provider, model or self.model, level)
+        chat = self._create(key, system_message, session_id)
+        self.in_use += 1
+        try:
+            yield self.instrument(chat, key) if self.instrument else chat
+        finally:
+            self.in_use -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        session = shared_session()
+        return {
+            "created": sum(self.created.values()),
+            "inUse": self.in_use,
+            "byKey": {"/".join(key): count for key, count in self.created.items()},
+            "sharedSession": session is not None and not session.is_closed,
+            "streaming": self.completion is not None,
+        }
@@ -0,0 +1,334 @@
+from bisect import bisect_left
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Tuple
+import math
+import threading
+import time
+
+from pymongo import monitoring
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (last one is +Inf), sum, count
+        self._values: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        lines = self.header()
+        for key, (buckets, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), buckets):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Counters and histograms rendered in the Prometheus text format.
+    Nothing is pushed anywhere: a scraper (or a person with curl) reads
+    /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+_templates: Dict[Any, str] = {}
+
+
+def route_template(scope) -> str:
+    """The path template of the route that handled `scope` ("/items/{id}"),
+    or "unmatched". Starlette stores the endpoint in the scope; the template
+    is looked up once per endpoint."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _templates.get(endpoint)
+    if template is None:
+        app = scope.get("app")
+        for route in getattr(getattr(app, "router", None), "routes", []):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        template = _templates[endpoint] = template or "unmatched"
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request until its last body byte
+    (so streamed responses count in full) and measuring request and
+    response sizes. Requests are labelled with the route template, not the
+    raw path, so ids do not multiply the series."""
+
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.requests = registry.counter(
+            "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency until the last body byte", ("route", "method"))
+        self.request_size = registry.histogram(
+            "http_request_size_bytes", "HTTP request body size", ("route", "method"), SIZE_BUCKETS)
+        self.response_size = registry.histogram(
+            "http_response_size_bytes", "HTTP response body size", ("route", "method"), SIZE_BUCKETS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+        sent = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = route_template(scope)
+            method = scope["method"]
+            self.requests.inc(route=route, method=method, status=status)
+            self.latency.observe(elapsed, route=route, method=method)
+            self.request_size.observe(received, route=route, method=method)
+            self.response_size.observe(sent, route=route, method=method)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener: server round-trip time and failures per
+    collection and operation. Registered on the motor client with
+    `event_listeners`, so every query, cursor batch and write is covered
+    without touching the call sites."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.latency = registry.histogram(
+            "mongo_command_duration_seconds", "MongoDB command round-trip time",
+            ("collection", "operation"))
+        self.failures = registry.counter(
+            "mongo_command_failures_total", "MongoDB commands that failed", ("collection", "operation"))
+        self._pending: Dict[Tuple[Any, int], str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _collection(event: monitoring.CommandStartedEvent) -> str:
+        command = event.command
+        if event.command_name == "getMore":
+            return str(command.get("collection", ""))
+        target = command.get(event.command_name)
+        return target if isinstance(target, str) else ""
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def _pop(self, event) -> str:
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self.latency.observe(
+            event.duration_micros / 1e6, collection=self._pop(event), operation=event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._pop(event)
+        self.latency.observe(event.duration_micros / 1e6, collection=collection, operation=event.command_name)
+        self.failures.inc(collection=collection, operation=event.command_name)
+
+
+class LlmMetrics:
+    """Latency, token and error counters for LLM calls. `wrap` is handed to
+    LlmClients, which passes every client it builds through it. LlmChat does
+    not report usage, so tokens are counted on the prompt and the answer
+    with `count_tokens` (tiktoken when installed, an estimate otherwise)."""
+
+    def __init__(self, count_tokens: Callable[[str], int], registry: Registry = REGISTRY):
+        self.count_tokens = count_tokens
+        self.latency = registry.histogram(
+            "llm_request_duration_seconds", "LLM call latency until the whole answer arrived",
+            ("model", "client", "mode"), LLM_LATENCY_BUCKETS)
+        self.first_token = registry.histogram(
+            "llm_time_to_first_token_seconds", "Streaming LLM calls: time until the first piece",
+            ("model", "client"), LLM_LATENCY_BUCKETS)
+        self.tokens = registry.counter(
+            "llm_tokens_total", "LLM tokens sent and received (counted locally)", ("model", "client", "kind"))
+        self.errors = registry.counter(
+            "llm_errors_total", "LLM calls that raised", ("model", "client", "error"))
+
+    def _tokens(self, labels: Dict[str, str], prompt: str, answer: str):
+        self.tokens.inc(self.count_tokens(prompt), kind="prompt", **labels)
+        self.tokens.inc(self.count_tokens(answer), kind="completion", **labels)
+
+    def wrap(self, chat: Any, key: Tuple[str, str, str]) -> Any:
+        return _TimedChat(chat, self, {"model": key[1], "client": key[2]})
+
+
+class _TimedChat:
+    """Proxy over an LlmChat that records every send/stream call."""
+
+    def __init__(self, chat: Any, metrics: LlmMetrics, labels: Dict[str, str]):
+        self._chat = chat
+        self._metrics = metrics
+        self._labels = labels
+        if hasattr(chat, "stream_message"):
+            self.stream_message = self._stream_message
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._chat, name)
+
+    async def send_message(self, message: Any) -> Any:
+        metrics = self._metrics
+        start = time.perf_counter()
+        try:
+            answer = await self._chat.send_message(message)
+        except Exception as e:
+            metrics.errors.inc(error=type(e).__name__, **self._labels)
+            raise
+        finally:
+            metrics.latency.observe(time.perf_counter() - start, mode="send", **self._labels)
+        metrics._tokens(self._labels, getattr(message, "text", ""), str(answer or ""))
+        return answer
+
+    async def _stream_message(self, message: Any) -> AsyncIterator[Any]:
+        metrics = self._metrics
+        start = time.perf_counter()
+        pieces: List[str] = []
+        try:
+            async for piece in self._chat.stream_message(message):
+                if not pieces:
+                    metrics.first_token.observe(time.perf_counter() - start, **self._labels)
+                pieces.append(str(piece or ""))
+                yield piece
+        except Exception as e:
+            metrics.errors.inc(error=type(e).__name__, **self._labels)
+            raise
+        finally:
+            metrics.latency.observe(time.perf_counter() - start, mode="stream", **self._labels)
+            metrics._tokens(self._labels, getattr(message, "text", ""), "".join(pieces))
@@ -34,17 +34,51 @@ class ProjectCreate(BaseModel):
 class Dataset(BaseModel):
     id: str
     projectId: str
-    rawData: List[Dict[str, Any]]
+    rawData: List[Dict[str, Any]] = []
     variables: List[Variable]
     source: str = "manual"
+    rowCount: Optional[int] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
 class DatasetCreate(BaseModel):
     projectId: str
-    rawData: List[Dict[str, Any]]
+    rawData: List[Dict[str, Any]] = []
+    # Columnar alternative to rawData: one list of values per column
+    columns: Optional[Dict[str, List[Any]]] = None
     variables: List[Variable]
     source: str = "manual"
 
+class ColumnarDataset(BaseModel):
+    id: str
+    projectId: str
+    columnOrder: List[str]
+    columns: Dict[str, List[Any]]
+    variables: List[Variable]
+    source: str = "manual"
+    rowCount: int
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+class DatasetAppend(BaseModel):
+    rows: List[Dict[str, Any]] = []
+    # Columnar alternative to rows
+    columns: Optional[Dict[str, List[Any]]] = None
+
+class BatchStatisticsRequest(BaseModel):
+    # Either a stored dataset or a columnar payload for projectId
+    datasetId: Optional[str] = None
+    projectId: Optional[str] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+    variables: Optional[List[str]] = None
+    quantileMethod: str = "linear"
+    includeFrequency: bool = True
+    # Class intervals for numeric variables: auto, sturges, scott, fd, width or None
+    binning: Optional[str] = "auto"
+    binWidth: Optional[float] = None
+    # Numeric variables of a dataset answered from its stored summary and
+    # quantile sketches instead of its rows
+    approximate: bool = False
+    persist: bool = True
+
 class FrequencyTable(BaseModel):
     id: str
     projectId: str
@@ -73,6 +107,7 @@ class Statistics(BaseModel):
     variance: Optional[float] = None
     stdDev: Optional[float] = None
     calculations: Dict[str, Any] = {}
+    contentHash: Optional[str] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
 class Report(BaseModel):
@@ -80,6 +115,9 @@ class Report(BaseModel):
     projectId: str
     content: str
     generatedBy: str = "AI"
+    educationLevel: Optional[str] = None
+    # Hash of the prompt inputs; identical inputs reuse this report
+    fingerprint: Optional[str] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
 class ChatMessage(BaseModel):
@@ -90,4 +128,6 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     sessionId: str
-    educationLevel: str = "secundario"
\ No newline at end of file
+    educationLevel: str = "secundario"
+    # False for questions whose answer depends on this session
+    useCache: bool = True
\ No newline at end of file
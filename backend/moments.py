@@ -0,0 +1,122 @@
+from typing import Any, Dict, Iterable, Optional
+import math
+
+import numpy as np
+
+
+class MomentAccumulator:
+    """Mergeable single-pass accumulator of count, mean, M2..M4, min and max.
+
+    Chunks are reduced with NumPy and combined with the pairwise update of
+    Chan et al., so results do not depend on how the input was split.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: Iterable[Any]) -> "MomentAccumulator":
+        arr = np.asarray(values, dtype=np.float64).ravel()
+        arr = arr[~np.isnan(arr)]
+        if arr.size == 0:
+            return self
+
+        chunk = MomentAccumulator()
+        chunk.count = int(arr.size)
+        chunk.mean = float(arr.sum() / arr.size)
+        deviations = arr - chunk.mean
+        squared = deviations * deviations
+        chunk.m2 = float(squared.sum())
+        chunk.m3 = float(np.dot(squared, deviations))
+        chunk.m4 = float(np.dot(squared, squared))
+        chunk.min = float(arr.min())
+        chunk.max = float(arr.max())
+        return self.merge(chunk)
+
+    def merge(self, other: "MomentAccumulator") -> "MomentAccumulator":
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean = other.count, other.mean
+            self.m2, self.m3, self.m4 = other.m2, other.m3, other.m4
+            self.min, self.max = other.min, other.max
+            return self
+
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+
+        m4 = (
+            self.m4 + other.m4
+            + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+            + 6 * delta_n ** 2 * (na * na * other.m2 + nb * nb * self.m2)
+            + 4 * delta_n * (na * other.m3 - nb * self.m3)
+        )
+        m3 = (
+            self.m3 + other.m3
+            + delta * delta_n ** 2 * na * nb * (na - nb)
+            + 3 * delta_n * (na * other.m2 - nb * self.m2)
+        )
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+
+        self.count = n
+        self.mean = self.mean + delta_n * nb
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> Optional[float]:
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std_dev(self) -> Optional[float]:
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    @property
+    def skewness(self) -> Optional[float]:
+        # Population (Fisher-Pearson) coefficient g1
+        if self.count < 2 or self.m2 <= 0:
+            return None
+        return math.sqrt(self.count) * self.m3 / self.m2 ** 1.5
+
+    @property
+    def kurtosis(self) -> Optional[float]:
+        # Excess kurtosis g2 (0 for a normal distribution)
+        if self.count < 2 or self.m2 <= 0:
+            return None
+        return self.count * self.m4 / (self.m2 * self.m2) - 3.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "m3": self.m3,
+            "m4": self.m4,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any]) -> "MomentAccumulator":
+        acc = cls()
+        acc.count = int(doc.get("count", 0))
+        if acc.count:
+            acc.mean = float(doc["mean"])
+            acc.m2 = float(doc["m2"])
+            acc.m3 = float(doc["m3"])
+            acc.m4 = float(doc["m4"])
+            acc.min = float(doc["min"])
+            acc.max = float(doc["max"])
+        return acc
@@ -0,0 +1,99 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Keyset order of every list endpoint; `id` breaks createdAt ties
+PAGE_SORT = [("createdAt", 1), ("id", 1)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Transform = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps([doc.get("createdAt"), doc["id"]], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, doc_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+    return created_at, doc_id
+
+
+def keyset_filter(base: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """`base` restricted to documents after the cursor in PAGE_SORT order."""
+    if not cursor:
+        return base
+    created_at, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {"createdAt": {"$gt": created_at}},
+        {"createdAt": created_at, "id": {"$gt": doc_id}},
+    ]}
+    return {"$and": [base, after]}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()]
+
+
+def projection(fields: Optional[Iterable[str]], exclude: Iterable[str] = ()) -> Dict[str, int]:
+    """Inclusion projection of `fields` (plus the keyset fields), or an
+    exclusion of `exclude` when no fields were asked for."""
+    if fields is None:
+        result = {"_id": 0}
+        result.update({name: 0 for name in exclude})
+        return result
+    result = {"_id": 0, "id": 1, "createdAt": 1}
+    result.update({name: 1 for name in fields})
+    return result
+
+
+async def _identity(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return doc
+
+
+async def fetch_page(collection, query: Dict[str, Any], limit: int, fields: Dict[str, int],
+                     transform: Transform = _identity) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # One extra document tells whether there is a next page
+    docs = await collection.find(query, fields).sort(PAGE_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return [await transform(doc) for doc in docs[:limit]], next_cursor
+
+
+async def _ndjson_lines(cursor, transform: Transform) -> AsyncIterator[bytes]:
+    async for doc in cursor:
+        item = await transform(doc)
+        yield json.dumps(jsonable_encoder(item), ensure_ascii=False).encode() + b"\n"
+
+
+async def list_response(collection, base: Dict[str, Any], cursor: Optional[str], limit: Optional[int],
+                        fields: Dict[str, int], stream: bool, transform: Transform = _identity):
+    """Keyset-paginated JSON array with the next cursor in a header, or with
+    `stream` an NDJSON body read from the Mongo cursor one document at a time."""
+    try:
+        query = keyset_filter(base, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    if stream:
+        mongo_cursor = collection.find(query, fields).sort(PAGE_SORT)
+        if limit:
+            mongo_cursor = mongo_cursor.limit(limit)
+        return StreamingResponse(_ndjson_lines(mongo_cursor, transform), media_type="application/x-ndjson")
+
+    items, next_cursor = await fetch_page(collection, query, limit or DEFAULT_PAGE_SIZE, fields, transform)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return JSONResponse(jsonable_encoder(items), headers=headers)
@@ -0,0 +1,410 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import functools
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+from metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+# Share of requests profiled without the header; 0 disables sampling
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# The header must carry this value to turn profiling on; without a token
+# the header is ignored, so clients cannot profile requests at will
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+# tracemalloc is process-wide and slows every request in flight, not only
+# the profiled one
+PROFILE_ALLOCATIONS = os.environ.get('PROFILE_ALLOCATIONS', '0') == '1'
+PROFILE_MAX_STACKS = int(os.environ.get('PROFILE_MAX_STACKS', 300))
+PROFILE_STACK_DEPTH = int(os.environ.get('PROFILE_STACK_DEPTH', 48))
+PROFILE_TTL_SECONDS = int(os.environ.get('PROFILE_TTL_SECONDS', 7 * 24 * 3600))
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+# Names of the stages open in this context, outermost first; copied into
+# worker threads along with the rest of the context
+_path: ContextVar[Tuple[str, ...]] = ContextVar("profile_stage_path", default=())
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _current.get()
+
+
+def current_stages() -> Tuple[str, ...]:
+    return _path.get()
+
+
+def _frames(frame, depth: int) -> List[str]:
+    names = []
+    while frame is not None and len(names) < depth:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class stage:
+    """Names a stretch of work for the request profile. Outside a profiled
+    request it costs one context-variable lookup.
+
+        with stage("ingest.parse"):
+            df = next(reader)
+    """
+
+    __slots__ = ("name", "profile", "start", "memory", "token", "previous")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self.profile = _current.get()
+        if self.profile is not None:
+            self.profile.enter(self)
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        if self.profile is not None:
+            self.profile.exit(self)
+        return False
+
+
+class RequestProfile:
+    """Stage timings, sampled stacks and allocation stats of one request.
+
+    A sampler thread reads the stack of every thread currently inside a
+    stage of this request every `interval` seconds; each sample is filed
+    under the open stages, so the result folds into a flame graph. Samples
+    on the event-loop thread may include other requests running between
+    awaits. Stage times are inclusive wall-clock; stages running in
+    parallel overlap.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, allocations: bool = False):
+        self.id = str(uuid.uuid4())
+        self.interval = interval
+        self.allocations = allocations
+        self.stages: Dict[Tuple[str, ...], List[float]] = {}
+        self.samples: Dict[str, int] = defaultdict(int)
+        self.sample_count = 0
+        self._threads: Dict[int, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._memory_start = (0, None)
+        self.allocation_stats: Optional[Dict[str, Any]] = None
+
+    # Stages
+
+    def enter(self, st: stage):
+        path = _path.get() + (st.name,)
+        st.token = _path.set(path)
+        ident = threading.get_ident()
+        with self._lock:
+            st.previous = self._threads.get(ident)
+            self._threads[ident] = path
+        st.memory = _traced_memory()
+        st.start = time.perf_counter()
+
+    def exit(self, st: stage):
+        elapsed = time.perf_counter() - st.start
+        allocated = _traced_memory() - st.memory
+        path = _path.get()
+        _path.reset(st.token)
+        ident = threading.get_ident()
+        with self._lock:
+            if st.previous is None:
+                self._threads.pop(ident, None)
+            else:
+                self._threads[ident] = st.previous
+            self._record(path, 1, elapsed, allocated)
+
+    def _record(self, path: Tuple[str, ...], calls: int, seconds: float, allocated: int):
+        entry = self.stages.get(path)
+        if entry is None:
+            entry = self.stages[path] = [0, 0.0, 0]
+        entry[0] += calls
+        entry[1] += seconds
+        entry[2] += allocated
+
+    def attach(self, fn: Callable) -> Callable:
+        """Wrap `fn` so the thread running it is sampled under the stages
+        open where it was submitted."""
+        profile = self
+
+        @functools.wraps(fn)
+        def attached(*args, **kwargs):
+            ident = threading.get_ident()
+            with profile._lock:
+                previous = profile._threads.get(ident)
+                profile._threads[ident] = _path.get() or ("thread",)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with profile._lock:
+                    if previous is None:
+                        profile._threads.pop(ident, None)
+                    else:
+                        profile._threads[ident] = previous
+
+        return attached
+
+    # Sampling
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            threads = list(self._threads.items())
+        for ident, path in threads:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            key = ";".join([f"[{name}]" for name in path] + _frames(frame, PROFILE_STACK_DEPTH))
+            with self._lock:
+                self.samples[key] += 1
+                self.sample_count += 1
+
+    def _run_sampler(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "RequestProfile":
+        if self.allocations:
+            fresh = _start_tracemalloc()
+            tracemalloc.reset_peak()
+            self._memory_start = (_traced_memory(), None if fresh else tracemalloc.take_snapshot())
+        self._sampler = threading.Thread(target=self._run_sampler, name=f"profile-{self.id[:8]}", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self.allocations:
+            self.allocation_stats = _allocation_stats(*self._memory_start)
+            _stop_tracemalloc()
+
+    # Worker processes send their part back as plain data
+
+    def export(self) -> Dict[str, Any]:
+        return {
+            "stages": [[list(path), *entry] for path, entry in self.stages.items()],
+            "samples": dict(self.samples),
+            "sampleCount": self.sample_count,
+        }
+
+    def merge(self, part: Dict[str, Any], prefix: Tuple[str, ...] = ()):
+        with self._lock:
+            for path, calls, seconds, allocated in part["stages"]:
+                self._record(prefix + tuple(path), calls, seconds, allocated)
+            label = ";".join(f"[{name}]" for name in prefix)
+            for key, count in part["samples"].items():
+                self.samples[f"{label};{key}" if label else key] += count
+            self.sample_count += part["sampleCount"]
+
+    def to_doc(self, **fields) -> Dict[str, Any]:
+        stages = []
+        for path, (calls, seconds, allocated) in sorted(self.stages.items()):
+            stages.append({
+                "stage": path[-1],
+                "path": "/".join(path),
+                "depth": len(path) - 1,
+                "calls": calls,
+                "wallMs": seconds * 1000,
+                "allocatedBytes": allocated if self.allocations else None,
+            })
+        top = sorted(self.samples.items(), key=lambda item: -item[1])[:PROFILE_MAX_STACKS]
+        return {
+            "id": self.id,
+            **fields,
+            "stages": stages,
+            "samples": {
+                "intervalMs": self.interval * 1000,
+                "count": self.sample_count,
+                "stacks": [[stack, count] for stack, count in top],
+                "truncated": max(0, len(self.samples) - len(top)),
+            },
+            "allocations": self.allocation_stats,
+        }
+
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_ours = False
+
+
+def _traced_memory() -> int:
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def _start_tracemalloc() -> bool:
+    """Returns True when tracing starts now, i.e. nothing was traced before."""
+    global _tracemalloc_users, _tracemalloc_ours
+    with _tracemalloc_lock:
+        _tracemalloc_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_ours = True
+            return True
+        return False
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_ours
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_ours:
+            tracemalloc.stop()
+            _tracemalloc_ours = False
+
+
+def _allocation_stats(start_bytes: int, start_snapshot, limit: int = 15) -> Dict[str, Any]:
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    if start_snapshot is None:
+        # Tracing began with this request: every live block was allocated during it
+        stats = [(stat.traceback[0], stat.size, stat.count) for stat in snapshot.statistics("lineno")[:limit]]
+    else:
+        stats = [
+            (stat.traceback[0], stat.size_diff, stat.count_diff)
+            for stat in snapshot.compare_to(start_snapshot, "lineno")[:limit]
+        ]
+    return {
+        "peakBytes": peak,
+        "retainedBytes": current - start_bytes,
+        "top": [
+            {"line": f"{os.path.basename(frame.filename)}:{frame.lineno}", "bytes": size, "blocks": count}
+            for frame, size, count in stats
+        ],
+    }
+
+
+def run_profiled(fn: Callable, interval: float, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """Process-pool side of a profiled call: runs `fn` under its own
+    profile and returns the result together with the profile data."""
+    profile = RequestProfile(interval)
+    token = _current.set(profile)
+    profile.start()
+    try:
+        with stage("cpu_pool.worker"):
+            result = fn(*args, **kwargs)
+    finally:
+        profile.stop()
+        _current.reset(token)
+    return result, profile.export()
+
+
+class ProfileStore:
+    """Finished profiles in `requestProfiles`, removed by a TTL index."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def save(self, doc: Dict[str, Any]):
+        await self.db.requestProfiles.insert_one(dict(doc))
+
+    async def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.requestProfiles.find_one({"id": profile_id}, {"_id": 0})
+
+    async def recent(self, limit: int = 20, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = {"route": route} if route else {}
+        return await self.db.requestProfiles.find(
+            query, {"_id": 0, "samples.stacks": 0, "allocations.top": 0}
+        ).sort("createdAt", -1).limit(limit).to_list(limit)
+
+
+def folded(doc: Dict[str, Any]) -> str:
+    """Collapsed stacks, one "frame;frame;... count" per line, for
+    flamegraph.pl, speedscope and similar tools."""
+    return "".join(f"{stack} {count}\n" for stack, count in doc["samples"]["stacks"])
+
+
+class ProfilingMiddleware:
+    """Profiles requests whose X-Profile header carries PROFILE_TOKEN (the
+    header does nothing while no token is configured) and a random
+    `sample_rate` share of the rest. The profile id comes back in X-Profile-Id and the profile is
+    stored once the response is complete."""
+
+    def __init__(self, app, store_factory: Callable[[], ProfileStore], sample_rate: float = PROFILE_SAMPLE_RATE,
+                 token: str = PROFILE_TOKEN, allocations: bool = PROFILE_ALLOCATIONS,
+                 interval: float = PROFILE_INTERVAL):
+        self.app = app
+        # Looked up per request so the store follows the app's database
+        self.store_factory = store_factory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.allocations = allocations
+        self.interval = interval
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            wanted = PROFILE_HEADER.lower().encode()
+            for name, value in scope.get("headers", []):
+                if name == wanted and hmac.compare_digest(value, self.token.encode()):
+                    return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(self.interval, self.allocations)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile.id.encode())
+                ]
+            await send(message)
+
+        token = _current.set(profile)
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        profile.start()
+        try:
+            with stage("request"):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - start
+            profile.stop()
+            _current.reset(token)
+            top_level = sum(
+                entry[1] for path, entry in profile.stages.items() if len(path) == 2 and path[0] == "request"
+            )
+            doc = profile.to_doc(
+                route=route_template(scope),
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                trigger=trigger,
+                durationMs=duration * 1000,
+                unattributedMs=max(0.0, duration - top_level) * 1000,
+                createdAt=started_at,
+            )
+            try:
+                await self.store_factory().save(doc)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el perfil {profile.id}: {str(e)}")
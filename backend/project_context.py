@@ -0,0 +1,146 @@
+from collections import defaultdict
+from typing import Any, Awaitable, Dict, List
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+from columnar import columns_to_rows
+from dataset_store import INLINE_DATA_FIELDS, DatasetStore
+from dataset_summary import DatasetSummaries
+
+PROJECT_CONTEXT_ROWS = int(os.environ.get('PROJECT_CONTEXT_ROWS', 10))
+PROJECT_CONTEXT_SAMPLE_ROWS = int(os.environ.get('PROJECT_CONTEXT_SAMPLE_ROWS', 10))
+
+
+class _StageStats:
+    __slots__ = ("count", "total_ms", "max_ms", "last_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avgMs": self.total_ms / self.count if self.count else None,
+            "maxMs": self.max_ms,
+            "lastMs": self.last_ms,
+        }
+
+
+class ProjectContextLoader:
+    """A project together with its data, for any endpoint that needs both.
+
+    The project, its first datasets and its first statistics are fetched
+    concurrently, with `.limit` so the server sends no more documents than
+    are used. Dataset documents come without their inline data: first rows
+    are read from the stored head (old row-oriented `rawData` arrays are cut
+    to `rows` by a `$slice` projection) and the data itself is only fetched
+    for the first dataset's spread sample. That sample, the first rows and
+    the stored column and variable profiles then load concurrently as well.
+    Every stage is timed; the timings come back with the context and are
+    aggregated for /system/project-context.
+    """
+
+    def __init__(self, db, store: DatasetStore, summaries: DatasetSummaries,
+                 rows: int = PROJECT_CONTEXT_ROWS, sample_rows: int = PROJECT_CONTEXT_SAMPLE_ROWS):
+        self.db = db
+        self.store = store
+        self.summaries = summaries
+        self.rows = rows
+        self.sample_rows = sample_rows
+        self._stages: Dict[str, _StageStats] = defaultdict(_StageStats)
+
+    async def _timed(self, stage: str, timings: Dict[str, float], awaitable: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            timings[stage] = elapsed
+            self._stages[stage].add(elapsed)
+
+    async def _first_rows(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """The dataset in the row-oriented API shape, cut to the first rows;
+        variables keep their name and type but not their values."""
+        columns = await self.store.head(doc, self.rows)
+        return {
+            "id": doc['id'],
+            "projectId": doc['projectId'],
+            "rawData": columns_to_rows(list(columns), columns),
+            "variables": [{"name": var['name'], "type": var['type']} for var in doc.get('variables', [])],
+            "source": doc.get('source', 'manual'),
+            "rowCount": doc.get('rowCount'),
+            "createdAt": doc.get('createdAt'),
+        }
+
+    async def _sample(self, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await self.store.sample_rows(await self.store.with_data(doc), self.sample_rows)
+
+    async def load(self, project_id: str, datasets: int = 1, statistics: int = 1,
+                   profiles: bool = True) -> Dict[str, Any]:
+        """The project document plus `datasets` (first rows of each),
+        `statistics` (oldest first) and, when `profiles` is set, the first
+        dataset's `profiles`, `rowCount` and spread `sampleData`. Raises 404
+        if the project does not exist."""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        project, docs, stats = await asyncio.gather(
+            self._timed("project", timings, self.db.projects.find_one({"id": project_id}, {"_id": 0})),
+            self._timed("datasets", timings, self.db.datasets.find(
+                {"projectId": project_id},
+                {"_id": 0, "rawData": {"$slice": self.rows}, **{field: 0 for field in INLINE_DATA_FIELDS}}
+            ).sort("createdAt", 1).limit(datasets).to_list(datasets)),
+            self._timed("statistics", timings, self.db.statistics.find(
+                {"projectId": project_id}, {"_id": 0}
+            ).sort("createdAt", 1).limit(statistics).to_list(statistics)),
+        )
+        if not project:
+            raise HTTPException(404, "Proyecto no encontrado")
+
+        context: Dict[str, Any] = {**project, "datasets": [], "statistics": stats, "sampleData": []}
+        if docs:
+            work: List[Awaitable] = [
+                self._timed("rows", timings, asyncio.gather(*(self._first_rows(doc) for doc in docs)))
+            ]
+            if profiles:
+                first = docs[0]
+                work += [
+                    self._timed("summary", timings, self.summaries.get(first)),
+                    self._timed("variables", timings, self.summaries.variable_profiles(first)),
+                    self._timed("sample", timings, self._sample(first)),
+                ]
+            results = await asyncio.gather(*work)
+            context["datasets"] = results[0]
+            if profiles:
+                (row_count, table_profiles), variable_profiles, sample = results[1:]
+                # Variables typed in by hand can be longer than the table
+                context["rowCount"] = max(
+                    [row_count] + [var.get('length', len(var.get('values', []))) for var in docs[0].get('variables', [])]
+                )
+                context["profiles"] = {**table_profiles, **variable_profiles}
+                context["sampleData"] = sample
+
+        total = (time.perf_counter() - start) * 1000
+        timings["total"] = total
+        self._stages["total"].add(total)
+        context["timings"] = timings
+        return context
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "sampleRows": self.sample_rows,
+            "stages": {stage: stats.to_dict() for stage, stats in self._stages.items()},
+        }
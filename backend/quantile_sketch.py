@@ -0,0 +1,179 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import math
+import random
+
+import numpy as np
+
+# With k retained items per level the normalized rank error is about 3.3 / k
+# at 99% confidence (Karnin, Lang & Liberty 2016; DataSketches k=200 -> 1.65%)
+_RANK_ERROR_FACTOR = 3.3
+_CAPACITY_DECAY = 2 / 3
+# Large updates are absorbed in blocks of k * 2**_BLOCK_HALVINGS values
+_BLOCK_HALVINGS = 3
+
+DEFAULT_RELATIVE_ERROR = 0.01
+
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch with bounded memory.
+
+    Level h holds items of weight 2**h. A full level is sorted and every
+    other item (random offset) is promoted to the next level, so the sketch
+    keeps O(k) items no matter how many values it has seen.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError("k debe ser al menos 8")
+        self.k = int(k)
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def for_error(cls, relative_error: float = DEFAULT_RELATIVE_ERROR, seed: Optional[int] = None) -> "KLLSketch":
+        if not 0 < relative_error < 1:
+            raise ValueError("El error relativo debe estar entre 0 y 1")
+        return cls(max(8, math.ceil(_RANK_ERROR_FACTOR / relative_error)), seed)
+
+    @property
+    def relative_error(self) -> float:
+        return _RANK_ERROR_FACTOR / self.k
+
+    @property
+    def retained(self) -> int:
+        return sum(level.size for level in self.levels)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels)
+        return max(2, math.ceil(self.k * _CAPACITY_DECAY ** (depth - h - 1)))
+
+    def update(self, values: Iterable[Any]) -> "KLLSketch":
+        arr = np.asarray(values, dtype=np.float64).ravel()
+        arr = arr[~np.isnan(arr)]
+        if arr.size == 0:
+            return self
+
+        self.count += int(arr.size)
+        self.min = min(self.min, float(arr.min()))
+        self.max = max(self.max, float(arr.max()))
+        self._absorb(arr)
+        self._compress()
+        return self
+
+    def _add(self, h: int, items: np.ndarray):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0))
+        self.levels[h] = np.concatenate((self.levels[h], items))
+
+    def _absorb(self, arr: np.ndarray):
+        """Add values without ever sorting more than one block at a time.
+
+        Each block of k * 2**s values is sorted on its own and keeps every
+        2**s-th item from a random offset: s compactions of that block in
+        one step, so its items enter level s with their weight preserved.
+        The kept items are absorbed the same way one level group higher,
+        and only what is left over goes to the level it belongs to.
+        """
+        step = 1 << _BLOCK_HALVINGS
+        width = self.k * step
+        h = 0
+        while arr.size >= width:
+            rows = arr.size // width
+            blocks = np.sort(arr[:rows * width].reshape(rows, width), axis=1)
+            offsets = np.random.default_rng(self._rng.getrandbits(64)).integers(0, step, rows)
+            kept = np.take_along_axis(blocks, offsets[:, None] + np.arange(0, width, step), axis=1)
+            self._add(h, arr[rows * width:])
+            arr = kept.ravel()
+            h += _BLOCK_HALVINGS
+        self._add(h, arr)
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.count == 0:
+            return self
+        self.k = min(self.k, other.k)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], level))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if level.size < self._capacity(h):
+                h += 1
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            level = np.sort(level)
+            # An odd item stays behind so total weight is preserved exactly
+            keep = level[-1:] if level.size % 2 else level[:0]
+            pairs = level[:level.size - keep.size]
+            promoted = pairs[self._rng.randint(0, 1)::2]
+
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+            # Adding a level lowers the capacity of the ones below it
+            h = 0
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(level.size, 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, probs: Sequence[float]) -> np.ndarray:
+        if self.count == 0:
+            raise ValueError("El sketch está vacío")
+        probs = np.asarray(probs, dtype=np.float64)
+        items, cumulative = self._weighted_items()
+        targets = np.ceil(probs * cumulative[-1])
+        idx = np.clip(np.searchsorted(cumulative, targets, side="left"), 0, items.size - 1)
+        result = items[idx]
+        result = np.where(probs <= 0, self.min, result)
+        return np.where(probs >= 1, self.max, result)
+
+    def quantile(self, p: float) -> float:
+        return float(self.quantiles([p])[0])
+
+    def rank(self, value: float) -> float:
+        if self.count == 0:
+            raise ValueError("El sketch está vacío")
+        items, cumulative = self._weighted_items()
+        idx = np.searchsorted(items, value, side="right")
+        return float(cumulative[idx - 1] / cumulative[-1]) if idx else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "kll",
+            "k": self.k,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "levels": [level.tolist() for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, doc: Dict[str, Any], seed: Optional[int] = None) -> "KLLSketch":
+        sketch = cls(doc["k"], seed)
+        sketch.count = int(doc.get("count", 0))
+        if sketch.count:
+            sketch.min = float(doc["min"])
+            sketch.max = float(doc["max"])
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in doc.get("levels", [[]])] or [np.empty(0)]
+        return sketch
+
+
+def build_sketch(values: Iterable[Any], relative_error: float = DEFAULT_RELATIVE_ERROR) -> KLLSketch:
+    return KLLSketch.for_error(relative_error).update(values)
@@ -0,0 +1,128 @@
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# Named sets of probabilities accepted wherever quantiles are requested
+QUANTILE_PRESETS: Dict[str, Tuple[float, ...]] = {
+    "median": (0.5,),
+    "quartiles": (0.25, 0.5, 0.75),
+    "deciles": tuple(i / 10 for i in range(1, 10)),
+    "percentiles": tuple(i / 100 for i in range(1, 100)),
+}
+
+# Hyndman & Fan continuous definitions as (alpha, beta) plotting positions;
+# "linear" (type 7) is the default of NumPy, pandas, R and spreadsheets
+_CONTINUOUS_METHODS = {
+    "linear": (1.0, 1.0),
+    "hazen": (0.5, 0.5),
+    "weibull": (0.0, 0.0),
+    "median_unbiased": (1 / 3, 1 / 3),
+    "normal_unbiased": (3 / 8, 3 / 8),
+}
+
+QUANTILE_METHODS = tuple(_CONTINUOUS_METHODS) + (
+    "lower", "higher", "nearest", "midpoint", "inverted_cdf",
+)
+
+
+def resolve_probabilities(spec: Union[str, float, Sequence[Union[str, float]]]) -> List[float]:
+    """Expand preset names and validate probabilities, keeping request order."""
+    if isinstance(spec, (str, float, int)):
+        spec = [spec]
+
+    probs: List[float] = []
+    for item in spec:
+        if isinstance(item, str) and item in QUANTILE_PRESETS:
+            probs.extend(QUANTILE_PRESETS[item])
+            continue
+        p = float(item)
+        if not 0.0 <= p <= 1.0:
+            raise ValueError(f"Probabilidad fuera de rango: {item}")
+        probs.append(p)
+    return probs
+
+
+# Beyond this many order statistics a full SIMD sort beats nested selection
+_MAX_SELECTIONS = 16
+
+
+def _select(arr: np.ndarray, kth: np.ndarray) -> np.ndarray:
+    # Nested single-kth partitions: the middle order statistic splits the
+    # array and the remaining ones only touch their own side, so k
+    # statistics cost O(n log k) instead of one introselect pass per kth
+    work = arr.copy()
+    stack = [(0, work.size, kth)]
+    while stack:
+        lo, hi, ks = stack.pop()
+        if ks.size == 0:
+            continue
+        mid = ks.size // 2
+        k = int(ks[mid])
+        work[lo:hi].partition(k - lo)
+        stack.append((lo, k, ks[:mid]))
+        stack.append((k + 1, hi, ks[mid + 1:]))
+    return work
+
+
+def _positions(n: int, probs: np.ndarray, method: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Returns the lower and upper 0-based order statistics and the weight of
+    # the upper one for every probability
+    if method in _CONTINUOUS_METHODS:
+        alpha, beta = _CONTINUOUS_METHODS[method]
+        h = probs * (n - alpha - beta + 1) + alpha - 1
+    elif method in ("lower", "higher", "nearest", "midpoint"):
+        h = probs * (n - 1)
+    elif method == "inverted_cdf":
+        h = np.ceil(probs * n) - 1
+    else:
+        raise ValueError(f"Método de cuantiles desconocido: {method}")
+
+    h = np.clip(h, 0, n - 1)
+    lo = np.floor(h).astype(np.intp)
+    frac = h - lo
+
+    if method == "lower":
+        frac = np.zeros_like(frac)
+    elif method == "higher":
+        frac = (frac > 0).astype(np.float64)
+    elif method == "nearest":
+        frac = np.around(h) - lo
+    elif method == "midpoint":
+        frac = np.where(frac > 0, 0.5, 0.0)
+
+    hi = np.minimum(lo + 1, n - 1)
+    return lo, hi, frac
+
+
+def compute_quantile_groups(arr: np.ndarray, groups: Sequence[Tuple[Sequence[float], str]]) -> List[np.ndarray]:
+    """Quantiles for several (probabilities, method) groups from one selection.
+
+    The order statistics needed by every group are selected together, so
+    work is shared across groups and the column is only sorted when many
+    statistics are requested (e.g. percentiles).
+    """
+    arr = np.asarray(arr, dtype=np.float64)
+    n = arr.size
+    if n == 0:
+        raise ValueError("No hay datos para calcular cuantiles")
+
+    plans = []
+    kth = []
+    for probs, method in groups:
+        lo, hi, frac = _positions(n, np.asarray(probs, dtype=np.float64), method)
+        plans.append((lo, hi, frac))
+        kth.append(lo)
+        kth.append(hi[frac > 0])
+
+    kth = np.unique(np.concatenate(kth))
+    selected = _select(arr, kth) if kth.size <= _MAX_SELECTIONS else np.sort(arr)
+
+    results = []
+    for lo, hi, frac in plans:
+        low = selected[lo]
+        results.append(np.where(frac > 0, low + frac * (selected[hi] - low), low))
+    return results
+
+
+def compute_quantiles(arr: np.ndarray, probs: Sequence[float], method: str = "linear") -> np.ndarray:
+    return compute_quantile_groups(arr, [(probs, method)])[0]
@@ -0,0 +1,48 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+
+
+def report_fingerprint(fields: Dict[str, Any], education_level: str, prompt_version: int, model: str) -> str:
+    """Stable hash of everything that shapes a report: the prompt inputs,
+    the level, the prompt version and the model."""
+    payload = json.dumps(
+        {"fields": fields, "level": education_level, "prompt": prompt_version, "model": model},
+        sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+class ReportCache:
+    """Looks up the last report generated from the same fingerprint in
+    `reports`; a hit skips the LLM call and the insert."""
+
+    def __init__(self, db):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self.forced = 0
+
+    async def lookup(self, project_id: str, fingerprint: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        if force:
+            self.forced += 1
+            return None
+        report = await self.db.reports.find_one(
+            {"projectId": project_id, "fingerprint": fingerprint},
+            {"_id": 0},
+            sort=[("createdAt", -1)]
+        )
+        if report is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return report
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "forced": self.forced,
+            "hitRatio": self.hits / lookups if lookups else None,
+        }
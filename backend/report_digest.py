@@ -0,0 +1,212 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import spread_indices
+from ingestion import ColumnProfile, variable_type
+
+logger = logging.getLogger(__name__)
+
+# Tokens allowed for the data part of a report prompt (variables, sample and
+# statistics); the template text around it is fixed
+REPORT_TOKEN_BUDGETS: Dict[str, int] = {
+    level: int(os.environ.get(f'REPORT_TOKEN_BUDGET_{level.upper()}', default))
+    for level, default in (("primario", 500), ("secundario", 1000), ("superior", 1600))
+}
+REPORT_TOKEN_BUDGET = int(os.environ.get('REPORT_TOKEN_BUDGET', 1000))
+REPORT_TOKENIZER = os.environ.get('REPORT_TOKENIZER', 'o200k_base')
+
+# (top categories, histogram bins, sample rows), tried in order until the
+# digest fits the budget
+DETAIL_LEVELS: Tuple[Tuple[int, int, int], ...] = (
+    (10, 10, 10),
+    (6, 8, 6),
+    (4, 5, 3),
+    (3, 0, 0),
+)
+
+# Bookkeeping fields of a statistics document that say nothing about the data
+_STATISTICS_METADATA = {"_id", "id", "projectId", "createdAt", "contentHash"}
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(REPORT_TOKENIZER)
+    except Exception as e:
+        # Not installed, or the encoding could not be downloaded
+        logger.info(f"Sin tiktoken ({str(e)}); los tokens se estiman por longitud")
+        return None
+
+
+def tokenizer_name() -> str:
+    return f"tiktoken:{REPORT_TOKENIZER}" if _encoding() is not None else "estimado:4caracteres"
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def token_budget(education_level: str) -> int:
+    return REPORT_TOKEN_BUDGETS.get(education_level, REPORT_TOKEN_BUDGET)
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _number(value: Any) -> Any:
+    """Four significant digits are plenty for a report."""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if not math.isfinite(value):
+            return None
+        if value == int(value) and abs(value) < 1e15:
+            return int(value)
+        return float(f"{value:.4g}")
+    return value
+
+
+def compact_value(value: Any, max_items: int) -> Any:
+    """Rounded numbers, no nulls, and lists cut to `max_items` with a count
+    of what was left out."""
+    if isinstance(value, dict):
+        compact = {}
+        for key, item in value.items():
+            item = compact_value(item, max_items)
+            if item is not None and item != {} and item != []:
+                compact[key] = item
+        return compact
+    if isinstance(value, (list, tuple)):
+        items = [compact_value(item, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} más")
+        return items
+    return _number(value)
+
+
+def compact_statistics(statistics: Dict[str, Any], max_items: int) -> Dict[str, Any]:
+    return compact_value(
+        {k: v for k, v in (statistics or {}).items() if k not in _STATISTICS_METADATA}, max_items
+    )
+
+
+def profile_values(columns: Dict[str, Sequence[Any]]) -> Dict[str, ColumnProfile]:
+    profiles = {}
+    for name, values in columns.items():
+        profiles[name] = ColumnProfile(name)
+        profiles[name].update(pd.Series(list(values)))
+    return profiles
+
+
+def _histogram(profile: ColumnProfile, bins: int) -> Optional[List[List[Any]]]:
+    sketch = profile.sketch
+    if bins <= 0 or not sketch.count or sketch.min == sketch.max:
+        return None
+    edges = np.linspace(sketch.min, sketch.max, bins + 1)
+    # rank(x) is the share of values <= x, so each bin is (left, right]
+    # except the first, which also holds the minimum
+    shares = np.diff([0.0] + [sketch.rank(edge) for edge in edges[1:]])
+    total = profile.moments.count
+    return [
+        [_number(left), _number(right), int(round(share * total))]
+        for left, right, share in zip(edges[:-1], edges[1:], shares)
+    ]
+
+
+def column_digest(profile: ColumnProfile, top: int, bins: int) -> Dict[str, Any]:
+    """Bounded summary of one column: quantiles and a histogram for numeric
+    columns, the most frequent categories for the rest."""
+    present = sum(profile.counts.values()) if profile.counts is not None else profile.moments.count
+    digest: Dict[str, Any] = {
+        "variable": profile.name,
+        "tipo": variable_type(profile.kind),
+        "n": int(present),
+        "faltantes": profile.missing,
+    }
+
+    if profile.is_numeric and profile.moments.count:
+        stats = profile.statistics()
+        digest["resumen"] = compact_value({
+            "min": stats.get("min"),
+            "q1": stats.get("q1"),
+            "mediana": stats.get("median"),
+            "q3": stats.get("q3"),
+            "max": stats.get("max"),
+            "media": stats.get("mean"),
+            "desvio": stats.get("stdDev"),
+        }, top)
+        if top and profile.sketch.count:
+            deciles = profile.sketch.quantiles([0.1, 0.9])
+            digest["resumen"]["p10"] = _number(deciles[0])
+            digest["resumen"]["p90"] = _number(deciles[1])
+        # Few distinct values (ages, grades) read better as exact frequencies
+        if profile.counts is not None and 0 < len(profile.counts) <= max(bins, top):
+            digest["frecuencias"] = [[_number(v), c] for v, c in sorted(profile.counts.items())]
+        else:
+            histogram = _histogram(profile, bins)
+            if histogram:
+                digest["histograma"] = histogram
+        return digest
+
+    if profile.counts is None:
+        digest["distintos"] = "más de mil"
+        return digest
+    ranked = sorted(profile.counts.items(), key=lambda item: (-item[1], str(item[0])))
+    digest["distintos"] = len(ranked)
+    if top:
+        digest["categorias"] = [[_number(v), c] for v, c in ranked[:top]]
+        rest = sum(c for _, c in ranked[top:])
+        if rest:
+            digest["otras"] = rest
+    return digest
+
+
+def spread_rows(rows: Sequence[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    return [compact_value(dict(rows[i]), count) for i in spread_indices(len(rows), count)]
+
+
+def build_digest(profiles: Dict[str, ColumnProfile], row_count: int, sample: Sequence[Dict[str, Any]],
+                 statistics: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Prompt fields (variables, sampleData, statistics) as compact JSON
+    within `budget` tokens. Detail drops step by step; if the coarsest
+    level still does not fit, trailing variables are left out and counted."""
+    fields: Dict[str, Any] = {}
+    for level, (top, bins, rows) in enumerate(DETAIL_LEVELS):
+        variables = [column_digest(profile, top, bins) for profile in profiles.values()]
+        fields = {
+            "variables": {"filas": row_count, "columnas": variables},
+            "sampleData": spread_rows(sample, rows),
+            "statistics": compact_statistics(statistics, max(top, 1)),
+        }
+        rendered = {key: compact_json(value) for key, value in fields.items()}
+        tokens = sum(count_tokens(text) for text in rendered.values())
+        if tokens <= budget:
+            return {**rendered, "tokens": tokens, "detail": level, "omitted": 0}
+
+    columns = fields["variables"]["columnas"]
+    kept = len(columns)
+    while kept > 0 and tokens > budget:
+        kept -= 1
+        fields["variables"] = {"filas": row_count, "columnas": columns[:kept], "omitidas": len(columns) - kept}
+        rendered = {key: compact_json(value) for key, value in fields.items()}
+        tokens = sum(count_tokens(text) for text in rendered.values())
+    if tokens > budget:
+        fields["sampleData"], fields["statistics"] = [], {}
+        rendered = {key: compact_json(value) for key, value in fields.items()}
+        tokens = sum(count_tokens(text) for text in rendered.values())
+    return {**rendered, "tokens": tokens, "detail": len(DETAIL_LEVELS) - 1, "omitted": len(columns) - kept}
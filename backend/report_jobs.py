@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import uuid
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOB_CONCURRENCY = int(os.environ.get('REPORT_JOB_CONCURRENCY', 4))
+REPORT_JOB_QUEUE_LIMIT = int(os.environ.get('REPORT_JOB_QUEUE_LIMIT', 200))
+REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('REPORT_JOB_MAX_ATTEMPTS', 3))
+# A running job whose lease expires (worker died, server restarted) is picked up again
+REPORT_JOB_LEASE_SECONDS = float(os.environ.get('REPORT_JOB_LEASE_SECONDS', 300))
+REPORT_JOB_RETRY_SECONDS = float(os.environ.get('REPORT_JOB_RETRY_SECONDS', 5))
+REPORT_JOB_POLL_SECONDS = float(os.environ.get('REPORT_JOB_POLL_SECONDS', 1))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE = (QUEUED, RUNNING)
+FINISHED = (SUCCEEDED, FAILED)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobFailed(Exception):
+    """Raised by a handler when retrying cannot help (e.g. the project is gone)."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+class ReportJobQueue:
+    """Report generation jobs persisted in `reportJobs`.
+
+    `concurrency` workers per process claim jobs atomically with
+    find_one_and_update, so several server processes can share the queue
+    and a restart resumes where it stopped: queued jobs stay queued and
+    running ones are reclaimed once their lease expires. Failed attempts
+    are retried with exponential backoff up to `max_attempts`.
+    """
+
+    def __init__(self, db, handler: Handler, concurrency: int = REPORT_JOB_CONCURRENCY,
+                 queue_limit: int = REPORT_JOB_QUEUE_LIMIT, max_attempts: int = REPORT_JOB_MAX_ATTEMPTS,
+                 lease_seconds: float = REPORT_JOB_LEASE_SECONDS, retry_seconds: float = REPORT_JOB_RETRY_SECONDS,
+                 poll_seconds: float = REPORT_JOB_POLL_SECONDS):
+        self.db = db
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue_limit = queue_limit
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._changed: Dict[str, asyncio.Event] = {}
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    async def submit(self, project_id: str, education_level: str, force: bool = False) -> Dict[str, Any]:
+        """Queue a report, or return the job already queued or running for
+        the same project and level."""
+        if not force:
+            existing = await self.db.reportJobs.find_one(
+                {"projectId": project_id, "educationLevel": education_level, "status": {"$in": list(ACTIVE)}},
+                {"_id": 0}
+            )
+            if existing:
+                return existing
+
+        if await self.db.reportJobs.count_documents({"status": QUEUED}) >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                503,
+                "Hay demasiados reportes en espera. Intentá de nuevo en unos minutos.",
+                headers={"Retry-After": "30"}
+            )
+
+        now = _iso(_now())
+        job = {
+            "id": str(uuid.uuid4()),
+            "projectId": project_id,
+            "educationLevel": education_level,
+            "force": force,
+            "status": QUEUED,
+            "attempts": 0,
+            "maxAttempts": self.max_attempts,
+            "runAt": now,
+            "createdAt": now,
+            "updatedAt": now,
+            "result": None,
+            "error": None,
+        }
+        await self.db.reportJobs.insert_one(dict(job))
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.reportJobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        now = _now()
+        job = await self.db.reportJobs.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "runAt": {"$lte": _iso(now)}},
+                {"status": RUNNING, "leaseUntil": {"$lt": _iso(now)}},
+            ]},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "workerId": self.worker_id,
+                    "leaseUntil": _iso(now + timedelta(seconds=self.lease_seconds)),
+                    "startedAt": _iso(now),
+                    "updatedAt": _iso(now),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("runAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            job.pop("_id", None)
+        return job
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event:
+            event.set()
+
+    async def _finish(self, job: Dict[str, Any], update: Dict[str, Any]):
+        update["updatedAt"] = _iso(_now())
+        # Only the worker holding the lease may record the outcome
+        await self.db.reportJobs.update_one(
+            {"id": job["id"], "workerId": self.worker_id, "status": RUNNING},
+            {"$set": update, "$unset": {"leaseUntil": ""}}
+        )
+        self._notify(job["id"])
+
+    async def process(self, job: Dict[str, Any]):
+        self.running += 1
+        self._notify(job["id"])
+        try:
+            if job["attempts"] > job.get("maxAttempts", self.max_attempts):
+                # Reclaimed after its last attempt died with the worker
+                raise JobFailed(job.get("error") or "Se agotaron los intentos")
+            result = await self.handler(job)
+        except Exception as e:
+            retry = not isinstance(e, JobFailed) and job["attempts"] < job.get("maxAttempts", self.max_attempts)
+            if retry:
+                self.retried += 1
+                delay = self.retry_seconds * 2 ** (job["attempts"] - 1)
+                await self._finish(job, {
+                    "status": QUEUED, "error": str(e), "runAt": _iso(_now() + timedelta(seconds=delay))
+                })
+            else:
+                self.failed += 1
+                logger.warning(f"Trabajo de reporte {job['id']} falló: {str(e)}")
+                await self._finish(job, {"status": FAILED, "error": str(e), "finishedAt": _iso(_now())})
+        else:
+            self.succeeded += 1
+            await self._finish(job, {
+                "status": SUCCEEDED, "result": result, "error": None, "finishedAt": _iso(_now())
+            })
+        finally:
+            self.running -= 1
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming so a submit in between is not missed
+            self._wakeup.clear()
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logger.warning(f"No se pudo leer la cola de reportes: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.process(job)
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        # Interrupted jobs keep their lease and are reclaimed after it expires
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Events belong to the loop that used them
+        self._wakeup = asyncio.Event()
+        self._changed.clear()
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Every status change of a job until it finishes. Changes made by
+        this process arrive at once; others are seen on the next poll."""
+        last = None
+        while True:
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.get(job_id)
+            if job is None:
+                return
+            state = (job["status"], job["attempts"])
+            if state != last:
+                last = state
+                yield job
+            if job["status"] in FINISHED:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def metrics(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        async for row in self.db.reportJobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return {
+            "workers": self.concurrency,
+            "queueLimit": self.queue_limit,
+            "runningHere": self.running,
+            "jobs": counts,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+        }
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Depends, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -6,24 +7,61 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional, Union
 import uuid
 from datetime import datetime, timezone
+from functools import partial
+import asyncio
 import json
 
+from starlette.concurrency import run_in_threadpool
+
 from models import (
-    ProjectCreate, Project, DatasetCreate, Dataset,
-    ChatRequest, Statistics, Report
+    ProjectCreate, Project, DatasetCreate, Dataset, ColumnarDataset,
+    ChatRequest, Statistics, Report, BatchStatisticsRequest, DatasetAppend
 )
 from statistics_calculator import StatisticsCalculator
-from deepseek_service import ProfeMarceChat, ReportGenerator
+from quantiles import QUANTILE_METHODS, resolve_probabilities, compute_quantiles
+from frequency import BINNING_METHODS, frequency_dicts
+from quantile_sketch import KLLSketch, DEFAULT_RELATIVE_ERROR, build_sketch
+from dataset_store import HEADER_PROJECTION, DatasetStore
+from dataset_summary import DatasetSummaries
+from columnar import rows_to_columns
+from ingestion import ingest_csv, parse_csv_records
+from excel_reader import read_excel_projection, remove_spooled, spool_to_disk
+from executor import CpuPool
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, list_response, parse_fields, projection
+from cascade import CascadeDeleter, ORPHAN_SWEEP_INTERVAL
+from indexes import ensure_indexes, verify_indexes, explain_routes, collection_scans
+from stats_cache import StatsCache, content_key
+from deepseek_service import (
+    ProfeMarceChat, ReportGenerator, REPORT_PROMPT_VERSION, chat_cache, llm_clients, report_fields
+)
+from report_cache import ReportCache, report_fingerprint
+from project_context import ProjectContextLoader
+from report_jobs import JobFailed, ReportJobQueue
+from llm_clients import keepalive_session
+from sse import SSE_HEADERS, sse_event, with_heartbeat
+from metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, MongoCommandMetrics
+from profiling import PROFILE_ID_HEADER, ProfileStore, ProfilingMiddleware, folded, stage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ['DB_NAME']]
+dataset_store = DatasetStore(db)
+cpu_pool = CpuPool()
+dataset_summaries = DatasetSummaries(db, dataset_store, run=cpu_pool.run_in_thread)
+stats_cache = StatsCache(db)
+report_cache = ReportCache(db)
+profile_store = ProfileStore(db)
+project_context = ProjectContextLoader(db, dataset_store, dataset_summaries)
+cascade = CascadeDeleter(client, db)
+
+# Strong references to fire-and-forget tasks so they are not collected mid-run
+background_tasks = set()
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -54,20 +92,25 @@ async def create_project(project: ProjectCreate, credentials: Optional[HTTPAutho
     return project_obj
 
 @api_router.get("/projects", response_model=List[Project])
-async def get_projects(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
+async def get_projects(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
     user_id = "demo_user"
     if credentials:
         user_id = credentials.credentials[:20]
-    
-    projects = await db.projects.find({"userId": user_id}, {"_id": 0}).to_list(100)
-    
-    for proj in projects:
-        if isinstance(proj.get('createdAt'), str):
-            proj['createdAt'] = datetime.fromisoformat(proj['createdAt'])
-        if isinstance(proj.get('updatedAt'), str):
-            proj['updatedAt'] = datetime.fromisoformat(proj['updatedAt'])
-    
-    return projects
+
+    return await list_response(
+        db.projects, {"userId": user_id}, cursor, limit, projection(parse_fields(fields)), stream
+    )
+
+async def require_project(project_id: str):
+    # Rows written for a project that does not exist would be swept as orphans
+    if not await db.projects.find_one({"id": project_id}, {"_id": 1}):
+        raise HTTPException(404, "Proyecto no encontrado")
 
 @api_router.get("/projects/{project_id}", response_model=Project)
 async def get_project(project_id: str):
@@ -85,21 +128,12 @@ async def get_project(project_id: str):
 @api_router.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
     try:
-        # Delete project
-        result = await db.projects.delete_one({"id": project_id})
-        if result.deleted_count == 0:
+        deleted = await cascade.delete_project(project_id)
+        if deleted is None:
             raise HTTPException(404, "Proyecto no encontrado")
-        
-        # Delete associated datasets
-        await db.datasets.delete_many({"projectId": project_id})
-        
-        # Delete associated statistics
-        await db.statistics.delete_many({"projectId": project_id})
-        
-        # Delete associated reports
-        await db.reports.delete_many({"projectId": project_id})
-        
-        return {"success": True, "message": "Proyecto eliminado"}
+        return {"success": True, "message": "Proyecto eliminado", "deleted": deleted}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error al eliminar proyecto: {str(e)}")
 
@@ -129,44 +163,184 @@ async def update_project(project_id: str, project_update: ProjectCreate):
 
 @api_router.post("/datasets", response_model=Dataset)
 async def create_dataset(dataset: DatasetCreate):
-    dataset_dict = dataset.model_dump()
-    dataset_obj = Dataset(
-        id=str(uuid.uuid4()),
-        **dataset_dict
-    )
-    
-    doc = dataset_obj.model_dump()
-    doc['createdAt'] = doc['createdAt'].isoformat()
-    
-    await db.datasets.insert_one(doc)
+    await require_project(dataset.projectId)
+    with stage("create_dataset.validate"):
+        dataset_obj = Dataset(
+            id=str(uuid.uuid4()),
+            projectId=dataset.projectId,
+            rawData=dataset.rawData,
+            variables=dataset.variables,
+            source=dataset.source
+        )
+
+    with stage("create_dataset.dump"):
+        meta = dataset_obj.model_dump(exclude={'rawData'})
+        meta['createdAt'] = meta['createdAt'].isoformat()
+
+    with stage("create_dataset.store"):
+        doc = await dataset_store.insert(meta, rows=dataset.rawData, columns=dataset.columns)
+    dataset_obj.rowCount = doc['rowCount']
     return dataset_obj
 
-@api_router.get("/datasets/{project_id}", response_model=List[Dataset])
-async def get_datasets(project_id: str):
-    datasets = await db.datasets.find({"projectId": project_id}, {"_id": 0}).to_list(100)
-    
-    for ds in datasets:
-        if isinstance(ds.get('createdAt'), str):
-            ds['createdAt'] = datetime.fromisoformat(ds['createdAt'])
-    
-    return datasets
+# Rebuilt from dataset storage instead of read from the document
+_DATASET_DATA_FIELDS = {"rawData", "columns", "variables"}
+
+@api_router.get("/datasets/{project_id}", response_model=Union[List[Dataset], List[ColumnarDataset]])
+async def get_datasets(
+    project_id: str,
+    format: str = Query("rows", pattern="^(rows|columns)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    wanted = parse_fields(fields)
+    needs_data = wanted is None or bool(_DATASET_DATA_FIELDS & set(wanted))
+
+    async def to_view(doc: dict) -> dict:
+        if not needs_data:
+            return doc
+        if format == "columns":
+            ds = await dataset_store.to_columns(doc)
+        else:
+            ds = await dataset_store.to_rows(doc)
+        if wanted is not None:
+            ds = {k: v for k, v in ds.items() if k in wanted or k in ("id", "createdAt")}
+        return ds
+
+    return await list_response(
+        db.datasets, {"projectId": project_id}, cursor, limit,
+        projection(None if needs_data else wanted), stream, to_view
+    )
+
+async def store_quantile_sketch(dataset_id: str, project_id: str, variable_name: str, sketch: KLLSketch):
+    await db.quantileSketches.update_one(
+        {"datasetId": dataset_id, "variableName": variable_name},
+        {"$set": {
+            "datasetId": dataset_id,
+            "projectId": project_id,
+            "variableName": variable_name,
+            "sketch": sketch.to_dict(),
+            "createdAt": datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+@api_router.post("/datasets/{dataset_id}/sketches")
+async def build_dataset_sketches(dataset_id: str, relative_error: float = Query(DEFAULT_RELATIVE_ERROR, gt=0, lt=1)):
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        raise HTTPException(404, "Dataset no encontrado")
+
+    built = []
+    for variable in await dataset_store.load_variables(dataset):
+        try:
+            values = [v for v in variable.get('values', []) if v is not None]
+            sketch = await cpu_pool.run(build_sketch, values, relative_error, work_size=len(values))
+        except (TypeError, ValueError):
+            # Qualitative variables have no quantiles
+            continue
+        if sketch.count == 0:
+            continue
+
+        await store_quantile_sketch(dataset_id, dataset['projectId'], variable['name'], sketch)
+        built.append({"variableName": variable['name'], "count": sketch.count, "retained": sketch.retained})
+
+    return {"datasetId": dataset_id, "relativeError": relative_error, "sketches": built}
+
+@api_router.get("/datasets/{dataset_id}/quantiles")
+async def get_dataset_quantiles(
+    dataset_id: str,
+    variableName: str,
+    probabilities: List[str] = Query(["quartiles"])
+):
+    doc = await db.quantileSketches.find_one(
+        {"datasetId": dataset_id, "variableName": variableName}, {"_id": 0}
+    )
+    if not doc:
+        raise HTTPException(404, "No hay sketch de cuantiles para esta variable")
+    try:
+        probs = resolve_probabilities(probabilities)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    sketch = KLLSketch.from_dict(doc['sketch'])
+    values = sketch.quantiles(probs) if probs else []
+    return {
+        "variableName": variableName,
+        "approximate": True,
+        "relativeError": sketch.relative_error,
+        "count": sketch.count,
+        "quantiles": [
+            {"probability": p, "value": float(v)} for p, v in zip(probs, values)
+        ]
+    }
+
+def summary_response(dataset_id: str, row_count: int, profiles: dict) -> dict:
+    return {
+        "datasetId": dataset_id,
+        "rowCount": row_count,
+        "variables": [
+            {
+                "name": name,
+                "type": profile.kind,
+                "missing": profile.missing,
+                "statistics": profile.statistics(),
+                "frequency": profile.frequency(),
+            }
+            for name, profile in profiles.items()
+        ]
+    }
+
+@api_router.get("/datasets/{dataset_id}/summary")
+async def get_dataset_summary(dataset_id: str):
+    dataset = await db.datasets.find_one({"id": dataset_id}, HEADER_PROJECTION)
+    if not dataset:
+        raise HTTPException(404, "Dataset no encontrado")
+    row_count, profiles = await dataset_summaries.get(dataset)
+    return summary_response(dataset_id, row_count, profiles)
+
+@api_router.post("/datasets/{dataset_id}/append")
+async def append_dataset_rows(dataset_id: str, payload: DatasetAppend):
+    # Only the dataset header is read; stored rows, inline or chunked, are never loaded
+    dataset = await db.datasets.find_one({"id": dataset_id}, HEADER_PROJECTION)
+    if not dataset:
+        raise HTTPException(404, "Dataset no encontrado")
+
+    if payload.columns is not None:
+        names, columns = list(payload.columns), dict(payload.columns)
+    else:
+        names, columns = rows_to_columns(payload.rows)
+    row_count = max((len(v) for v in columns.values()), default=0)
+    if row_count == 0:
+        raise HTTPException(400, "No hay filas para agregar")
+
+    known = dataset.get('columnOrder') or names
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise HTTPException(400, f"Columnas desconocidas: {', '.join(unknown)}")
+    columns = {
+        name: list(columns.get(name, [])) + [None] * (row_count - len(columns.get(name, [])))
+        for name in known
+    }
+
+    row_start = await dataset_store.append(dataset, columns, row_count)
+    total, profiles = await dataset_summaries.apply(dataset, columns, row_start, row_count)
+    return {"appended": row_count, **summary_response(dataset_id, total, profiles)}
 
 @api_router.delete("/datasets/project/{project_id}")
 async def delete_datasets_by_project(project_id: str):
     try:
-        result = await db.datasets.delete_many({"projectId": project_id})
-        return {"success": True, "deleted_count": result.deleted_count}
+        deleted_count = await dataset_store.delete_for_project(project_id)
+        return {"success": True, "deleted_count": deleted_count}
     except Exception as e:
         raise HTTPException(500, f"Error al eliminar datasets: {str(e)}")
 
-@api_router.post("/statistics/calculate")
-async def calculate_statistics(projectId: str, variableName: str, data: List[float]):
-    stats = StatisticsCalculator.calculate_basic_stats(data)
-    
+def statistics_doc(project_id: str, variable_name: str, stats: dict) -> dict:
     stats_obj = Statistics(
         id=str(uuid.uuid4()),
-        projectId=projectId,
-        variableName=variableName,
+        projectId=project_id,
+        variableName=variable_name,
         mean=stats.get('mean'),
         median=stats.get('median'),
         mode=stats.get('mode'),
@@ -178,120 +352,557 @@ async def calculate_statistics(projectId: str, variableName: str, data: List[flo
     
     doc = stats_obj.model_dump()
     doc['createdAt'] = doc['createdAt'].isoformat()
-    
-    await db.statistics.insert_one(doc)
-    return stats
+    return doc
 
-@api_router.post("/statistics/frequency")
-async def calculate_frequency(projectId: str, variableName: str, data: List):
-    freq_table = StatisticsCalculator.calculate_frequency_table(data)
-    
-    freq_obj = {
+def frequency_doc(project_id: str, variable_name: str, freq_table: dict) -> dict:
+    return {
         "id": str(uuid.uuid4()),
-        "projectId": projectId,
-        "variableName": variableName,
+        "projectId": project_id,
+        "variableName": variable_name,
         **freq_table,
         "createdAt": datetime.utcnow().isoformat()
     }
-    
-    await db.frequencyTables.insert_one(freq_obj)
-    return freq_table
 
-@api_router.get("/statistics/{project_id}")
-async def get_statistics(project_id: str):
-    stats = await db.statistics.find({"projectId": project_id}, {"_id": 0}).to_list(100)
+@api_router.post("/statistics/calculate")
+async def calculate_statistics(
+    projectId: str,
+    variableName: str,
+    data: List[float],
+    approximate: bool = False,
+    relative_error: float = Query(DEFAULT_RELATIVE_ERROR, gt=0, lt=1)
+):
+    await require_project(projectId)
+    key = content_key(
+        "basic", data, {"approximate": approximate, "relativeError": relative_error if approximate else None},
+        numeric=True
+    )
+    stats = await stats_cache.get(key)
+    if stats is None:
+        stats = await cpu_pool.run(
+            StatisticsCalculator.calculate_basic_stats, data, approximate, relative_error,
+            work_size=len(data)
+        )
+        await stats_cache.put(key, "basic", stats)
+
+    await stats_cache.record_once(
+        db.statistics, projectId, variableName, key,
+        lambda: statistics_doc(projectId, variableName, stats)
+    )
     return stats
 
+@api_router.post("/statistics/frequency")
+async def calculate_frequency(
+    projectId: str,
+    variableName: str,
+    data: List[Any],
+    binning: Optional[str] = None,
+    binWidth: Optional[float] = Query(None, gt=0),
+    layout: str = Query("dicts", pattern="^(dicts|columns)$")
+):
+    if binning is not None and binning not in BINNING_METHODS:
+        raise HTTPException(400, f"Método de agrupamiento desconocido: {binning}")
+    await require_project(projectId)
+
+    # Cached and stored in the columnar layout; the three-dict shape is
+    # derived from it on the way out
+    key = content_key("frequency", data, {"binning": binning, "binWidth": binWidth})
+    table = await stats_cache.get(key)
+    if table is None:
+        try:
+            table = await cpu_pool.run(
+                StatisticsCalculator.calculate_frequency_table, data, binning, binWidth, True,
+                work_size=len(data)
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        await stats_cache.put(key, "frequency", table)
+
+    await stats_cache.record_once(
+        db.frequencyTables, projectId, variableName, key,
+        lambda: frequency_doc(projectId, variableName, table)
+    )
+    return table if layout == "columns" else frequency_dicts(table)
+
+async def approximate_variables(dataset: dict, names: Optional[List[str]], include_frequency: bool):
+    """Numeric variables answered from what is stored for the dataset, never
+    from its rows: moments and frequency counts from the summary appends
+    keep current, and the median and quartiles from the variable's stored
+    quantile sketch while it still covers every value (the summary's own
+    sketch otherwise). There is no mode, and the frequency table is not
+    grouped into intervals (null beyond the distinct-value limit).
+
+    Returns those results and every requested name in dataset order. They
+    are not stored in db.statistics, which holds exact results only.
+    """
+    _, profiles = await dataset_summaries.get(dataset)
+    wanted = names if names is not None else list(profiles)
+    numeric = [name for name in wanted if name in profiles and profiles[name].is_numeric]
+    stored = {
+        doc['variableName']: KLLSketch.from_dict(doc['sketch'])
+        async for doc in db.quantileSketches.find(
+            {"datasetId": dataset['id'], "variableName": {"$in": numeric}},
+            {"_id": 0, "variableName": 1, "sketch": 1}
+        )
+    }
+
+    results = {}
+    for name in numeric:
+        profile = profiles[name]
+        sketch = stored.get(name)
+        if sketch is None or sketch.count != profile.moments.count:
+            sketch = profile.sketch
+        result = {
+            "numeric": True,
+            "approximate": True,
+            "statistics": StatisticsCalculator.stats_from_moments(profile.moments, advanced=True, sketch=sketch),
+        }
+        if include_frequency:
+            result["frequency"] = profile.frequency()
+        results[name] = result
+    return results, wanted
+
+def _column_keys(columns: dict, params: dict) -> dict:
+    return {name: content_key("variable", values, params) for name, values in columns.items()}
+
+@api_router.post("/statistics/batch")
+async def calculate_statistics_batch(request: BatchStatisticsRequest):
+    if request.quantileMethod not in QUANTILE_METHODS:
+        raise HTTPException(400, f"Método de cuantiles desconocido: {request.quantileMethod}")
+    if request.binning is not None and request.binning not in BINNING_METHODS:
+        raise HTTPException(400, f"Método de agrupamiento desconocido: {request.binning}")
+
+    project_id = request.projectId
+    approximate, order = {}, None
+    if request.datasetId:
+        dataset = await db.datasets.find_one(
+            {"id": request.datasetId}, HEADER_PROJECTION if request.approximate else {"_id": 0}
+        )
+        if not dataset:
+            raise HTTPException(404, "Dataset no encontrado")
+        project_id = dataset['projectId']
+        names = request.variables
+        if request.approximate:
+            approximate, order = await approximate_variables(dataset, request.variables, request.includeFrequency)
+            names = [name for name in order if name not in approximate]
+            if names:
+                dataset = await db.datasets.find_one({"id": request.datasetId}, {"_id": 0})
+        columns = await dataset_store.load_columns(dataset, names) if names != [] else {}
+    elif request.columns is not None:
+        columns = {
+            name: values for name, values in request.columns.items()
+            if not request.variables or name in request.variables
+        }
+    else:
+        raise HTTPException(400, "Se requiere datasetId o columns")
+
+    missing = [name for name in request.variables or [] if name not in columns and name not in approximate]
+    if missing:
+        raise HTTPException(400, f"Variables no encontradas: {', '.join(missing)}")
+    if request.persist and not project_id:
+        raise HTTPException(400, "Se requiere projectId para guardar los resultados")
+    if request.persist and not request.datasetId:
+        await require_project(project_id)
+
+    # Unchanged columns come from the cache; the rest are spread over the
+    # CPU pool, one task per worker rather than one per column
+    params = {
+        "quantileMethod": request.quantileMethod, "includeFrequency": request.includeFrequency,
+        "binning": request.binning, "binWidth": request.binWidth
+    }
+    keys = await run_in_threadpool(_column_keys, columns, params)
+    cached = await stats_cache.get_many(list(keys.values()))
+    pending = {name: values for name, values in columns.items() if keys[name] not in cached}
+    computed = {}
+    if pending:
+        try:
+            computed = await cpu_pool.run_partitioned(
+                StatisticsCalculator.calculate_batch, pending, request.quantileMethod,
+                request.includeFrequency, request.binning, request.binWidth
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        await stats_cache.put_many("variable", {keys[name]: result for name, result in computed.items()})
+    results = {name: computed[name] if name in computed else cached[keys[name]] for name in columns}
+    if approximate:
+        results = {name: approximate.get(name) or results[name] for name in order}
+
+    written = {"statistics": 0, "frequencyTables": 0}
+    if request.persist:
+        written["statistics"], written["frequencyTables"] = await asyncio.gather(
+            stats_cache.record_many(db.statistics, [
+                (project_id, name, keys[name], partial(statistics_doc, project_id, name, result['statistics']))
+                for name, result in results.items() if name in keys and result.get('statistics')
+            ]),
+            stats_cache.record_many(db.frequencyTables, [
+                (project_id, name, keys[name], partial(frequency_doc, project_id, name, result['frequency']))
+                for name, result in results.items() if name in keys and 'frequency' in result
+            ])
+        )
+
+    return {
+        "projectId": project_id,
+        "datasetId": request.datasetId,
+        "variables": [
+            {"name": name, "cached": name not in computed and name not in approximate, **result}
+            for name, result in results.items()
+        ],
+        "written": written
+    }
+
+@api_router.post("/statistics/quantiles")
+async def calculate_quantiles(
+    data: List[float],
+    probabilities: List[str] = Query(["quartiles"]),
+    method: str = "linear"
+):
+    if method not in QUANTILE_METHODS:
+        raise HTTPException(400, f"Método de cuantiles desconocido: {method}")
+    try:
+        probs = resolve_probabilities(probabilities)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    numeric_data = [x for x in data if x is not None]
+    if not numeric_data or not probs:
+        return {"method": method, "quantiles": []}
+
+    values = await cpu_pool.run(
+        compute_quantiles, numeric_data, probs, method, work_size=len(numeric_data)
+    )
+    return {
+        "method": method,
+        "quantiles": [
+            {"probability": p, "value": float(v)} for p, v in zip(probs, values)
+        ]
+    }
+
+@api_router.get("/statistics/{project_id}")
+async def get_statistics(
+    project_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    return await list_response(
+        db.statistics, {"projectId": project_id}, cursor, limit, projection(parse_fields(fields)), stream
+    )
+
 @api_router.post("/chat")
 async def chat_with_profe_marce(chat_req: ChatRequest):
     try:
-        profe = ProfeMarceChat(education_level=chat_req.educationLevel)
-        response = await profe.chat(chat_req.message, chat_req.sessionId)
+        profe = ProfeMarceChat.for_level(chat_req.educationLevel)
+        response = await profe.chat(chat_req.message, chat_req.sessionId, use_cache=chat_req.useCache)
         return {"response": response}
     except Exception as e:
         raise HTTPException(500, f"Error en el chat: {str(e)}")
 
+@api_router.post("/chat/stream")
+async def chat_with_profe_marce_stream(chat_req: ChatRequest):
+    profe = ProfeMarceChat.for_level(chat_req.educationLevel)
+
+    async def events():
+        try:
+            async for piece in profe.chat_stream(chat_req.message, chat_req.sessionId, use_cache=chat_req.useCache):
+                yield sse_event({"text": piece}, "token")
+            yield sse_event({}, "done")
+        except Exception as e:
+            yield sse_event({"detail": f"Lo siento, tuve un problema: {str(e)}"}, "error")
+
+    return StreamingResponse(with_heartbeat(events()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def load_report_context(project_id: str) -> dict:
+    # The prompt is built from the column profiles and a sample spread over
+    # the first dataset, never from the full columns
+    context = await project_context.load(project_id)
+    context["statistics"] = context["statistics"][0] if context["statistics"] else {}
+    return context
+
+def project_fingerprint(project_data: dict, education_level: str) -> str:
+    return report_fingerprint(
+        report_fields(project_data, education_level), education_level, REPORT_PROMPT_VERSION, llm_clients.model
+    )
+
+async def save_report(project_id: str, content: str, education_level: Optional[str] = None,
+                      fingerprint: Optional[str] = None) -> str:
+    report_obj = Report(
+        id=str(uuid.uuid4()),
+        projectId=project_id,
+        content=content,
+        educationLevel=education_level,
+        fingerprint=fingerprint
+    )
+
+    doc = report_obj.model_dump()
+    doc['createdAt'] = doc['createdAt'].isoformat()
+
+    await db.reports.insert_one(doc)
+    return report_obj.id
+
 @api_router.post("/reports/generate")
-async def generate_report(project_id: str, education_level: str = "secundario"):
+async def generate_report(project_id: str, education_level: str = "secundario", force: bool = False):
     try:
-        project = await db.projects.find_one({"id": project_id}, {"_id": 0})
-        if not project:
-            raise HTTPException(404, "Proyecto no encontrado")
-        
-        datasets = await db.datasets.find({"projectId": project_id}, {"_id": 0}).to_list(10)
-        stats = await db.statistics.find({"projectId": project_id}, {"_id": 0}).to_list(100)
-        
-        project_data = {
-            **project,
-            "datasets": datasets[:1] if datasets else [],
-            "sampleData": datasets[0].get('rawData', [])[:10] if datasets else [],
-            "statistics": stats[0] if stats else {}
-        }
-        
-        report_content = await ReportGenerator.generate_report(project_data, education_level)
-        
-        report_obj = Report(
-            id=str(uuid.uuid4()),
-            projectId=project_id,
-            content=report_content
-        )
-        
-        doc = report_obj.model_dump()
-        doc['createdAt'] = doc['createdAt'].isoformat()
-        
-        await db.reports.insert_one(doc)
-        return {"report": report_content, "id": report_obj.id}
+        project_data = await load_report_context(project_id)
+        fingerprint = project_fingerprint(project_data, education_level)
+        cached = await report_cache.lookup(project_id, fingerprint, force)
+        if cached:
+            return {"report": cached['content'], "id": cached['id'], "cached": True}
+
+        try:
+            report_content = await ReportGenerator.generate(project_data, education_level)
+        except Exception as e:
+            # Failures are still stored as before, but never reused
+            report_content = f"Error generando reporte: {str(e)}"
+            fingerprint = None
+        report_id = await save_report(project_id, report_content, education_level, fingerprint)
+        return {"report": report_content, "id": report_id, "cached": False}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error generando reporte: {str(e)}")
 
+async def stream_report_to_queue(project_id: str, project_data: dict, education_level: str,
+                                 fingerprint: str, queue: asyncio.Queue):
+    pieces = []
+    try:
+        async for piece in ReportGenerator.stream_report(project_data, education_level):
+            pieces.append(piece)
+            await queue.put(sse_event({"text": piece}, "token"))
+        report_id = await save_report(project_id, "".join(pieces), education_level, fingerprint)
+        await queue.put(sse_event({"id": report_id, "cached": False}, "done"))
+    except Exception as e:
+        logger.warning(f"Reporte del proyecto {project_id} no generado: {str(e)}")
+        await queue.put(sse_event({"detail": f"Error generando reporte: {str(e)}"}, "error"))
+    finally:
+        await queue.put(None)
+
+@api_router.post("/reports/generate/stream")
+async def generate_report_stream(project_id: str, education_level: str = "secundario", force: bool = False):
+    project_data = await load_report_context(project_id)
+    fingerprint = project_fingerprint(project_data, education_level)
+    cached = await report_cache.lookup(project_id, fingerprint, force)
+    if cached:
+        async def replay():
+            yield sse_event({"text": cached['content']}, "token")
+            yield sse_event({"id": cached['id'], "cached": True}, "done")
+        return StreamingResponse(replay(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    # Generation runs apart from the response so the report is still saved
+    # when the student closes the page before the stream ends
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        stream_report_to_queue(project_id, project_data, education_level, fingerprint, queue)
+    )
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    async def events():
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            yield event
+
+    return StreamingResponse(with_heartbeat(events()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def run_report_job(job: dict) -> dict:
+    try:
+        project_data = await load_report_context(job['projectId'])
+    except HTTPException as e:
+        raise JobFailed(e.detail)
+
+    education_level = job['educationLevel']
+    fingerprint = project_fingerprint(project_data, education_level)
+    cached = await report_cache.lookup(job['projectId'], fingerprint, job.get('force', False))
+    if cached:
+        return {"reportId": cached['id'], "cached": True}
+
+    content = await ReportGenerator.generate(project_data, education_level)
+    report_id = await save_report(job['projectId'], content, education_level, fingerprint)
+    return {"reportId": report_id, "cached": False}
+
+report_jobs = ReportJobQueue(db, run_report_job)
+
+@api_router.post("/reports/jobs", status_code=202)
+async def submit_report_job(project_id: str, education_level: str = "secundario", force: bool = False):
+    return await report_jobs.submit(project_id, education_level, force)
+
+@api_router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    job = await report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Trabajo no encontrado")
+    return job
+
+@api_router.get("/reports/jobs/{job_id}/events")
+async def watch_report_job(job_id: str):
+    if not await report_jobs.get(job_id):
+        raise HTTPException(404, "Trabajo no encontrado")
+
+    async def events():
+        async for job in report_jobs.watch(job_id):
+            yield sse_event(job, "status")
+
+    return StreamingResponse(with_heartbeat(events()), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/reports/{project_id}")
-async def get_reports(project_id: str):
-    reports = await db.reports.find({"projectId": project_id}, {"_id": 0}).to_list(100)
-    return reports
+async def get_reports(
+    project_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    return await list_response(
+        db.reports, {"projectId": project_id}, cursor, limit, projection(parse_fields(fields)), stream
+    )
 
 @api_router.post("/upload/excel")
-async def upload_excel(file: UploadFile = File(...)):
+async def upload_excel(
+    file: UploadFile = File(...),
+    sheet: Optional[str] = None,
+    columns: Optional[List[str]] = Query(None),
+    rowStart: int = Query(0, ge=0),
+    rowLimit: Optional[int] = Query(None, ge=1)
+):
     try:
-        import pandas as pd
-        from io import BytesIO
-        
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        
-        data = df.to_dict(orient='records')
-        columns = list(df.columns)
+        # The worker process opens the upload by path and streams it, so
+        # neither process holds the whole file in memory
+        with stage("upload_excel.spool"):
+            path, size = await run_in_threadpool(spool_to_disk, file.file)
+        try:
+            with stage("upload_excel.parse"):
+                parsed = await cpu_pool.run(
+                    read_excel_projection, path, sheet, columns, rowStart, rowLimit, work_size=size
+                )
+        finally:
+            remove_spooled(path)
+        data = parsed['data']
         
         return {
             "success": True,
             "data": data,
-            "columns": columns,
-            "rowCount": len(data)
+            "columns": parsed['columns'],
+            "rowCount": len(data),
+            "sheet": parsed['sheet'],
+            "sheets": parsed['sheets']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(400, f"Error procesando Excel: {str(e)}")
 
 @api_router.post("/upload/csv")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(file: UploadFile = File(...), projectId: Optional[str] = None):
     try:
-        import pandas as pd
-        from io import StringIO
-        
-        contents = await file.read()
-        text = contents.decode('utf-8')
-        df = pd.read_csv(StringIO(text))
-        
-        data = df.to_dict(orient='records')
-        columns = list(df.columns)
-        
+        if not projectId:
+            with stage("upload_csv.parse"):
+                parsed = await parse_csv_records(file.file, run=cpu_pool.run_in_thread)
+            return {
+                "success": True,
+                "data": parsed['data'],
+                "columns": parsed['columns'],
+                "rowCount": len(parsed['data'])
+            }
+
+        await require_project(projectId)
+        # Streaming path: chunks go straight into dataset storage and the
+        # statistics are accumulated on the way, so memory stays bounded
+        meta = {
+            "id": str(uuid.uuid4()),
+            "projectId": projectId,
+            "source": "csv",
+            "createdAt": datetime.utcnow().isoformat()
+        }
+        with stage("upload_csv.ingest"):
+            result = await ingest_csv(file.file, dataset_store, meta, run=cpu_pool.run_in_thread)
+
+        with stage("upload_csv.statistics"):
+            stats_docs = [
+                statistics_doc(projectId, name, stats) for name, stats in result['statistics'].items()
+            ]
+            if stats_docs:
+                await db.statistics.insert_many(stats_docs)
+        with stage("upload_csv.sketches"):
+            for name, sketch in result['sketches'].items():
+                await store_quantile_sketch(result['datasetId'], projectId, name, sketch)
+        with stage("upload_csv.summary"):
+            await dataset_summaries.save(
+                {"id": result['datasetId'], "projectId": projectId}, result['rowCount'], result['profiles']
+            )
+
         return {
             "success": True,
-            "data": data,
-            "columns": columns,
-            "rowCount": len(data)
+            "datasetId": result['datasetId'],
+            "columns": result['columns'],
+            "columnTypes": result['columnTypes'],
+            "rowCount": result['rowCount'],
+            "statistics": result['statistics'],
+            "preview": result['preview']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(400, f"Error procesando CSV: {str(e)}")
 
+@api_router.get("/system/cpu-pool")
+async def get_cpu_pool_metrics():
+    return cpu_pool.metrics()
+
+@api_router.get("/system/indexes")
+async def get_index_diagnostics():
+    explained = await explain_routes(db)
+    return {
+        "indexes": await verify_indexes(db),
+        "queries": explained,
+        "collectionScans": collection_scans(explained)
+    }
+
+@api_router.get("/system/cascade")
+async def get_cascade_metrics():
+    return cascade.metrics()
+
+@api_router.post("/system/orphans/sweep")
+async def sweep_orphans():
+    return await cascade.sweep()
+
+@api_router.get("/system/chat-cache")
+async def get_chat_cache_metrics():
+    return chat_cache.metrics()
+
+@api_router.get("/system/llm-clients")
+async def get_llm_client_metrics():
+    return llm_clients.metrics()
+
+@api_router.get("/system/project-context")
+async def get_project_context_metrics():
+    return project_context.metrics()
+
+@api_router.get("/system/profiles")
+async def list_profiles(limit: int = Query(20, ge=1, le=100), route: Optional[str] = None):
+    return await profile_store.recent(limit, route)
+
+@api_router.get("/system/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    doc = await profile_store.get(profile_id)
+    if not doc:
+        raise HTTPException(404, "Perfil no encontrado")
+    if format == "folded":
+        return PlainTextResponse(folded(doc))
+    return doc
+
+@api_router.get("/system/report-cache")
+async def get_report_cache_metrics():
+    return report_cache.metrics()
+
+@api_router.get("/system/report-jobs")
+async def get_report_job_metrics():
+    return await report_jobs.metrics()
+
+@api_router.get("/system/stats-cache")
+async def get_stats_cache_metrics():
+    return stats_cache.metrics()
+
 @api_router.get("/examples/datasets")
 async def get_example_datasets():
     examples = [
@@ -363,13 +974,20 @@ async def get_example_datasets():
 
 app.include_router(api_router)
 
+app.add_middleware(ProfilingMiddleware, store_factory=lambda: profile_store)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -377,6 +995,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        report = await ensure_indexes(db)
+    except Exception as e:
+        logger.warning(f"No se pudieron verificar los índices: {str(e)}")
+        return
+    for collection, entries in report.items():
+        for entry in entries:
+            if entry["error"]:
+                logger.warning(f"Índice {collection}.{entry['name']} no creado: {entry['error']}")
+
+@app.on_event("startup")
+async def open_llm_connections():
+    app.state.llm_session = keepalive_session()
+
+@app.on_event("startup")
+async def start_report_workers():
+    report_jobs.start()
+
+@app.on_event("startup")
+async def start_orphan_sweeper():
+    if ORPHAN_SWEEP_INTERVAL > 0:
+        app.state.orphan_sweeper = asyncio.create_task(cascade.run_sweeper(ORPHAN_SWEEP_INTERVAL))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await report_jobs.stop()
+    sweeper = getattr(app.state, "orphan_sweeper", None)
+    if sweeper:
+        sweeper.cancel()
     client.close()
+    cpu_pool.shutdown()
+    llm_session = getattr(app.state, "llm_session", None)
+    if llm_session is not None:
+        await llm_session.aclose()
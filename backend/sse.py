@@ -0,0 +1,43 @@
+from typing import Any, AsyncIterator, Optional
+import asyncio
+import json
+
+SSE_HEARTBEAT_SECONDS = 15.0
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the whole answer
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def with_heartbeat(events: AsyncIterator[bytes], interval: float = SSE_HEARTBEAT_SECONDS
+                         ) -> AsyncIterator[bytes]:
+    """Forward `events`, sending an SSE comment whenever nothing arrived for
+    `interval` seconds so proxies and browsers keep the connection open
+    while the model is still thinking."""
+    iterator = events.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield b": ping\n\n"
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            pending = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        if not pending.done():
+            pending.cancel()
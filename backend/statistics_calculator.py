@@ -1,78 +1,261 @@
-from typing import List, Dict, Any, Optional
-import statistics
-from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from frequency import frequency_table, frequency_dicts
+from moments import MomentAccumulator
+from profiling import stage
+from quantiles import compute_quantile_groups
+from quantile_sketch import KLLSketch, DEFAULT_RELATIVE_ERROR
+
+
+def _to_array(data) -> np.ndarray:
+    # One C-level conversion to contiguous float64; None becomes NaN and
+    # NaN is treated as a missing value (pandas uploads use it for empty cells)
+    arr = np.ascontiguousarray(np.asarray(data, dtype=np.float64).ravel())
+    mask = np.isnan(arr)
+    if mask.any():
+        arr = arr[~mask]
+    return arr
+
+
+def _mode(arr: np.ndarray) -> float:
+    # Hash factorization numbers values by first appearance, so argmax over
+    # the counts resolves ties the way statistics.mode does, without sorting
+    codes, uniques = pd.factorize(arr)
+    return float(uniques[np.argmax(np.bincount(codes))])
+
+
+def _describe(
+    arr: np.ndarray,
+    quantile_probs: Sequence[float] = (),
+    quantile_method: str = "linear",
+    sketch: Optional[KLLSketch] = None
+):
+    n = arr.size
+    with stage("statistics.quantiles"):
+        if sketch is not None:
+            median, quantiles = sketch.quantiles([0.5]), sketch.quantiles(quantile_probs)
+        else:
+            # The median and any extra quantiles come from one shared selection
+            median, quantiles = compute_quantile_groups(
+                arr, [((0.5,), "linear"), (quantile_probs, quantile_method)]
+            )
+
+    with stage("statistics.moments"):
+        minimum = arr.min()
+        maximum = arr.max()
+        mean = arr.sum() / n
+        if n > 1:
+            deviations = arr - mean
+            variance = float(np.dot(deviations, deviations) / (n - 1))
+    with stage("statistics.mode"):
+        mode = _mode(arr)
+
+    result = {
+        "mean": float(mean),
+        "median": float(median[0]),
+        "range": float(maximum - minimum),
+        "min": float(minimum),
+        "max": float(maximum),
+        "count": int(n),
+        "mode": mode,
+    }
+
+    if n > 1:
+        result["variance"] = variance
+        result["stdDev"] = float(np.sqrt(variance))
+
+    return result, quantiles
+
 
 class StatisticsCalculator:
     @staticmethod
-    def calculate_frequency_table(data: List[Any]) -> Dict[str, Any]:
-        counter = Counter(data)
-        total = len(data)
-        
-        absolute_freq = dict(counter)
-        relative_freq = {k: v/total for k, v in absolute_freq.items()}
-        percentage_freq = {k: (v/total)*100 for k, v in absolute_freq.items()}
-        
-        return {
-            "absoluteFrequency": absolute_freq,
-            "relativeFrequency": relative_freq,
-            "percentageFrequency": percentage_freq
+    def calculate_frequency_table(
+        data: List[Any],
+        binning: Optional[str] = None,
+        bin_width: Optional[float] = None,
+        columnar: bool = False
+    ) -> Dict[str, Any]:
+        table = frequency_table(data, binning, bin_width)
+        return table if columnar else frequency_dicts(table)
+
+    @staticmethod
+    def stats_from_moments(
+        acc: MomentAccumulator,
+        advanced: bool = False,
+        sketch: Optional[KLLSketch] = None
+    ) -> Dict[str, Any]:
+        # The mode needs the whole column and the median/quartiles need a
+        # quantile sketch, so without one they are not part of the result
+        if acc.count == 0:
+            return {}
+
+        result = {
+            "mean": acc.mean,
+            "range": acc.max - acc.min,
+            "min": acc.min,
+            "max": acc.max,
+            "count": acc.count
         }
-    
+
+        if sketch is not None and sketch.count:
+            result["median"] = sketch.quantile(0.5)
+
+        if acc.count > 1:
+            result["variance"] = acc.variance
+            result["stdDev"] = acc.std_dev
+
+        if advanced:
+            if "stdDev" in result and result["mean"] != 0:
+                result["coefficientOfVariation"] = (result["stdDev"] / result["mean"]) * 100
+            if acc.skewness is not None:
+                result["skewness"] = acc.skewness
+                result["kurtosis"] = acc.kurtosis
+            if sketch is not None and sketch.count:
+                q1, q3 = sketch.quantiles([0.25, 0.75])
+                result["q1"] = float(q1)
+                result["q3"] = float(q3)
+                result["iqr"] = result["q3"] - result["q1"]
+
+        return result
+
     @staticmethod
-    def calculate_basic_stats(data: List[float]) -> Dict[str, Any]:
-        if not data:
+    def calculate_streaming_stats(
+        chunks: Iterable[Iterable[float]],
+        advanced: bool = False,
+        approximate: bool = False,
+        relative_error: float = DEFAULT_RELATIVE_ERROR
+    ) -> Dict[str, Any]:
+        acc = MomentAccumulator()
+        sketch = KLLSketch.for_error(relative_error) if approximate else None
+        try:
+            for chunk in chunks:
+                chunk = _to_array(chunk)
+                acc.update(chunk)
+                if sketch is not None:
+                    sketch.update(chunk)
+        except Exception as e:
+            print(f"Error calculating streaming statistics: {e}")
+            return {}
+        return StatisticsCalculator.stats_from_moments(acc, advanced, sketch)
+
+    @staticmethod
+    def calculate_basic_stats(
+        data: List[float],
+        approximate: bool = False,
+        relative_error: float = DEFAULT_RELATIVE_ERROR,
+        sketch: Optional[KLLSketch] = None
+    ) -> Dict[str, Any]:
+        if isinstance(data, MomentAccumulator):
+            return StatisticsCalculator.stats_from_moments(data, sketch=sketch)
+
+        if data is None or len(data) == 0:
             return {}
-        
+
         try:
-            numeric_data = [float(x) for x in data if x is not None]
-            
-            if not numeric_data:
+            with stage("statistics.to_array"):
+                numeric_data = _to_array(data)
+
+            if numeric_data.size == 0:
                 return {}
-            
-            result = {
-                "mean": statistics.mean(numeric_data),
-                "median": statistics.median(numeric_data),
-                "range": max(numeric_data) - min(numeric_data),
-                "min": min(numeric_data),
-                "max": max(numeric_data),
-                "count": len(numeric_data)
-            }
-            
-            try:
-                result["mode"] = statistics.mode(numeric_data)
-            except statistics.StatisticsError:
-                result["mode"] = None
-            
-            if len(numeric_data) > 1:
-                result["variance"] = statistics.variance(numeric_data)
-                result["stdDev"] = statistics.stdev(numeric_data)
-            
+
+            if sketch is None and approximate:
+                with stage("statistics.sketch"):
+                    sketch = KLLSketch.for_error(relative_error).update(numeric_data)
+            result, _ = _describe(numeric_data, sketch=sketch)
             return result
         except Exception as e:
             print(f"Error calculating statistics: {e}")
             return {}
-    
+
     @staticmethod
-    def calculate_advanced_stats(data: List[float]) -> Dict[str, Any]:
-        basic = StatisticsCalculator.calculate_basic_stats(data)
-        
-        if not basic:
-            return basic
-        
+    def calculate_advanced_stats(
+        data: List[float],
+        quantile_method: str = "linear",
+        approximate: bool = False,
+        relative_error: float = DEFAULT_RELATIVE_ERROR,
+        sketch: Optional[KLLSketch] = None
+    ) -> Dict[str, Any]:
+        if isinstance(data, MomentAccumulator):
+            return StatisticsCalculator.stats_from_moments(data, advanced=True, sketch=sketch)
+
+        if data is None or len(data) == 0:
+            return {}
+
+        try:
+            with stage("statistics.to_array"):
+                numeric_data = _to_array(data)
+
+            if numeric_data.size == 0:
+                return {}
+
+            if sketch is None and approximate:
+                with stage("statistics.sketch"):
+                    sketch = KLLSketch.for_error(relative_error).update(numeric_data)
+            basic, (q1, q3) = _describe(numeric_data, (0.25, 0.75), quantile_method, sketch)
+        except Exception as e:
+            print(f"Error calculating statistics: {e}")
+            return {}
+
         try:
-            numeric_data = [float(x) for x in data if x is not None]
-            
             if "mean" in basic and "stdDev" in basic and basic["mean"] != 0:
                 basic["coefficientOfVariation"] = (basic["stdDev"] / basic["mean"]) * 100
-            
-            sorted_data = sorted(numeric_data)
-            n = len(sorted_data)
-            
-            basic["q1"] = sorted_data[n // 4]
-            basic["q3"] = sorted_data[3 * n // 4]
+
+            with stage("statistics.shape"):
+                acc = MomentAccumulator().update(numeric_data)
+            if acc.skewness is not None:
+                basic["skewness"] = acc.skewness
+                basic["kurtosis"] = acc.kurtosis
+
+            basic["q1"] = float(q1)
+            basic["q3"] = float(q3)
             basic["iqr"] = basic["q3"] - basic["q1"]
-            
+
             return basic
         except Exception as e:
             print(f"Error calculating advanced statistics: {e}")
-            return basic
\ No newline at end of file
+            return basic
+
+    @staticmethod
+    def calculate_variable_stats(
+        values: List[Any],
+        quantile_method: str = "linear",
+        include_frequency: bool = True,
+        binning: Optional[str] = "auto",
+        bin_width: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Everything the analysis pages show for one variable: basic and
+        advanced statistics for numeric columns, plus its frequency table."""
+        try:
+            arr = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            arr = None
+
+        result: Dict[str, Any] = {"numeric": arr is not None}
+        if arr is not None:
+            result["statistics"] = StatisticsCalculator.calculate_advanced_stats(arr, quantile_method)
+        if include_frequency:
+            with stage("statistics.frequency"):
+                result["frequency"] = frequency_table(
+                    arr if arr is not None else values, binning if arr is not None else None, bin_width,
+                    original=values if arr is not None and not isinstance(values, np.ndarray) else None
+                )
+        return result
+
+    @staticmethod
+    def calculate_batch(
+        columns: Dict[str, List[Any]],
+        quantile_method: str = "linear",
+        include_frequency: bool = True,
+        binning: Optional[str] = "auto",
+        bin_width: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        with stage("statistics.batch"):
+            return {
+                name: StatisticsCalculator.calculate_variable_stats(
+                    values, quantile_method, include_frequency, binning, bin_width
+                )
+                for name, values in columns.items()
+            }
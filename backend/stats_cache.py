@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+STATS_CACHE_ENTRIES = int(os.environ.get('STATS_CACHE_ENTRIES', 1024))
+# Entries in the statsCache collection expire this long after they were written
+STATS_CACHE_TTL_SECONDS = int(os.environ.get('STATS_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+
+
+def content_key(kind: str, values: Sequence[Any], params: Optional[Dict[str, Any]] = None,
+                numeric: bool = False) -> str:
+    """Hash of the input vector plus the calculation kind and its parameters.
+
+    Numeric vectors hash their float64 bytes; anything else (frequency tables
+    over labels) hashes its JSON form so "1" and 1 stay distinct.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(kind.encode())
+    digest.update(json.dumps(params or {}, sort_keys=True).encode())
+    if numeric:
+        digest.update(b"f8")
+        digest.update(np.asarray(values, dtype=np.float64).tobytes())
+    else:
+        digest.update(b"json")
+        digest.update(json.dumps(list(values), default=str).encode())
+    return digest.hexdigest()
+
+
+class _LRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._items: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            self._items.move_to_end(key)
+        except KeyError:
+            return default
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StatsCache:
+    """Two-tier cache of computed statistics keyed by `content_key`.
+
+    The in-process LRU answers repeated requests without touching Mongo; the
+    `statsCache` collection survives restarts and is shared between workers.
+    Statistics rows are upserted on (project, variable, key) so identical
+    requests do not write duplicates; Mongo is the only record of what exists.
+    """
+
+    def __init__(self, db, max_entries: int = STATS_CACHE_ENTRIES):
+        self.db = db
+        self._results = _LRU(max_entries)
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.writes_skipped = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        result = self._results.get(key)
+        if result is not None:
+            self.memory_hits += 1
+            return result
+
+        doc = await self.db.statsCache.find_one({"key": key}, {"_id": 0, "result": 1})
+        if doc is not None:
+            self.store_hits += 1
+            self._results.put(key, doc["result"])
+            return doc["result"]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, kind: str, result: Any):
+        self._results.put(key, result)
+        await self.db.statsCache.update_one(
+            {"key": key},
+            {"$setOnInsert": {"key": key, "kind": kind, "result": result, "createdAt": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Cached results for the keys that have one, with one query for the
+        keys not in memory."""
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            result = self._results.get(key)
+            if result is None:
+                missing.append(key)
+            else:
+                self.memory_hits += 1
+                found[key] = result
+        if missing:
+            async for doc in self.db.statsCache.find({"key": {"$in": missing}}, {"_id": 0, "key": 1, "result": 1}):
+                self.store_hits += 1
+                self._results.put(doc["key"], doc["result"])
+                found[doc["key"]] = doc["result"]
+            self.misses += len(missing) - sum(1 for key in missing if key in found)
+        return found
+
+    async def put_many(self, kind: str, results: Dict[str, Any]):
+        if not results:
+            return
+        created_at = datetime.utcnow()
+        for key, result in results.items():
+            self._results.put(key, result)
+        await self.db.statsCache.bulk_write([
+            UpdateOne(
+                {"key": key},
+                {"$setOnInsert": {"key": key, "kind": kind, "result": result, "createdAt": created_at}},
+                upsert=True
+            )
+            for key, result in results.items()
+        ], ordered=False)
+
+    async def record_once(self, collection, project_id: str, variable_name: str, key: str,
+                          make_doc: Callable[[], Dict[str, Any]]) -> bool:
+        """Insert `make_doc()` unless a row for the same project, variable and content
+        already exists. Returns True when a row was written."""
+        try:
+            result = await collection.update_one(
+                {"projectId": project_id, "variableName": variable_name, "contentHash": key},
+                {"$setOnInsert": {**make_doc(), "contentHash": key}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the same row first
+            self.writes_skipped += 1
+            return False
+        if result.upserted_id is None:
+            self.writes_skipped += 1
+            return False
+        return True
+
+    async def record_many(self, collection, rows: Sequence[Tuple[str, str, str, Callable[[], Dict[str, Any]]]]) -> int:
+        """`record_once` for many (project, variable, key, make_doc) rows in a
+        single bulk write. Returns the number of rows written."""
+        operations = [
+            UpdateOne(
+                {"projectId": project_id, "variableName": variable_name, "contentHash": key},
+                {"$setOnInsert": {**make_doc(), "contentHash": key}},
+                upsert=True
+            )
+            for project_id, variable_name, key, make_doc in rows
+        ]
+        if not operations:
+            return 0
+
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            written = result.upserted_count
+        except BulkWriteError as exc:
+            if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+                raise
+            written = exc.details.get("nUpserted", 0)
+        self.writes_skipped += len(operations) - written
+        return written
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.store_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._results),
+            "maxEntries": self._results.max_entries,
+            "hits": hits,
+            "memoryHits": self.memory_hits,
+            "storeHits": self.store_hits,
+            "misses": self.misses,
+            "hitRate": hits / lookups if lookups else None,
+            "duplicateWritesSkipped": self.writes_skipped,
+        }
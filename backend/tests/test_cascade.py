@@ -0,0 +1,136 @@
+"""
+Unit tests for the project cascade delete and the orphan sweeper
+"""
+import asyncio
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from cascade import PROJECT_COLLECTIONS, CascadeDeleter
+from dataset_store import DatasetStore
+from ingestion import ingest_csv
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+async def _seed(db, project_id):
+    await db.projects.insert_one({"id": project_id})
+    await db.datasets.insert_one({"id": f"{project_id}-d", "projectId": project_id})
+    for name in PROJECT_COLLECTIONS:
+        if name != "datasets":
+            await db[name].insert_one({"projectId": project_id, "datasetId": f"{project_id}-d"})
+
+
+class TestCascadeDelete:
+    """Every collection keyed by projectId is cleared"""
+
+    def test_delete_project(self):
+        async def scenario():
+            client = mongomock_motor.AsyncMongoMockClient()
+            db = client["t"]
+            await _seed(db, "a")
+            await _seed(db, "b")
+            forgotten = []
+            deleter = CascadeDeleter(client, db, forget=forgotten.append)
+            counts = await deleter.delete_project("a")
+            missing = await deleter.delete_project("a")
+            left = {name: await db[name].count_documents({}) for name in PROJECT_COLLECTIONS}
+            return counts, missing, left, forgotten
+
+        counts, missing, left, forgotten = asyncio.run(scenario())
+        assert counts == {name: 1 for name in PROJECT_COLLECTIONS}
+        assert missing is None
+        assert left == {name: 1 for name in PROJECT_COLLECTIONS}
+        assert forgotten == ["a"]
+        print("✓ Cascade delete covers every project collection")
+
+
+class TestOrphanSweep:
+    """Documents whose project or dataset is gone are collected in bulk"""
+
+    def test_sweep(self):
+        async def scenario():
+            client = mongomock_motor.AsyncMongoMockClient()
+            db = client["t"]
+            await _seed(db, "a")
+            await _seed(db, "b")
+            # A cascade interrupted after the project document was deleted
+            await db.projects.delete_one({"id": "b"})
+            # A dataset deleted without its chunks
+            await db.datasets.delete_one({"id": "a-d"})
+            deleter = CascadeDeleter(client, db, batch_size=1)
+            result = await deleter.sweep()
+            left = {name: await db[name].count_documents({}) for name in PROJECT_COLLECTIONS}
+            return result, left
+
+        result, left = asyncio.run(scenario())
+        assert result["orphanProjects"] == 1
+        assert left == {
+            "datasets": 0, "datasetChunks": 0, "datasetSummaries": 0, "quantileSketches": 0,
+            "statistics": 1, "frequencyTables": 1, "reports": 1, "reportJobs": 1,
+        }
+        print("✓ Orphans swept")
+
+    def test_grace_period(self):
+        """Only orphans past the grace period go, whatever createdAt's type"""
+        async def scenario():
+            client = mongomock_motor.AsyncMongoMockClient()
+            db = client["t"]
+            await db.projects.insert_one({"id": "p"})
+            old = datetime.utcnow() - timedelta(days=2)
+            await db.quantileSketches.insert_many([
+                {"projectId": "p", "datasetId": "gone", "variableName": "a", "createdAt": old},
+                {"projectId": "p", "datasetId": "gone", "variableName": "b", "createdAt": old.isoformat()},
+                {"projectId": "p", "datasetId": "new", "variableName": "c", "createdAt": datetime.utcnow()},
+            ])
+            # Written for a project whose document is not there (yet)
+            await db.statistics.insert_many([
+                {"projectId": "late", "createdAt": datetime.utcnow().isoformat()},
+                {"projectId": "gone", "createdAt": old.isoformat()},
+            ])
+            result = await CascadeDeleter(client, db).sweep()
+            sketches = await db.quantileSketches.distinct("variableName")
+            statistics = await db.statistics.distinct("projectId")
+            return result, sketches, statistics
+
+        result, sketches, statistics = asyncio.run(scenario())
+        assert result["deleted"]["quantileSketches"] == 2
+        assert sketches == ["c"]
+        assert statistics == ["late"]
+        print("✓ Young orphans kept through the grace period")
+
+
+class TestSweepDuringIngest:
+    """Chunks written ahead of their dataset document survive a sweep"""
+
+    def test_sweep_during_ingest(self):
+        async def scenario():
+            client = mongomock_motor.AsyncMongoMockClient()
+            db = client["t"]
+            await db.projects.insert_one({"id": "p"})
+            # A dataset deleted long ago left its (unstamped) chunks behind
+            await db.datasetChunks.insert_one({"projectId": "p", "datasetId": "gone", "index": 0})
+            store = DatasetStore(db)
+            deleter = CascadeDeleter(client, db)
+            sweeps = []
+
+            async def run(fn, *args):
+                sweeps.append(await deleter.sweep())
+                return fn(*args)
+
+            csv = "x,y\n" + "".join(f"{i},{i * 0.5}\n" for i in range(50))
+            result = await ingest_csv(io.BytesIO(csv.encode()), store, {"id": "d", "projectId": "p"},
+                                      chunk_rows=10, run=run)
+            doc = await db.datasets.find_one({"id": "d"})
+            columns = await store.load_columns(doc)
+            return result, doc, columns, sweeps, await db.datasetChunks.count_documents({"datasetId": "gone"})
+
+        result, doc, columns, sweeps, stale = asyncio.run(scenario())
+        assert len(sweeps) > 5
+        assert result["rowCount"] == 50
+        assert doc["chunkCount"] == 5
+        assert columns["x"] == list(range(50))
+        assert sum(sweep["deleted"]["datasetChunks"] for sweep in sweeps) == 1
+        assert stale == 0
+        print("✓ In-flight ingestion is not swept")
@@ -0,0 +1,107 @@
+"""
+Unit tests for the Profe Marce response cache, against a stub LLM
+"""
+import asyncio
+
+import numpy as np
+
+from chat_cache import ChatCache, normalize_question, session_dependent
+
+
+class StubLlm:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def asker(self, question):
+        async def ask():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            return f"respuesta a {question}"
+        return ask
+
+
+def bag_of_words(texts):
+    # Topic words weigh more than the question wording
+    vocab = {"que": 1, "es": 1, "la": 1, "significa": 1, "mediana": 3, "media": 3, "moda": 3}
+    vectors = np.array([[t.split().count(w) * weight for w, weight in vocab.items()] for t in texts],
+                       dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestNormalization:
+    """Equivalent spellings share a key; personal questions are not cached"""
+
+    def test_normalize(self):
+        assert normalize_question("¿Qué es la  MEDIANA?") == normalize_question("que es la mediana")
+        print("✓ Question normalization")
+
+    def test_session_dependent(self):
+        assert session_dependent("¿Qué significa la media de mis datos?")
+        assert not session_dependent("¿Qué es la mediana?")
+        print("✓ Session-dependent questions detected")
+
+
+class TestChatCache:
+    """Exact and similarity hits, expiry, eviction and opt-out"""
+
+    def test_exact_hits_per_level(self):
+        async def scenario():
+            cache, llm = ChatCache(), StubLlm()
+            for question in ("¿Qué es la mediana?", "que es la mediana", "QUÉ ES LA MEDIANA"):
+                await cache.get_or_ask("secundario", question, llm.asker(question))
+            await cache.get_or_ask("primario", "¿Qué es la mediana?", llm.asker("p"))
+            return cache, llm
+
+        cache, llm = asyncio.run(scenario())
+        assert llm.calls == 2
+        levels = cache.metrics()["levels"]
+        assert levels["secundario"]["exactHits"] == 2
+        assert levels["secundario"]["hitRate"] == 2 / 3
+        assert levels["primario"]["misses"] == 1
+        print("✓ Exact hits per level")
+
+    def test_concurrent_identical_questions_share_one_call(self):
+        async def scenario():
+            cache, llm = ChatCache(), StubLlm(delay=0.01)
+            replies = await asyncio.gather(*(
+                cache.get_or_ask("secundario", "¿Qué es la moda?", llm.asker("moda")) for _ in range(40)
+            ))
+            return cache, llm, replies
+
+        cache, llm, replies = asyncio.run(scenario())
+        assert llm.calls == 1 and len(set(replies)) == 1
+        assert cache.metrics()["levels"]["secundario"]["sharedInFlight"] == 39
+        print("✓ One LLM call for a classroom asking at once")
+
+    def test_semantic_tier(self):
+        async def scenario():
+            cache, llm = ChatCache(embedder=bag_of_words, similarity=0.8), StubLlm()
+            first = await cache.get_or_ask("superior", "que es la mediana", llm.asker("a"))
+            second = await cache.get_or_ask("superior", "que significa la mediana", llm.asker("b"))
+            third = await cache.get_or_ask("superior", "que es la moda", llm.asker("c"))
+            return cache, llm, first, second, third
+
+        cache, llm, first, second, third = asyncio.run(scenario())
+        assert second == first and third != first
+        assert llm.calls == 2
+        assert cache.metrics()["levels"]["superior"]["semanticHits"] == 1
+        print("✓ Similar questions answered from the cache")
+
+    def test_ttl_lru_and_opt_out(self):
+        now = [0.0]
+
+        async def scenario():
+            cache, llm = ChatCache(ttl=60, max_entries=2, clock=lambda: now[0]), StubLlm()
+            for question in ("a", "b", "c"):
+                await cache.get_or_ask("secundario", question, llm.asker(question))
+            await cache.get_or_ask("secundario", "a", llm.asker("a"))  # evicted by c
+            now[0] = 61
+            await cache.get_or_ask("secundario", "c", llm.asker("c"))  # expired
+            await cache.get_or_ask("secundario", "c", llm.asker("c"), use_cache=False)
+            return cache, llm
+
+        cache, llm = asyncio.run(scenario())
+        assert llm.calls == 6
+        assert cache.metrics()["levels"]["secundario"]["bypassed"] == 1
+        print("✓ TTL, LRU eviction and opt-out")
@@ -0,0 +1,88 @@
+"""
+Unit tests for the columnar dataset encoding
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+import dataset_store
+from columnar import (
+    encode_column, decode_column, column_to_array, encoded_size,
+    rows_to_columns, columns_to_rows
+)
+from dataset_store import DatasetStore
+
+
+class TestColumnEncoding:
+    """Typed arrays per column with dictionary-encoded strings"""
+
+    def test_types_and_round_trip(self):
+        """Each inferred type decodes back to the original values"""
+        cases = {
+            "int64": [13, 14, None, 15],
+            "float64": [2.5, None, 4.0],
+            "bool": [True, False, None],
+            "string": ["Argentina", "Brasil", None, "Argentina"],
+            "null": [None, None],
+            "mixed": [1, "dos", 3.0],
+        }
+        for expected_type, values in cases.items():
+            col = encode_column(values)
+            assert col["type"] == expected_type
+            assert decode_column(col) == values
+        print("✓ Column types round-trip")
+
+    def test_strings_are_dictionary_encoded(self):
+        """Repeated categories are stored once"""
+        col = encode_column(["Perros", "Gatos", "Perros", "Perros"])
+        assert col["dictionary"] == ["Perros", "Gatos"]
+        assert np.frombuffer(col["codes"], dtype="<i4").tolist() == [0, 1, 0, 0]
+        print("✓ Strings dictionary encoded")
+
+    def test_nan_is_missing_and_numeric_view(self):
+        """NaN cells (pandas empty cells) become None; numeric view uses NaN"""
+        col = encode_column([1.0, float("nan"), 3.0])
+        assert decode_column(col) == [1.0, None, 3.0]
+        arr = column_to_array(col)
+        assert arr[0] == 1.0 and np.isnan(arr[1])
+        assert column_to_array(encode_column(["a"])) is None
+        print("✓ Missing values handled")
+
+    def test_rows_columns_round_trip(self):
+        """Rows with missing keys come back with None"""
+        rows = [{"estudiante": 1, "edad": 13}, {"estudiante": 2}]
+        names, columns = rows_to_columns(rows)
+        assert names == ["estudiante", "edad"]
+        assert columns_to_rows(names, columns) == [
+            {"estudiante": 1, "edad": 13}, {"estudiante": 2, "edad": None}
+        ]
+        print("✓ Rows and columns convert both ways")
+
+
+class TestChunkSizing:
+    """Chunks are sized from their encoded bytes, not from a per-cell guess"""
+
+    def test_wide_values_split(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        monkeypatch.setattr(dataset_store, "CHUNK_BYTES", 4_000)
+        names = [f"estudiante número {i:04d} " * 3 for i in range(300)]
+        mixed = [i if i % 2 else f"respuesta {i}" for i in range(300)]
+
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            store = DatasetStore(db)
+            doc = await store.insert({"id": "d1", "projectId": "p1"}, columns={"nombre": names, "mixto": mixed})
+            await store.append(doc, {"nombre": names[:100], "mixto": mixed[:100]}, 100)
+            doc = await db.datasets.find_one({"id": "d1"}, {"_id": 0})
+            chunks = await db.datasetChunks.find({"datasetId": "d1"}, {"_id": 0}).sort("index", 1).to_list(None)
+            return doc, chunks, await store.load_columns(doc)
+
+        doc, chunks, columns = asyncio.run(scenario())
+        # 8 bytes a cell would have allowed 250 rows a chunk, far over the limit
+        assert doc["chunkRows"] == 250 and doc["chunkCount"] == len(chunks) > 4
+        assert all(sum(encoded_size(col) for col in chunk["columns"].values()) <= 4_000 for chunk in chunks)
+        assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+        assert columns["nombre"] == names + names[:100]
+        assert columns["mixto"] == mixed + mixed[:100]
+        print("✓ Chunks bounded by encoded size")
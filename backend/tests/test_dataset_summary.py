@@ -0,0 +1,96 @@
+"""
+Unit tests for incremental dataset summaries (append API)
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_store import HEADER_PROJECTION, DatasetStore
+from dataset_summary import DatasetSummaries
+from ingestion import ColumnProfile
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+class TestColumnProfile:
+    """Running sufficient statistics of one column"""
+
+    def test_incremental_matches_full(self):
+        """Updating chunk by chunk (with a serialization round trip) equals one pass"""
+        values = np.random.default_rng(3).integers(0, 12, 1_000).astype(float)
+        full = ColumnProfile("x")
+        full.update(pd.Series(values))
+
+        part = ColumnProfile("x")
+        part.update(pd.Series(values[:900]))
+        part = ColumnProfile.from_dict(part.to_dict())
+        part.update(pd.Series(values[900:]))
+
+        assert part.frequency() == full.frequency()
+        assert part.statistics()["mean"] == pytest.approx(full.statistics()["mean"])
+        assert part.statistics()["variance"] == pytest.approx(full.statistics()["variance"])
+        print("✓ Incremental profile equals full pass")
+
+    def test_distinct_limit(self):
+        """Continuous columns stop keeping exact counts"""
+        profile = ColumnProfile("x")
+        profile.update(pd.Series(np.linspace(0, 1, 5_000)))
+        assert profile.frequency() is None
+        assert profile.statistics()["count"] == 5_000
+        print("✓ Distinct-value limit")
+
+
+class TestAppend:
+    """Appended rows land in new chunks and in the stored summary"""
+
+    def test_append_updates_storage_and_summary(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            store = DatasetStore(db)
+            summaries = DatasetSummaries(db, store, run=_inline)
+            meta = {"id": "d1", "projectId": "p", "variables": []}
+            await store.insert(meta, columns={"edad": [13, 14, 15], "prov": ["Salta", "Jujuy", "Salta"]})
+            await summaries.get(await db.datasets.find_one({"id": "d1"}))
+
+            doc = await db.datasets.find_one({"id": "d1"})
+            new = {"edad": [16, None], "prov": ["Jujuy", "Salta"]}
+            start = await store.append(doc, new, 2)
+            total, profiles = await summaries.apply(doc, new, start, 2)
+
+            stored = await store.load_columns(await db.datasets.find_one({"id": "d1"}))
+            return start, total, profiles, stored
+
+        start, total, profiles, stored = asyncio.run(scenario())
+        assert (start, total) == (3, 5)
+        assert stored == {"edad": [13, 14, 15, 16, None], "prov": ["Salta", "Jujuy", "Salta", "Jujuy", "Salta"]}
+        assert profiles["edad"].statistics()["mean"] == 14.5
+        assert profiles["edad"].missing == 1
+        assert profiles["prov"].frequency()["absolute"] == [3, 2]
+        print("✓ Append updates storage and summary")
+
+    def test_append_from_header(self):
+        """Appends and summaries work from a header read without any rows"""
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            store = DatasetStore(db)
+            summaries = DatasetSummaries(db, store, run=_inline)
+            await store.insert({"id": "d1", "projectId": "p", "variables": []}, columns={"edad": [13, 14, 15]})
+            header = await db.datasets.find_one({"id": "d1"}, HEADER_PROJECTION)
+            # No stored summary yet: the first one is rebuilt from storage
+            first = await summaries.get(header)
+            start = await store.append(header, {"edad": [16]}, 1)
+            total, profiles = await summaries.apply(header, {"edad": [16]}, start, 1)
+            return header, first, total, profiles
+
+        header, (first_total, _), total, profiles = asyncio.run(scenario())
+        assert not {"columns", "variableValues", "head", "rawData"} & set(header)
+        assert header["columnOrder"] == ["edad"] and header["inline"] is True
+        assert (first_total, total) == (3, 4)
+        assert profiles["edad"].statistics()["mean"] == 14.5
+        print("✓ Header read carries no inline data")
@@ -0,0 +1,108 @@
+"""
+Unit tests for the streaming Excel reader
+"""
+from datetime import datetime
+from io import BytesIO
+import os
+
+import pandas as pd
+from openpyxl import Workbook
+
+from excel_reader import read_excel_projection, read_xlsx_projection, remove_spooled, spool_to_disk
+
+
+def _workbook(*sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets:
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+class TestExcelProjection:
+    """Sheet, column and row projection over one streamed worksheet"""
+
+    def test_matches_pandas(self):
+        """Full read gives the same records and header names as pandas"""
+        rows = [["nombre", "edad", None, "edad"]]
+        rows += [[f"est_{i}", 13 + i % 4, 1.5 * i, i] for i in range(20)]
+        contents = _workbook(("Notas", rows))
+
+        result = read_excel_projection(contents)
+        expected = pd.read_excel(BytesIO(contents)).to_dict(orient='records')
+        assert result["columns"] == ["nombre", "edad", "Unnamed: 2", "edad.1"]
+        assert result["data"] == expected
+        print("✓ Full read matches pandas")
+
+    def test_projection(self):
+        """Only the requested sheet, columns and row window come back"""
+        contents = _workbook(
+            ("A", [["x"], [1]]),
+            ("B", [["id", "nota", "fecha"]] + [[i, i * 2, datetime(2024, 3, i + 1)] for i in range(10)])
+        )
+        result = read_excel_projection(contents, sheet="B", columns=["fecha", "id"], row_start=2, row_limit=3)
+        assert result["sheet"] == "B"
+        assert result["sheets"] == ["A", "B"]
+        assert result["data"] == [{"fecha": datetime(2024, 3, i + 1), "id": i} for i in (2, 3, 4)]
+        print("✓ Projection reads only the window")
+
+    def test_blank_rows_and_missing_column(self):
+        """Blank rows are skipped and unknown columns are rejected"""
+        contents = _workbook(("S", [["a", "b"], [1, None], [None, None], [None, "z"]]))
+        assert read_excel_projection(contents)["data"] == [{"a": 1, "b": None}, {"a": None, "b": "z"}]
+        try:
+            read_excel_projection(contents, columns=["c"])
+            assert False, "expected ValueError"
+        except ValueError as exc:
+            assert "c" in str(exc)
+        print("✓ Blank rows skipped, missing columns rejected")
+
+
+class TestDifferencesFromPandas:
+    """Where the streaming reader knowingly departs from pd.read_excel"""
+
+    def test_empty_rows_dropped(self):
+        """pandas keeps fully empty rows as all-NaN; the reader drops them"""
+        contents = _workbook(("S", [["a", "b"], [1, "x"], [None, None], [None, None], [2, "y"]]))
+        expected = pd.read_excel(BytesIO(contents))
+        assert len(expected) == 4
+        result = read_xlsx_projection(contents)
+        assert result["data"] == expected.dropna(how="all").to_dict(orient="records")
+        # Row windows still count the blank sheet rows, like skiprows/nrows
+        windowed = read_xlsx_projection(contents, row_start=1, row_limit=3)
+        assert windowed["data"] == [{"a": 2, "b": "y"}]
+        print("✓ Empty rows dropped")
+
+    def test_cells_beyond_header_discarded(self):
+        """pandas adds "Unnamed: i" columns for them; the reader keeps the header's"""
+        contents = _workbook(("S", [["a", "b"], [1, 2], [3, 4, "extra", 5]]))
+        expected = pd.read_excel(BytesIO(contents))
+        assert list(expected.columns) == ["a", "b", "Unnamed: 2", "Unnamed: 3"]
+        result = read_xlsx_projection(contents)
+        assert result["columns"] == ["a", "b"]
+        assert result["data"] == expected[["a", "b"]].to_dict(orient="records")
+        print("✓ Cells beyond the header discarded")
+
+
+class TestSources:
+    """Uploads are read from a path or file, never as one bytes object"""
+
+    def test_path_and_file(self, tmp_path):
+        contents = _workbook(("S", [["n"]] + [[i] for i in range(50)]))
+        with open(tmp_path / "upload.bin", "wb") as fh:
+            fh.write(contents)
+        with open(tmp_path / "upload.bin", "rb") as fh:
+            fh.read(10)
+            from_file = read_excel_projection(fh)
+            path, size = spool_to_disk(fh)
+        try:
+            assert size == len(contents)
+            assert read_excel_projection(path) == from_file == read_excel_projection(contents)
+        finally:
+            remove_spooled(path)
+        assert not os.path.exists(path)
+        print("✓ Read from a path or an open file")
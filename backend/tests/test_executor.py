@@ -0,0 +1,103 @@
+"""
+Unit tests for the bounded CPU pool
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from executor import CpuPool
+
+
+class TestCpuPool:
+    """Admission control, the inline path and wait metrics"""
+
+    def test_inline_below_threshold(self):
+        pool = CpuPool(workers=1, inline_below=5000)
+        calls = []
+
+        def local(x):
+            # Not picklable: only the inline path can run it
+            calls.append(threading.get_ident())
+            return x * 2
+
+        result = asyncio.run(pool.run(local, 21, work_size=4999))
+        assert result == 42 and calls == [threading.get_ident()]
+        metrics = pool.metrics()
+        assert metrics["inline"] == 1 and metrics["submitted"] == 0
+        assert pool._executor is None
+        print("✓ Small work runs inline")
+
+    def test_process_pool_records_waits(self):
+        pool = CpuPool(workers=1, inline_below=5000)
+        try:
+            result = asyncio.run(pool.run(sorted, [3, 1, 2], work_size=5000))
+        finally:
+            pool.shutdown()
+        assert result == [1, 2, 3]
+        metrics = pool.metrics()
+        assert metrics["submitted"] == metrics["completed"] == 1
+        assert metrics["inFlight"] == 0
+        waits = metrics["queueWaitSeconds"]
+        assert waits["count"] == 1 and waits["p50"] is not None and waits["max"] >= 0
+        print("✓ Process pool run with its queue wait recorded")
+
+    def test_admission_limit(self):
+        """Threads and processes share one admission limit; beyond it, 503"""
+        async def scenario():
+            pool = CpuPool(workers=1, queue_limit=1)
+            release = threading.Event()
+            held = [asyncio.create_task(pool.run_in_thread(release.wait)) for _ in range(2)]
+            while pool.in_flight < 2:
+                await asyncio.sleep(0.01)
+            metrics = pool.metrics()
+
+            with pytest.raises(HTTPException) as exc:
+                await pool.run(sorted, [1], work_size=10_000)
+            with pytest.raises(HTTPException):
+                await pool.run_in_thread(sorted, [1])
+
+            release.set()
+            await asyncio.gather(*held)
+            return pool, metrics, exc.value
+
+        pool, busy, error = asyncio.run(scenario())
+        assert busy["inFlight"] == 2 and busy["queued"] == 1
+        assert error.status_code == 503 and error.headers["Retry-After"] == "2"
+        metrics = pool.metrics()
+        assert metrics["rejected"] == 2
+        assert metrics["completed"] == 2 and metrics["inFlight"] == 0
+        # The queued call waited for the first one to finish
+        assert metrics["queueWaitSeconds"]["count"] == 2
+        assert pool._executor is None
+        print("✓ Load beyond the queue limit is shed with 503")
+
+    def test_failures_counted(self):
+        async def scenario():
+            pool = CpuPool(workers=1)
+            with pytest.raises(ValueError):
+                await pool.run_in_thread(int, "x")
+            return pool.metrics()
+
+        metrics = asyncio.run(scenario())
+        assert metrics["failed"] == 1 and metrics["inFlight"] == 0
+        print("✓ Failures counted and their slot released")
+
+    def test_run_partitioned(self):
+        pool = CpuPool(workers=3, inline_below=10_000)
+        groups = []
+
+        def total(group, offset):
+            groups.append(sorted(group))
+            return {key: sum(values) + offset for key, values in group.items()}
+
+        items = {"a": [1] * 50, "b": [1] * 40, "c": [1] * 30, "d": [1] * 20, "e": [1] * 10}
+        result = asyncio.run(pool.run_partitioned(total, items, 1))
+
+        assert list(result) == list(items)
+        assert result == {"a": 51, "b": 41, "c": 31, "d": 21, "e": 11}
+        # Heaviest first onto the lightest group: a, b, c then d->c, e->b
+        assert sorted(groups) == [["a"], ["b", "e"], ["c", "d"]]
+        assert pool.metrics()["inline"] == 3
+        print("✓ Work items packed into one call per worker")
@@ -0,0 +1,80 @@
+"""
+Unit tests for the vectorized frequency-table engine
+"""
+import numpy as np
+import pytest
+
+from frequency import frequency_table, frequency_dicts
+
+
+class TestFrequencyValues:
+    """One class per distinct value"""
+
+    def test_qualitative(self):
+        """Counts follow first appearance and every kind comes from one pass"""
+        table = frequency_table(["Perro", "Gato", "Perro", None, "Conejo", "Perro"])
+        assert table["type"] == "values"
+        assert table["values"] == ["Perro", "Gato", "Conejo"]
+        assert table["absolute"] == [3, 1, 1]
+        assert table["cumulative"] == [3, 4, 5]
+        assert table["relative"] == [0.6, 0.2, 0.2]
+        assert table["cumulativePercentage"][-1] == pytest.approx(100.0)
+        assert (table["count"], table["missing"]) == (5, 1)
+        print("✓ Qualitative frequencies")
+
+    def test_discrete_sorted_and_legacy_shape(self):
+        """Numeric values are sorted; the old three-dict shape is derived from the table"""
+        table = frequency_table([3, 1, 2, 2])
+        assert table["values"] == [1, 2, 3]
+        assert frequency_dicts(table) == {
+            "absoluteFrequency": {1: 1, 2: 2, 3: 1},
+            "relativeFrequency": {1: 0.25, 2: 0.5, 3: 0.25},
+            "percentageFrequency": {1: 25.0, 2: 50.0, 3: 25.0},
+        }
+        print("✓ Discrete frequencies")
+
+    def test_mixed_int_and_float_keys(self):
+        """Ints stay ints next to floats; 1 and 1.0 are one class labelled as first seen"""
+        values = [3, 1.5, 1, None, 2, 1.0, 3]
+        table = frequency_table(values)
+        assert table["values"] == [1, 1.5, 2, 3]
+        assert [type(v) for v in table["values"]] == [int, float, int, int]
+        assert table["absolute"] == [2, 1, 1, 2]
+        # The batch path counts on a float array and labels from the raw values
+        arr = np.array([3, 1.5, 1, np.nan, 2, 1.0, 3])
+        assert frequency_table(arr, original=values)["values"] == table["values"]
+        assert [type(v) for v in frequency_table(arr, original=values)["values"]] == [int, float, int, int]
+        print("✓ Mixed numeric keys keep their types")
+
+
+class TestFrequencyBinning:
+    """Class intervals for continuous variables"""
+
+    @pytest.mark.parametrize("method", ["sturges", "scott", "fd"])
+    def test_rules_match_numpy(self, method):
+        """Bin rules agree with numpy's estimators and lose no observation"""
+        values = np.random.default_rng(0).normal(50, 10, 500)
+        table = frequency_table(values, method)
+        expected, edges = np.histogram(values, bins=method)
+        assert table["absolute"] == expected.tolist()
+        assert table["lower"][0] == edges[0] and table["upper"][-1] == edges[-1]
+        assert table["cumulative"][-1] == 500
+        print(f"✓ {method} binning")
+
+    def test_fixed_width(self):
+        """Intervals are [a, b) with the maximum in a closed last class"""
+        table = frequency_table([0, 1, 2, 3, 4, 5, 10], "width", 5)
+        assert table["labels"] == ["[0, 5)", "[5, 10)", "[10, 15]"]
+        assert table["absolute"] == [5, 1, 1]
+        assert table["classMark"] == [2.5, 7.5, 12.5]
+        print("✓ Fixed-width binning")
+
+    def test_auto_and_errors(self):
+        """Auto only bins variables with many distinct values"""
+        assert frequency_table([1, 2, 2, 3], "auto")["type"] == "values"
+        assert frequency_table(np.arange(100.0) / 3, "auto")["type"] == "intervals"
+        with pytest.raises(ValueError):
+            frequency_table(["a", "b"], "sturges")
+        with pytest.raises(ValueError):
+            frequency_table([1.0, 2.0], "width")
+        print("✓ Auto binning and validation")
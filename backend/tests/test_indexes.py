@@ -0,0 +1,67 @@
+"""
+Unit tests for the index manager and explain() diagnostics
+"""
+import asyncio
+
+import pytest
+
+from indexes import INDEXES, ROUTE_QUERIES, ensure_indexes, summarize_plan, verify_indexes
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class TestIndexes:
+    """Declared indexes cover the read paths and get created"""
+
+    def test_route_queries_are_indexed(self):
+        """Every diagnosed query has an index whose prefix is its filter plus sort"""
+        for query in ROUTE_QUERIES:
+            fields = list(query["filter"]) + [field for field, _ in query.get("sort", [])]
+            keys = [list(model.document["key"]) for model in INDEXES[query["collection"]]]
+            assert any(key[:len(fields)] == fields for key in keys), query["route"]
+        print("✓ Read paths covered by indexes")
+
+    def test_stats_cache_expires(self):
+        """The statsCache collection is bounded by a TTL on createdAt"""
+        ttl = [model.document for model in INDEXES["statsCache"] if "expireAfterSeconds" in model.document]
+        assert [list(doc["key"]) for doc in ttl] == [["createdAt"]]
+        print("✓ Stats cache entries expire")
+
+    def test_ensure_and_verify(self):
+        """Missing indexes are created and then reported as ok"""
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            before = await verify_indexes(db)
+            report = await ensure_indexes(db)
+            return before, report, await verify_indexes(db)
+
+        before, report, after = asyncio.run(scenario())
+        assert before["projects"][0]["status"] == "missing"
+        assert all(entry["error"] is None for entries in report.values() for entry in entries)
+        # mongomock does not keep partialFilterExpression, so only presence is checked
+        assert all(entry["status"] != "missing" for entries in after.values() for entry in entries)
+        assert after["projects"][1]["status"] == "ok"
+        print("✓ Indexes created and verified")
+
+
+class TestExplain:
+    """Winning plans are reduced to stages, indexes and a scan flag"""
+
+    def test_classic_plan(self):
+        plan = {"queryPlanner": {"winningPlan": {
+            "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "projectId_createdAt"}
+        }}}
+        assert summarize_plan(plan) == {
+            "stages": ["FETCH", "IXSCAN"], "indexes": ["projectId_createdAt"], "collectionScan": False
+        }
+        print("✓ Index scan plan")
+
+    def test_slot_based_collection_scan(self):
+        plan = {"queryPlanner": {"winningPlan": {
+            "queryPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}},
+            "slotBasedPlan": {"stages": "..."}
+        }}}
+        summary = summarize_plan(plan)
+        assert summary["collectionScan"] is True
+        assert summary["stages"] == ["SORT", "COLLSCAN"]
+        print("✓ Collection scan flagged")
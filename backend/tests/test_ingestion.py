@@ -0,0 +1,143 @@
+"""
+Unit tests for streaming CSV ingestion and column profiles
+"""
+import asyncio
+import io
+
+import pandas as pd
+import pytest
+
+import ingestion
+from dataset_store import DatasetStore
+from ingestion import ColumnProfile, _chunk_kind, _merge_kinds, ingest_csv, parse_csv_records
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+def _csv(lines):
+    return io.BytesIO(("\n".join(lines) + "\n").encode())
+
+
+def _ingest(fileobj, chunk_rows=10):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        store = DatasetStore(db)
+        try:
+            result = await ingest_csv(fileobj, store, {"id": "d1", "projectId": "p1"},
+                                      chunk_rows=chunk_rows, run=_inline)
+        except Exception as e:
+            result = e
+        doc = await db.datasets.find_one({"id": "d1"}, {"_id": 0})
+        columns = await store.load_columns(doc) if doc else None
+        return result, doc, columns, await db.datasetChunks.count_documents({"datasetId": "d1"})
+
+    return asyncio.run(scenario())
+
+
+class TestKinds:
+    """Per-chunk inference and how chunk kinds widen"""
+
+    def test_chunk_kind(self):
+        assert _chunk_kind(pd.Series([1, 2, 3])) == "integer"
+        # Integers with gaps are read as floats without fractions
+        assert _chunk_kind(pd.Series([1.0, None, 3.0])) == "integer"
+        assert _chunk_kind(pd.Series([1.5, 2.0])) == "floating"
+        assert _chunk_kind(pd.Series([None, None], dtype=float)) == "empty"
+        assert _chunk_kind(pd.Series(["a", None])) == "string"
+        assert _chunk_kind(pd.Series([True, "x"])) == "mixed"
+        print("✓ Chunk kinds inferred")
+
+    def test_merge_kinds(self):
+        assert _merge_kinds("empty", "integer") == "integer"
+        assert _merge_kinds("integer", "empty") == "integer"
+        assert _merge_kinds("integer", "floating") == "floating"
+        assert _merge_kinds("integer", "string") == "string"
+        assert _merge_kinds("string", "mixed") == "mixed"
+        assert _merge_kinds("boolean", "integer") == "mixed"
+        print("✓ Kinds widen across chunks")
+
+
+class TestColumnProfile:
+    """Missing values, widening and the distinct-value limit"""
+
+    def test_missing_and_counts(self):
+        profile = ColumnProfile("color")
+        profile.update(pd.Series(["rojo", None, "azul"]))
+        profile.update(pd.Series(["rojo", None, None]))
+        assert profile.missing == 3
+        assert profile.counts == {"rojo": 2, "azul": 1}
+        assert profile.frequency() is not None
+        print("✓ Missing values counted apart")
+
+    def test_string_then_mixed(self):
+        """A chunk mixing types turns a string column mixed and keeps it out
+        of the numeric statistics"""
+        profile = ColumnProfile("respuesta")
+        profile.update(pd.Series(["si", "no"]))
+        assert profile.kind == "string"
+        profile.update(pd.Series([True, "no", 3]))
+        assert profile.kind == "mixed"
+        assert not profile.is_numeric and profile.statistics() == {}
+        assert profile.counts == {"si": 1, "no": 2, True: 1, 3: 1}
+        print("✓ String column widens to mixed")
+
+    def test_distinct_limit(self, monkeypatch):
+        monkeypatch.setattr(ingestion, "FREQUENCY_DISTINCT_LIMIT", 5)
+        profile = ColumnProfile("id")
+        profile.update(pd.Series([f"e{i}" for i in range(4)]))
+        assert len(profile.counts) == 4
+        profile.update(pd.Series([f"e{i}" for i in range(4, 10)] + [None]))
+        assert profile.counts is None
+        assert profile.frequency() is None
+        # Missing values are still counted once exact counts are dropped
+        assert profile.missing == 1
+        print("✓ Counts dropped past the distinct limit")
+
+
+class TestIngestCsv:
+    """Chunked ingestion straight into dataset storage"""
+
+    def test_types_widen_across_chunks(self):
+        lines = ["n,x,s"]
+        for i in range(30):
+            # n gains a fraction in the second chunk, s gains text in the third
+            n = f"{i}.5" if i == 15 else str(i)
+            s = f"t{i}" if i >= 20 else str(i)
+            x = "" if i % 7 == 0 else str(i)
+            lines.append(f"{n},{x},{s}")
+        result, doc, columns, chunks = _ingest(_csv(lines))
+
+        assert result["rowCount"] == doc["rowCount"] == 30
+        assert chunks == doc["chunkCount"] == 3
+        assert result["columnTypes"] == {"n": "floating", "x": "integer", "s": "string"}
+        assert [var["type"] for var in doc["variables"]] == [
+            "cuantitativa_continua", "cuantitativa_discreta", "cualitativa_nominal"
+        ]
+        assert result["profiles"]["x"].missing == 5
+        assert result["statistics"]["n"]["count"] == 30
+        assert result["statistics"]["x"]["count"] == 25
+        assert "s" not in result["statistics"]
+        assert columns["n"][15] == 15.5 and columns["x"][0] is None
+        assert len(result["preview"]) == ingestion.PREVIEW_ROWS
+        assert result["preview"][0] == {"n": 0.0, "x": None, "s": 0}
+        print("✓ Multi-chunk ingestion widens types")
+
+    def test_parse_error_aborts(self):
+        lines = ["a,b"] + [f"{i},{i}" for i in range(25)] + ["1,2,3"] + [f"{i},{i}" for i in range(5)]
+        result, doc, _, chunks = _ingest(_csv(lines))
+        assert isinstance(result, pd.errors.ParserError)
+        assert doc is None
+        # Chunks written before the error are removed
+        assert chunks == 0
+        print("✓ Parse error mid-file leaves nothing behind")
+
+
+class TestParseCsvRecords:
+    def test_records(self):
+        result = asyncio.run(parse_csv_records(_csv(["a,b", "1,x", "2,"]), chunk_rows=1, run=_inline))
+        assert result == {"data": [{"a": 1, "b": "x"}, {"a": 2, "b": None}], "columns": ["a", "b"]}
+        print("✓ Rows parsed for non-persisting clients")
@@ -0,0 +1,144 @@
+"""
+Unit tests for the per-request LlmChat clients
+"""
+import asyncio
+from types import SimpleNamespace
+
+from llm_clients import LlmClients
+from metrics import LlmMetrics, Registry
+
+
+class FakeChat:
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.session_id = session_id
+        self.messages = [system_message]
+
+    def with_model(self, provider, model):
+        self.model = (provider, model)
+        return self
+
+    async def send_message(self, text):
+        self.messages.append(text)
+        return len(self.messages)
+
+
+class Message:
+    def __init__(self, text):
+        self.text = text
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class TestLlmClients:
+    """A fresh client per request, so no state carries over between them"""
+
+    def test_fresh_client_per_checkout(self):
+        async def scenario():
+            clients = LlmClients(FakeChat, "k")
+            replies, chats = [], []
+            for session in ("a", "b"):
+                async with clients.client("secundario", "sys", session) as chat:
+                    replies.append(await chat.send_message("hola"))
+                    chats.append(chat)
+                    assert chat.session_id == session
+                    assert chat.model == ("openai", "gpt-5.1")
+                    assert clients.metrics()["inUse"] == 1
+            return clients, replies, chats
+
+        clients, replies, chats = asyncio.run(scenario())
+        assert replies == [2, 2]
+        assert chats[0] is not chats[1]
+        assert chats[1].messages == ["sys", "hola"]
+        metrics = clients.metrics()
+        assert metrics["created"] == 2 and metrics["inUse"] == 0
+        print("✓ Each checkout gets a new client with a clean history")
+
+    def test_concurrent_checkouts(self):
+        async def scenario():
+            clients = LlmClients(FakeChat, "k")
+
+            async def one(level):
+                async with clients.client(level, "sys", "s") as chat:
+                    await asyncio.sleep(0)
+                    return id(chat)
+
+            ids = await asyncio.gather(*(one("primario") for _ in range(4)), one("superior"))
+            return clients, ids
+
+        clients, ids = asyncio.run(scenario())
+        assert len(set(ids)) == 5
+        assert clients.metrics()["byKey"] == {"openai/gpt-5.1/primario": 4, "openai/gpt-5.1/superior": 1}
+        print("✓ One client per request, counted per key")
+
+    def test_streams_through_completion(self):
+        """Clients without stream_message stream through acompletion"""
+        calls = []
+
+        async def completion(**kwargs):
+            calls.append(kwargs)
+
+            async def chunks():
+                for content in ("La ", None, "media", ""):
+                    yield _chunk(content)
+                yield SimpleNamespace(choices=[])
+            return chunks()
+
+        async def scenario():
+            metrics = LlmMetrics(lambda text: len(text.split()), Registry())
+            clients = LlmClients(FakeChat, "k", completion=completion, api_base="http://llm", instrument=metrics.wrap)
+            async with clients.client("secundario", "sys", "s") as chat:
+                pieces = [piece async for piece in chat.stream_message(Message("¿Qué es la media?"))]
+                reply = await chat.send_message("hola")
+            return clients, metrics, pieces, reply
+
+        clients, metrics, pieces, reply = asyncio.run(scenario())
+        assert pieces == ["La ", "media"]
+        assert reply == 2
+        assert calls == [{
+            "model": "openai/gpt-5.1",
+            "messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": "¿Qué es la media?"}],
+            "stream": True, "api_key": "k", "api_base": "http://llm",
+        }]
+        assert clients.metrics()["streaming"] is True
+        assert metrics.first_token.count(model="gpt-5.1", client="secundario") == 1
+        print("✓ Tokens streamed through acompletion")
+
+    def test_falls_back_without_endpoint(self):
+        """With no api_base or provider key, streaming is left to send_message"""
+        calls = []
+
+        async def completion(**kwargs):
+            calls.append(kwargs)
+
+        async def scenario():
+            clients = LlmClients(FakeChat, "k", completion=completion, api_base=None, provider_key=None)
+            async with clients.client("secundario", "sys", "s") as chat:
+                # What the streaming endpoints fall back to
+                assert not hasattr(chat, "stream_message")
+                return clients, await chat.send_message("hola")
+
+        clients, reply = asyncio.run(scenario())
+        assert reply == 2
+        assert calls == [] and clients.metrics()["streaming"] is False
+        print("✓ send_message answers when streaming has nowhere to go")
+
+    def test_provider_key_streams(self):
+        calls = []
+
+        async def completion(**kwargs):
+            calls.append(kwargs)
+
+            async def chunks():
+                yield _chunk("Hola")
+            return chunks()
+
+        async def scenario():
+            clients = LlmClients(FakeChat, "universal", completion=completion, api_base=None, provider_key="sk-own")
+            async with clients.client("secundario", "sys", "s") as chat:
+                return [piece async for piece in chat.stream_message(Message("hola"))]
+
+        assert asyncio.run(scenario()) == ["Hola"]
+        assert calls[0]["api_key"] == "sk-own" and calls[0]["api_base"] is None
+        print("✓ A provider key of its own streams straight to the provider")
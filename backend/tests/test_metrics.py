@@ -0,0 +1,137 @@
+"""
+Unit tests for the Prometheus-style metrics subsystem
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from metrics import LlmMetrics, MetricsMiddleware, MongoCommandMetrics, Registry
+
+
+class TestRegistry:
+    """Text exposition format"""
+
+    def test_counter_and_histogram(self):
+        registry = Registry()
+        counter = registry.counter("jobs_total", "Jobs", ("kind",))
+        counter.inc(kind='a"b')
+        counter.inc(2, kind='a"b')
+        histogram = registry.histogram("wait_seconds", "Wait", ("queue",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, queue="q")
+
+        text = registry.render()
+        assert '# TYPE jobs_total counter' in text
+        assert 'jobs_total{kind="a\\"b"} 3' in text
+        assert 'wait_seconds_bucket{queue="q",le="0.1"} 2' in text
+        assert 'wait_seconds_bucket{queue="q",le="1"} 3' in text
+        assert 'wait_seconds_bucket{queue="q",le="+Inf"} 4' in text
+        assert 'wait_seconds_count{queue="q"} 4' in text
+        assert registry.counter("jobs_total", "Jobs", ("kind",)) is counter
+        print("✓ Counters and cumulative histogram buckets rendered")
+
+
+class TestMiddleware:
+    """Route templates, status, and sizes of streamed bodies"""
+
+    def test_routes_and_sizes(self):
+        registry = Registry()
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"id": item_id}
+
+        @app.get("/stream")
+        async def stream():
+            async def body():
+                for _ in range(3):
+                    yield b"x" * 100
+            return StreamingResponse(body())
+
+        app.add_middleware(MetricsMiddleware, registry=registry)
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/stream")
+        client.get("/missing")
+
+        requests = registry._metrics["http_requests_total"]
+        assert requests.value(route="/items/{item_id}", method="GET", status="200") == 2
+        assert requests.value(route="unmatched", method="GET", status="404") == 1
+        response_size = registry._metrics["http_response_size_bytes"]
+        assert 'http_response_size_bytes_sum{route="/stream",method="GET"} 300' in registry.render()
+        assert response_size.count(route="/stream", method="GET") == 1
+        print("✓ Requests labelled by route template")
+
+
+class TestMongoCommandMetrics:
+    """Command events are timed per collection and operation"""
+
+    def test_events(self):
+        registry = Registry()
+        listener = MongoCommandMetrics(registry)
+
+        def started(request_id, name, command):
+            listener.started(SimpleNamespace(
+                connection_id=("h", 1), request_id=request_id, command_name=name, command=command))
+
+        started(1, "find", {"find": "datasets", "filter": {}})
+        listener.succeeded(SimpleNamespace(
+            connection_id=("h", 1), request_id=1, command_name="find", duration_micros=1500))
+        started(2, "getMore", {"getMore": 7, "collection": "datasetChunks"})
+        listener.failed(SimpleNamespace(
+            connection_id=("h", 1), request_id=2, command_name="getMore", duration_micros=900))
+
+        latency = registry._metrics["mongo_command_duration_seconds"]
+        assert latency.count(collection="datasets", operation="find") == 1
+        assert latency.count(collection="datasetChunks", operation="getMore") == 1
+        assert registry._metrics["mongo_command_failures_total"].value(
+            collection="datasetChunks", operation="getMore") == 1
+        assert not listener._pending
+        print("✓ Mongo commands timed per collection")
+
+
+class _Chat:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    async def send_message(self, message):
+        if self.fail:
+            raise RuntimeError("caído")
+        return "la media es el promedio"
+
+    async def stream_message(self, message):
+        for piece in ("la ", "moda"):
+            yield piece
+
+
+class TestLlmMetrics:
+    """Latency, tokens and errors of wrapped clients"""
+
+    def test_wrap(self):
+        registry = Registry()
+        metrics = LlmMetrics(lambda text: len(text.split()), registry)
+        key = ("openai", "m", "primario")
+        message = SimpleNamespace(text="que es la media")
+
+        async def scenario():
+            chat = metrics.wrap(_Chat(), key)
+            assert await chat.send_message(message) == "la media es el promedio"
+            assert [p async for p in chat.stream_message(message)] == ["la ", "moda"]
+            with pytest.raises(RuntimeError):
+                await metrics.wrap(_Chat(fail=True), key).send_message(message)
+
+        asyncio.run(scenario())
+        labels = {"model": "m", "client": "primario"}
+        assert registry._metrics["llm_request_duration_seconds"].count(mode="send", **labels) == 2
+        assert registry._metrics["llm_request_duration_seconds"].count(mode="stream", **labels) == 1
+        assert registry._metrics["llm_time_to_first_token_seconds"].count(**labels) == 1
+        assert registry._metrics["llm_tokens_total"].value(kind="prompt", **labels) == 8
+        assert registry._metrics["llm_tokens_total"].value(kind="completion", **labels) == 7
+        assert registry._metrics["llm_errors_total"].value(error="RuntimeError", **labels) == 1
+        print("✓ LLM calls instrumented")
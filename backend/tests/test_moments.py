@@ -0,0 +1,66 @@
+"""
+Unit tests for the streaming MomentAccumulator
+"""
+import numpy as np
+import pytest
+
+from moments import MomentAccumulator
+from statistics_calculator import StatisticsCalculator
+
+
+def _reference(values):
+    n = len(values)
+    mean = values.mean()
+    d = values - mean
+    m2 = (d ** 2).sum()
+    return {
+        "mean": mean,
+        "variance": m2 / (n - 1),
+        "skewness": np.sqrt(n) * (d ** 3).sum() / m2 ** 1.5,
+        "kurtosis": n * (d ** 4).sum() / m2 ** 2 - 3,
+    }
+
+
+class TestMomentAccumulator:
+    """Chunked updates, merges and serialization"""
+
+    def test_chunked_updates_match_single_pass(self):
+        """Feeding uneven chunks gives the same moments as the full array"""
+        values = np.random.default_rng(7).gamma(2.0, 3.0, 10_001)
+        acc = MomentAccumulator()
+        for chunk in np.array_split(values, [3, 500, 501, 7_000]):
+            acc.update(chunk)
+
+        ref = _reference(values)
+        assert acc.count == values.size
+        assert acc.mean == pytest.approx(ref["mean"])
+        assert acc.variance == pytest.approx(ref["variance"])
+        assert acc.skewness == pytest.approx(ref["skewness"])
+        assert acc.kurtosis == pytest.approx(ref["kurtosis"])
+        assert acc.min == values.min() and acc.max == values.max()
+        print("✓ Chunked moments match single pass")
+
+    def test_merge_and_round_trip(self):
+        """Workers can merge serialized partial results"""
+        values = np.random.default_rng(1).normal(100, 5, 2_000)
+        left = MomentAccumulator().update(values[:700])
+        right = MomentAccumulator.from_dict(MomentAccumulator().update(values[700:]).to_dict())
+        merged = left.merge(right)
+
+        ref = _reference(values)
+        assert merged.mean == pytest.approx(ref["mean"])
+        assert merged.kurtosis == pytest.approx(ref["kurtosis"])
+        assert MomentAccumulator.from_dict(MomentAccumulator().to_dict()).count == 0
+        print("✓ Merge and serialization work")
+
+    def test_calculator_streaming_path(self):
+        """StatisticsCalculator accepts chunks or an accumulator"""
+        data = [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]
+        streamed = StatisticsCalculator.calculate_streaming_stats([data[:3], data[3:]], advanced=True)
+        in_memory = StatisticsCalculator.calculate_advanced_stats(data)
+
+        for key in ("mean", "variance", "stdDev", "coefficientOfVariation", "skewness", "kurtosis", "range"):
+            assert streamed[key] == pytest.approx(in_memory[key])
+        acc = MomentAccumulator().update(data)
+        assert StatisticsCalculator.calculate_basic_stats(acc)["count"] == len(data)
+        print("✓ Calculator streaming path consistent")
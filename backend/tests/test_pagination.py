@@ -0,0 +1,84 @@
+"""
+Unit tests for keyset pagination of list endpoints
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, list_response, projection
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+async def _seed(n):
+    db = mongomock_motor.AsyncMongoMockClient()["t"]
+    # Repeated createdAt values exercise the id tie-break
+    await db.datasets.insert_many([
+        {"id": f"d{i:03d}", "projectId": "p", "createdAt": f"2024-01-0{i % 3 + 1}", "rawData": [i]}
+        for i in range(n)
+    ])
+    return db
+
+
+async def _read(response):
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+class TestCursor:
+    """Cursors round trip and reject garbage"""
+
+    def test_round_trip(self):
+        token = encode_cursor({"id": "d1", "createdAt": "2024-01-01"})
+        assert decode_cursor(token) == ("2024-01-01", "d1")
+        print("✓ Cursor round trip")
+
+    def test_invalid_cursor(self):
+        async def scenario():
+            db = await _seed(1)
+            await list_response(db.datasets, {"projectId": "p"}, "%%%", 10, projection(None), False)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(scenario())
+        assert exc.value.status_code == 400
+        print("✓ Invalid cursor rejected")
+
+
+class TestListResponse:
+    """Pages follow the keyset order without gaps or overlap"""
+
+    def test_pages_cover_collection(self):
+        async def scenario():
+            db = await _seed(25)
+            seen, cursor = [], None
+            while True:
+                response = await list_response(
+                    db.datasets, {"projectId": "p"}, cursor, 10, projection(["projectId"]), False
+                )
+                page = json.loads(await _read(response))
+                assert all("rawData" not in doc for doc in page)
+                seen.extend(doc["id"] for doc in page)
+                cursor = response.headers.get(NEXT_CURSOR_HEADER)
+                if cursor is None:
+                    return seen
+
+        seen = asyncio.run(scenario())
+        assert len(seen) == 25 and len(set(seen)) == 25
+        print("✓ Keyset pages cover the collection once")
+
+    def test_ndjson_stream(self):
+        async def scenario():
+            db = await _seed(5)
+            response = await list_response(
+                db.datasets, {"projectId": "p"}, None, None, projection(None, exclude=["rawData"]), True
+            )
+            return response.media_type, await _read(response)
+
+        media_type, body = asyncio.run(scenario())
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert media_type == "application/x-ndjson"
+        assert len(lines) == 5 and "rawData" not in lines[0]
+        print("✓ NDJSON stream")
@@ -0,0 +1,121 @@
+"""
+Unit tests for opt-in request profiling
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.concurrency import run_in_threadpool
+
+from profiling import (
+    PROFILE_ID_HEADER, ProfileStore, ProfilingMiddleware, RequestProfile, _current, folded,
+    run_profiled, stage
+)
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _parse(seconds):
+    with stage("parse"):
+        _busy(seconds)
+    return "ok"
+
+
+class TestStages:
+    """Stage timings and samples, including work moved to threads and processes"""
+
+    def test_nested_and_threaded(self):
+        profile = RequestProfile(interval=0.001)
+        token = _current.set(profile)
+        profile.start()
+
+        async def scenario():
+            with stage("upload"):
+                await run_in_threadpool(_parse, 0.05)
+                with stage("write"):
+                    await asyncio.sleep(0.01)
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            profile.stop()
+            _current.reset(token)
+
+        assert set(profile.stages) == {("upload",), ("upload", "parse"), ("upload", "write")}
+        assert profile.stages[("upload", "parse")][1] >= 0.05
+        assert any(key.startswith("[upload];[parse];") and "_busy" in key for key in profile.samples)
+        print("✓ Stages nest across the thread pool")
+
+    def test_worker_profile_merged(self):
+        result, part = run_profiled(_parse, 0.001, 0.02)
+        assert result == "ok"
+        profile = RequestProfile()
+        profile.merge(part, ("statistics",))
+        assert ("statistics", "cpu_pool.worker", "parse") in profile.stages
+        assert all(key.startswith("[statistics];[cpu_pool.worker]") for key in profile.samples)
+        print("✓ Worker profiles merge under the caller's stage")
+
+    def test_no_profile_is_a_no_op(self):
+        with stage("idle"):
+            pass
+        assert _current.get() is None
+        print("✓ Stages outside a profiled request record nothing")
+
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class TestMiddleware:
+    """Header and sampling triggers, storage and retrieval"""
+
+    def _app(self, **options):
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        store = ProfileStore(db)
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            with stage("load"):
+                await run_in_threadpool(_busy, 0.01)
+            return {"id": item_id}
+
+        app.add_middleware(ProfilingMiddleware, store_factory=lambda: store, **options)
+        return TestClient(app), store
+
+    def test_header_trigger(self):
+        client, store = self._app(token="secreto", allocations=True)
+        assert PROFILE_ID_HEADER not in client.get("/items/1").headers
+        assert PROFILE_ID_HEADER not in client.get("/items/1", headers={"X-Profile": "1"}).headers
+        response = client.get("/items/7", headers={"X-Profile": "secreto"})
+        profile_id = response.headers[PROFILE_ID_HEADER]
+
+        doc = asyncio.run(store.get(profile_id))
+        assert doc["route"] == "/items/{item_id}"
+        assert doc["status"] == 200 and doc["trigger"] == "header"
+        assert [s["path"] for s in doc["stages"]] == ["request", "request/load"]
+        assert doc["allocations"]["peakBytes"] > 0
+        assert folded(doc).endswith("\n")
+        print("✓ Profiled request stored with its route template")
+
+    def test_header_needs_token(self):
+        """Without a configured token the header profiles nothing"""
+        client, store = self._app(token="")
+        assert PROFILE_ID_HEADER not in client.get("/items/1", headers={"X-Profile": "1"}).headers
+        assert asyncio.run(store.recent()) == []
+        print("✓ Header ignored without a token")
+
+    def test_sampling(self):
+        client, store = self._app(sample_rate=1.0, allocations=False)
+        client.get("/items/1")
+        client.get("/items/2")
+        recent = asyncio.run(store.recent(route="/items/{item_id}"))
+        assert len(recent) == 2
+        assert all(doc["trigger"] == "sampled" and doc.get("allocations") is None for doc in recent)
+        assert "stacks" not in recent[0]["samples"]
+        print("✓ Sampled requests listed without their stacks")
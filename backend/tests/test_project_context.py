@@ -0,0 +1,133 @@
+"""
+Unit tests for the concurrent project-context loader
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from dataset_store import DatasetStore
+from dataset_summary import DatasetSummaries
+from project_context import ProjectContextLoader
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+def _loader():
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    store = DatasetStore(db)
+    return db, store, ProjectContextLoader(db, store, DatasetSummaries(db, store, run=_inline), rows=5)
+
+
+class TestProjectContextLoader:
+    """Project, datasets and statistics in one call"""
+
+    def test_columnar_dataset(self):
+        """First rows, profiles, spread sample and oldest statistics"""
+        async def scenario():
+            db, store, loader = _loader()
+            await db.projects.insert_one({"id": "p1", "name": "Alturas"})
+            await store.insert(
+                {"id": "d1", "projectId": "p1", "createdAt": "2024-01-01", "variables": []},
+                columns={"altura": [float(150 + i % 30) for i in range(200)]}
+            )
+            await db.statistics.insert_many([
+                {"id": "s2", "projectId": "p1", "createdAt": "2024-02-01", "mean": 2},
+                {"id": "s1", "projectId": "p1", "createdAt": "2024-01-01", "mean": 1},
+            ])
+
+            context = await loader.load("p1")
+            assert context["name"] == "Alturas"
+            assert len(context["datasets"]) == 1
+            assert len(context["datasets"][0]["rawData"]) == 5
+            assert [s["id"] for s in context["statistics"]] == ["s1"]
+            assert context["rowCount"] == 200
+            assert context["profiles"]["altura"].moments.count == 200
+            assert context["sampleData"][-1] == {"altura": float(150 + 199 % 30)}
+            assert {"project", "datasets", "statistics", "summary", "sample", "rows", "total"} <= set(context["timings"])
+            assert loader.metrics()["stages"]["total"]["count"] == 1
+
+        asyncio.run(scenario())
+        print("✓ Columnar dataset context")
+
+    def test_legacy_rows_sliced(self):
+        """Row-oriented documents come back cut by $slice"""
+        async def scenario():
+            db, _, loader = _loader()
+            await db.projects.insert_one({"id": "p1", "name": "Viejo"})
+            await db.datasets.insert_one({
+                "id": "d1", "projectId": "p1", "rawData": [{"x": i} for i in range(100)], "variables": []
+            })
+
+            context = await loader.load("p1", profiles=False)
+            assert context["datasets"][0]["rawData"] == [{"x": i} for i in range(5)]
+            assert "profiles" not in context
+
+        asyncio.run(scenario())
+        print("✓ Legacy rawData sliced")
+
+    def test_preview_from_head(self):
+        """First rows come from the stored head, not the inline data"""
+        async def scenario():
+            db, store, loader = _loader()
+            await db.projects.insert_one({"id": "p1", "name": "Alturas"})
+            await store.insert(
+                {"id": "d1", "projectId": "p1", "variables": []}, columns={"altura": list(range(100))}
+            )
+            # Without its data the dataset can still be previewed
+            await db.datasets.update_one({"id": "d1"}, {"$unset": {"columns": "", "variableValues": ""}})
+            context = await loader.load("p1", profiles=False)
+            assert context["datasets"][0]["rawData"] == [{"altura": i} for i in range(5)]
+
+            # A short dataset outgrows its head once rows are appended
+            doc = await store.insert({"id": "d2", "projectId": "p2", "variables": []}, columns={"n": [1, 2]})
+            await store.append(doc, {"n": [3, 4, 5, 6]}, 4)
+            doc = await db.datasets.find_one({"id": "d2"}, {"_id": 0, "columns": 0, "variableValues": 0})
+            assert await store.head(doc, 5) == {"n": [1, 2, 3, 4, 5]}
+
+        asyncio.run(scenario())
+        print("✓ Preview read from the stored head")
+
+    def test_variable_profiles_stored(self):
+        """Hand-typed variables are profiled once and then read back"""
+        calls = []
+
+        async def counting(fn, *args):
+            calls.append(sorted(args[0]))
+            return fn(*args)
+
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            store = DatasetStore(db)
+            loader = ProjectContextLoader(db, store, DatasetSummaries(db, store, run=counting), rows=5)
+            await db.projects.insert_one({"id": "p1", "name": "Encuesta"})
+            await store.insert({
+                "id": "d1", "projectId": "p1",
+                "variables": [{"name": "edad", "type": "cuantitativa_discreta", "values": [13, 14, 14, 15]}],
+            }, columns={"altura": [150.0, 160.0]})
+            first = await loader.load("p1")
+            second = await loader.load("p1")
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert sorted(calls) == [["altura"], ["edad"]]
+        for context in (first, second):
+            assert set(context["profiles"]) == {"altura", "edad"}
+            assert context["profiles"]["edad"].moments.count == 4
+            assert context["rowCount"] == 4
+            assert context["sampleData"] == [{"altura": 150.0}, {"altura": 160.0}]
+        print("✓ Variable profiles stored with the summary")
+
+    def test_missing_project(self):
+        async def scenario():
+            _, _, loader = _loader()
+            with pytest.raises(HTTPException) as exc:
+                await loader.load("nope")
+            assert exc.value.status_code == 404
+
+        asyncio.run(scenario())
+        print("✓ Missing project is a 404")
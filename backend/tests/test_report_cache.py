@@ -0,0 +1,49 @@
+"""
+Unit tests for the report fingerprint cache
+"""
+import asyncio
+
+import pytest
+
+from report_cache import ReportCache, report_fingerprint
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+FIELDS = {"name": "Mundial", "analysisType": "univariado", "variables": [],
+          "sampleData": [{"pais": "Argentina"}], "statistics": {"mean": 1.5, "median": 1}}
+
+
+class TestFingerprint:
+    """Same inputs give the same key regardless of dict order"""
+
+    def test_stable_and_sensitive(self):
+        base = report_fingerprint(FIELDS, "secundario", 1, "gpt-5.1")
+        reordered = dict(reversed(list(FIELDS.items())))
+        assert report_fingerprint(reordered, "secundario", 1, "gpt-5.1") == base
+        assert report_fingerprint(FIELDS, "superior", 1, "gpt-5.1") != base
+        assert report_fingerprint(FIELDS, "secundario", 2, "gpt-5.1") != base
+        assert report_fingerprint({**FIELDS, "sampleData": []}, "secundario", 1, "gpt-5.1") != base
+        print("✓ Fingerprint stable and input-sensitive")
+
+
+class TestReportCache:
+    """Stored reports are found by fingerprint unless forced"""
+
+    def test_lookup(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            cache = ReportCache(db)
+            miss = await cache.lookup("p", "f1")
+            await db.reports.insert_many([
+                {"id": "r1", "projectId": "p", "fingerprint": "f1", "createdAt": "2024-01-01"},
+                {"id": "r2", "projectId": "p", "fingerprint": "f1", "createdAt": "2024-02-01"},
+            ])
+            hit = await cache.lookup("p", "f1")
+            forced = await cache.lookup("p", "f1", force=True)
+            return cache, miss, hit, forced
+
+        cache, miss, hit, forced = asyncio.run(scenario())
+        assert miss is None and forced is None
+        assert hit["id"] == "r2"
+        assert cache.metrics() == {"hits": 1, "misses": 1, "forced": 1, "hitRatio": 0.5}
+        print("✓ Latest report reused, force bypasses")
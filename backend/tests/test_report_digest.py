@@ -0,0 +1,130 @@
+"""
+Unit tests for the budgeted report data digest
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import dataset_store
+from dataset_store import DatasetStore
+from report_cache import report_fingerprint
+from report_digest import build_digest, column_digest, compact_value, profile_values
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def _profiles(rows: int, columns: int, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        if i % 2:
+            data[f"color_{i}"] = rng.choice([f"c{j}" for j in range(30)], rows).tolist()
+        else:
+            data[f"altura_{i}"] = rng.normal(160, 10, rows).tolist()
+    return profile_values(data)
+
+
+class TestColumnDigest:
+    """Bounded per-column summaries"""
+
+    def test_numeric_histogram_covers_all_values(self):
+        """Histogram counts add up to the non-missing values"""
+        profile = _profiles(5_000, 1)["altura_0"]
+        digest = column_digest(profile, top=10, bins=8)
+        assert len(digest["histograma"]) == 8
+        assert sum(count for *_, count in digest["histograma"]) == pytest.approx(5_000, rel=0.02)
+        assert digest["resumen"]["min"] <= digest["resumen"]["mediana"] <= digest["resumen"]["max"]
+        print("✓ Numeric digest has quantiles and a histogram")
+
+    def test_top_categories_and_rest(self):
+        """Categories beyond the top k are folded into one count"""
+        profile = profile_values({"color": ["rojo"] * 5 + ["azul"] * 3 + ["verde", "gris", None]})["color"]
+        digest = column_digest(profile, top=2, bins=0)
+        assert digest["categorias"] == [["rojo", 5], ["azul", 3]]
+        assert digest["otras"] == 2
+        assert digest["distintos"] == 4
+        assert digest["faltantes"] == 1
+        print("✓ Top-k categories plus the rest")
+
+    def test_compact_value(self):
+        """Numbers rounded, nulls dropped, long lists cut"""
+        compact = compact_value({"a": 3.14159265, "b": None, "c": list(range(20)), "d": 2.0}, 3)
+        assert compact == {"a": 3.142, "c": [0, 1, 2, "... 17 más"], "d": 2}
+        print("✓ Values compacted")
+
+
+class TestBuildDigest:
+    """The digest always fits the token budget"""
+
+    def test_small_dataset_full_detail(self):
+        profiles = _profiles(40, 2)
+        digest = build_digest(profiles, 40, [{"x": i} for i in range(40)], {"id": "s", "mean": 1.23456}, 1_000)
+        assert digest["detail"] == 0
+        assert digest["omitted"] == 0
+        assert len(json.loads(digest["sampleData"])) == 10
+        assert json.loads(digest["statistics"]) == {"mean": 1.235}
+        print("✓ Small dataset keeps full detail")
+
+    def test_budget_enforced(self):
+        """Detail drops first, then trailing variables are left out"""
+        profiles = _profiles(2_000, 24)
+        for budget in (1_600, 600, 150):
+            digest = build_digest(profiles, 2_000, [], {}, budget)
+            assert digest["tokens"] <= budget
+        assert digest["omitted"] > 0
+        assert json.loads(digest["variables"])["omitidas"] == digest["omitted"]
+        print("✓ Token budget enforced")
+
+
+class TestStableDigest:
+    """Profiling the same values twice gives the same digest, so report
+    fingerprints of hand-typed variables hit the cache"""
+
+    def test_same_fingerprint(self):
+        values = np.random.default_rng(3).normal(160, 10, 1_000).tolist()
+        fingerprints = {
+            report_fingerprint(build_digest(profile_values({"altura": values}), 1_000, [], {}, 1_000),
+                               "secundario", 1, "m")
+            for _ in range(5)
+        }
+        assert len(fingerprints) == 1
+        print("✓ Digest is deterministic")
+
+    def test_report_fields(self):
+        deepseek_service = pytest.importorskip("deepseek_service")
+        project = {
+            "name": "Alturas",
+            "variables": [{"name": "altura", "type": "cuantitativa_continua",
+                           "values": np.random.default_rng(4).normal(160, 10, 1_000).tolist()}],
+        }
+        first, second = (
+            report_fingerprint(deepseek_service.report_fields(project, "secundario"), "secundario", 1, "m")
+            for _ in range(2)
+        )
+        assert first == second
+        print("✓ report_fields fingerprint is stable")
+
+
+class TestSampleRows:
+    """Rows spread over the dataset, reading only the chunks that hold them"""
+
+    def test_spread_over_chunks(self, monkeypatch):
+        monkeypatch.setattr(dataset_store, "CHUNK_BYTES", 8 * 100)
+
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            store = DatasetStore(db)
+            doc = await store.insert({"id": "d1", "projectId": "p1"}, columns={"n": list(range(1_000))})
+            assert doc["chunkCount"] == 10
+            rows = await store.sample_rows(doc, 5)
+            assert [row["n"] for row in rows] == [0, 250, 500, 749, 999]
+
+            await store.append(doc, {"n": [1_000, 1_001]}, 2)
+            doc = await db.datasets.find_one({"id": "d1"}, {"_id": 0})
+            rows = await store.sample_rows(doc, 2)
+            assert [row["n"] for row in rows] == [0, 1_001]
+
+        asyncio.run(scenario())
+        print("✓ Sample spread over chunks")
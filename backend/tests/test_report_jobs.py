@@ -0,0 +1,130 @@
+"""
+Unit tests for the persisted report job queue, with a stub LLM handler
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from report_jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, ReportJobQueue
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class StubLlm:
+    """Handler that fails the first `failures` calls and tracks concurrency"""
+
+    def __init__(self, failures=0, delay=0.01):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, job):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.calls <= self.failures:
+                raise RuntimeError("LLM no disponible")
+            return {"reportId": f"r-{job['id']}"}
+        finally:
+            self.active -= 1
+
+
+def _queue(db, handler, **options):
+    options.setdefault("poll_seconds", 0.01)
+    options.setdefault("retry_seconds", 0)
+    return ReportJobQueue(db, handler, **options)
+
+
+async def _until_finished(queue, job_ids):
+    for _ in range(500):
+        jobs = [await queue.get(job_id) for job_id in job_ids]
+        if all(job["status"] in (SUCCEEDED, FAILED) for job in jobs):
+            return jobs
+        await asyncio.sleep(0.01)
+    raise AssertionError("jobs did not finish")
+
+
+class TestReportJobQueue:
+    """Jobs run with bounded concurrency, retry and survive restarts"""
+
+    def test_concurrency_limit_and_dedup(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            llm = StubLlm()
+            queue = _queue(db, llm, concurrency=2)
+            jobs = [await queue.submit(f"p{i}", "secundario") for i in range(6)]
+            duplicate = await queue.submit("p0", "secundario")
+            queue.start()
+            finished = await _until_finished(queue, [job["id"] for job in jobs])
+            await queue.stop()
+            return llm, jobs, duplicate, finished
+
+        llm, jobs, duplicate, finished = asyncio.run(scenario())
+        assert duplicate["id"] == jobs[0]["id"]
+        assert all(job["status"] == SUCCEEDED for job in finished)
+        assert finished[0]["result"] == {"reportId": f"r-{jobs[0]['id']}"}
+        assert llm.calls == 6 and llm.peak == 2
+        print("✓ Two workers, six jobs, duplicates merged")
+
+    def test_retry_then_fail(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            queue = _queue(db, StubLlm(failures=1), max_attempts=2)
+            retried = await queue.submit("p", "primario")
+            queue.start()
+            first = (await _until_finished(queue, [retried["id"]]))[0]
+
+            async def gone(job):
+                raise JobFailed("Proyecto no encontrado")
+            queue.handler = gone
+            permanent = await queue.submit("q", "primario")
+            second = (await _until_finished(queue, [permanent["id"]]))[0]
+            await queue.stop()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first["status"] == SUCCEEDED and first["attempts"] == 2
+        assert second["status"] == FAILED and second["attempts"] == 1
+        assert second["error"] == "Proyecto no encontrado"
+        print("✓ Transient failures retried, permanent ones not")
+
+    def test_expired_lease_is_reclaimed(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            past = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+            # Left running by a worker that died
+            await db.reportJobs.insert_many([
+                {"id": "j1", "projectId": "p", "educationLevel": "superior", "status": RUNNING,
+                 "attempts": 1, "maxAttempts": 3, "runAt": past, "leaseUntil": past},
+                {"id": "j2", "projectId": "p", "educationLevel": "primario", "status": QUEUED,
+                 "attempts": 0, "maxAttempts": 3, "runAt": past},
+            ])
+            queue = _queue(db, StubLlm())
+            queue.start()
+            finished = await _until_finished(queue, ["j1", "j2"])
+            await queue.stop()
+            return finished
+
+        finished = asyncio.run(scenario())
+        assert [job["status"] for job in finished] == [SUCCEEDED, SUCCEEDED]
+        assert finished[0]["attempts"] == 2
+        print("✓ Jobs resumed after a restart")
+
+    def test_watch_reports_changes(self):
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            queue = _queue(db, StubLlm(), poll_seconds=5)
+            job = await queue.submit("p", "secundario")
+            queue.start()
+            states = [update["status"] async for update in queue.watch(job["id"])]
+            await queue.stop()
+            return states
+
+        states = asyncio.run(scenario())
+        assert states[0] in (QUEUED, RUNNING) and states[-1] == SUCCEEDED
+        print("✓ Status changes pushed to watchers")
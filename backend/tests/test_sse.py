@@ -0,0 +1,32 @@
+"""
+Unit tests for Server-Sent Events framing and heartbeats
+"""
+import asyncio
+import json
+
+from sse import sse_event, with_heartbeat
+
+
+class TestSse:
+    """Events are framed per the SSE spec and idle gaps get heartbeats"""
+
+    def test_event_framing(self):
+        raw = sse_event({"text": "línea\nnueva"}, "token").decode()
+        assert raw.startswith("event: token\ndata: ") and raw.endswith("\n\n")
+        # Newlines stay escaped inside the single data line
+        assert json.loads(raw.split("data: ", 1)[1]) == {"text": "línea\nnueva"}
+        print("✓ SSE framing")
+
+    def test_heartbeat_while_waiting(self):
+        async def slow():
+            await asyncio.sleep(0.05)
+            yield b"a"
+            yield b"b"
+
+        async def scenario():
+            return [item async for item in with_heartbeat(slow(), interval=0.01)]
+
+        items = asyncio.run(scenario())
+        assert items[-2:] == [b"a", b"b"]
+        assert items[0] == b": ping\n\n"
+        print("✓ Heartbeats until the first event")
@@ -0,0 +1,171 @@
+"""
+Unit tests for StatisticsCalculator (no running server required)
+"""
+import statistics
+
+import pytest
+
+from statistics_calculator import StatisticsCalculator
+
+
+class TestBasicStats:
+    """calculate_basic_stats must keep the shape and values of the statistics-module version"""
+
+    def test_matches_statistics_module(self):
+        """Every measure matches the pure-Python reference"""
+        data = [13, 14, 13, 15, 14, 16, 13, 14, 15, 14, 13, 16, 14, 15, 13, 14, 17, 14, 15, 14]
+        stats = StatisticsCalculator.calculate_basic_stats(data)
+
+        assert set(stats) == {"mean", "median", "range", "min", "max", "count", "mode", "variance", "stdDev"}
+        assert stats["mean"] == pytest.approx(statistics.mean(data))
+        assert stats["median"] == statistics.median(data)
+        assert stats["mode"] == statistics.mode(data)
+        assert stats["variance"] == pytest.approx(statistics.variance(data))
+        assert stats["stdDev"] == pytest.approx(statistics.stdev(data))
+        assert stats["range"] == 4 and stats["min"] == 13 and stats["max"] == 17
+        assert stats["count"] == len(data)
+        print("✓ Basic stats match the statistics module")
+
+    def test_mode_tie_keeps_first_occurrence(self):
+        """With several modes the first value seen wins, like statistics.mode"""
+        assert StatisticsCalculator.calculate_basic_stats([3, 1, 1, 3, 2])["mode"] == 3.0
+        print("✓ Mode ties resolved by first occurrence")
+
+    def test_missing_values_and_edge_cases(self):
+        """None is skipped, single values have no variance and bad input returns {}"""
+        stats = StatisticsCalculator.calculate_basic_stats([None, 4.0, None])
+        assert stats["count"] == 1 and stats["median"] == 4.0
+        assert "variance" not in stats
+        assert StatisticsCalculator.calculate_basic_stats([]) == {}
+        assert StatisticsCalculator.calculate_basic_stats([None]) == {}
+        assert StatisticsCalculator.calculate_basic_stats(["abc"]) == {}
+        print("✓ Edge cases handled")
+
+    def test_returns_python_types(self):
+        """Results are plain floats/ints so they serialize to JSON and BSON"""
+        stats = StatisticsCalculator.calculate_basic_stats(["1.5", 2, 3.5])
+        assert type(stats["mean"]) is float
+        assert type(stats["count"]) is int
+        print("✓ Plain Python types returned")
+
+
+class TestQuantiles:
+    """Selection-based quantiles and the q1/q3 of calculate_advanced_stats"""
+
+    def test_all_methods_match_numpy(self):
+        """Every supported interpolation method agrees with numpy.quantile"""
+        import numpy as np
+        from quantiles import QUANTILE_METHODS, compute_quantiles, resolve_probabilities
+
+        rng = np.random.default_rng(3)
+        probs = resolve_probabilities(["quartiles", "deciles", 0.0, 1.0])
+        for n in (1, 2, 7, 100, 1_001):
+            values = rng.normal(size=n)
+            for method in QUANTILE_METHODS:
+                expected = np.quantile(values, probs, method=method)
+                assert np.allclose(compute_quantiles(values, probs, method), expected)
+        print("✓ Quantile methods match numpy")
+
+    def test_invalid_requests(self):
+        """Unknown methods and out-of-range probabilities are rejected"""
+        from quantiles import compute_quantiles, resolve_probabilities
+
+        with pytest.raises(ValueError):
+            resolve_probabilities([1.5])
+        with pytest.raises(ValueError):
+            compute_quantiles([1.0, 2.0], [0.5], "bogus")
+        print("✓ Invalid quantile requests rejected")
+
+    def test_advanced_stats_use_standard_quartiles(self):
+        """q1/q3 follow the linear (type 7) definition"""
+        data = [1, 2, 3, 4, 5, 6, 7, 8]
+        stats = StatisticsCalculator.calculate_advanced_stats(data)
+        assert stats["q1"] == 2.75 and stats["q3"] == 6.25
+        assert stats["iqr"] == 3.5
+        assert stats["median"] == 4.5
+        lower = StatisticsCalculator.calculate_advanced_stats(data, quantile_method="lower")
+        assert lower["q1"] == 2.0 and lower["median"] == 4.5
+        print("✓ Standard quartiles in advanced stats")
+
+
+class TestQuantileSketch:
+    """Approximate quantiles through the KLL sketch"""
+
+    def test_rank_error_within_bound(self):
+        """Chunked updates stay within the configured rank error"""
+        import numpy as np
+        from quantile_sketch import KLLSketch
+
+        values = np.random.default_rng(11).lognormal(size=200_000)
+        sketch = KLLSketch.for_error(0.01, seed=5)
+        for chunk in np.array_split(values, 40):
+            sketch.update(chunk)
+
+        probs = np.linspace(0.05, 0.95, 19)
+        ranks = np.searchsorted(np.sort(values), sketch.quantiles(probs)) / values.size
+        assert np.max(np.abs(ranks - probs)) <= 0.01
+        assert sketch.retained < 2_000 and sketch.count == values.size
+        print("✓ Sketch rank error within bound")
+
+    def test_merge_serialize_and_calculator(self):
+        """Serialized sketches merge and feed the approximate statistics mode"""
+        import numpy as np
+        from quantile_sketch import KLLSketch
+
+        values = np.arange(10_000, dtype=float)
+        left = KLLSketch(200, seed=1).update(values[:5_000])
+        right = KLLSketch.from_dict(KLLSketch(200, seed=2).update(values[5_000:]).to_dict())
+        merged = left.merge(right)
+        assert merged.count == 10_000
+        assert abs(merged.quantile(0.5) - 5_000) <= 0.02 * 10_000
+
+        stats = StatisticsCalculator.calculate_advanced_stats(values, sketch=merged)
+        assert abs(stats["q1"] - 2_500) <= 0.02 * 10_000
+        assert stats["mean"] == 4_999.5
+        streamed = StatisticsCalculator.calculate_streaming_stats(
+            np.array_split(values, 7), advanced=True, approximate=True
+        )
+        assert abs(streamed["median"] - 5_000) <= 0.02 * 10_000 and "q3" in streamed
+        print("✓ Sketch merge, serialization and approximate mode")
+
+    def test_large_update_in_blocks(self):
+        """One large update is absorbed block by block with the same bound"""
+        import numpy as np
+        from quantile_sketch import KLLSketch
+
+        values = np.random.default_rng(4).normal(50, 15, 500_000)
+        sketch = KLLSketch.for_error(0.01, seed=3).update(values)
+        again = KLLSketch.for_error(0.01, seed=3).update(values)
+
+        probs = np.linspace(0.05, 0.95, 19)
+        ranks = np.searchsorted(np.sort(values), sketch.quantiles(probs)) / values.size
+        assert np.max(np.abs(ranks - probs)) <= 0.01
+        assert sketch.count == values.size and sketch.retained < 2_000
+        assert sum(level.size << h for h, level in enumerate(sketch.levels)) == values.size
+        assert sketch.to_dict() == again.to_dict()
+        print("✓ Large updates absorbed in bounded blocks")
+
+
+class TestBatchStats:
+    """Per-variable bundle used by the batch endpoint"""
+
+    def test_numeric_and_qualitative_columns(self):
+        """Numeric columns get advanced stats; every column gets frequencies"""
+        results = StatisticsCalculator.calculate_batch({
+            "edad": [13, 14, None, 15, 14],
+            "provincia": ["Salta", "Jujuy", "Salta", None],
+        })
+
+        edad = results["edad"]
+        assert edad["numeric"] is True
+        assert edad["statistics"]["count"] == 4
+        assert edad["statistics"]["mean"] == 14
+        assert "iqr" in edad["statistics"]
+        assert edad["frequency"]["values"] == [13, 14, 15]
+        assert edad["frequency"]["absolute"] == [1, 2, 1]
+        assert edad["frequency"]["missing"] == 1
+
+        provincia = results["provincia"]
+        assert provincia["numeric"] is False and "statistics" not in provincia
+        assert dict(zip(provincia["frequency"]["values"], provincia["frequency"]["absolute"])) == {"Salta": 2, "Jujuy": 1}
+        print("✓ Batch statistics per variable")
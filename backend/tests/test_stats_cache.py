@@ -0,0 +1,90 @@
+"""
+Unit tests for the content-addressed statistics cache
+"""
+import asyncio
+
+import pytest
+
+from stats_cache import StatsCache, content_key
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestContentKey:
+    """Keys depend on the values, the kind and the parameters"""
+
+    def test_key_inputs(self):
+        """Same input gives the same key; any change gives a new one"""
+        base = content_key("basic", [1.0, 2.0, 3.0], numeric=True)
+        assert base == content_key("basic", [1, 2, 3], numeric=True)
+        assert base != content_key("basic", [1.0, 2.0, 4.0], numeric=True)
+        assert base != content_key("advanced", [1.0, 2.0, 3.0], numeric=True)
+        assert base != content_key("basic", [1.0, 2.0, 3.0], {"approximate": True}, numeric=True)
+        assert content_key("frequency", ["1", "2"]) != content_key("frequency", [1, 2])
+        print("✓ Content keys")
+
+
+class TestStatsCache:
+    """Memory tier, Mongo tier and duplicate suppression"""
+
+    def test_tiers_and_counters(self):
+        """A miss fills both tiers; a new process is served from Mongo"""
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            cache = StatsCache(db, max_entries=2)
+            key = content_key("basic", [1, 2, 3], numeric=True)
+
+            assert await cache.get(key) is None
+            await cache.put(key, "basic", {"mean": 2.0})
+            assert await cache.get(key) == {"mean": 2.0}
+
+            fresh = StatsCache(db)
+            assert await fresh.get(key) == {"mean": 2.0}
+            return cache.metrics(), fresh.metrics()
+
+        first, second = _run(scenario())
+        assert (first["misses"], first["memoryHits"]) == (1, 1)
+        assert second["storeHits"] == 1
+        print("✓ Two-tier lookups")
+
+    def test_record_once(self):
+        """Identical rows are written once per project and variable"""
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            cache = StatsCache(db)
+            written = []
+            for project in ("p1", "p1", "p2"):
+                written.append(await cache.record_once(
+                    db.statistics, project, "edad", "k", lambda: {"projectId": project, "variableName": "edad"}
+                ))
+            # A second process finds the existing row in Mongo
+            written.append(await StatsCache(db).record_once(
+                db.statistics, "p1", "edad", "k", lambda: {"projectId": "p1", "variableName": "edad"}
+            ))
+            return written, await db.statistics.count_documents({})
+
+        written, rows = _run(scenario())
+        assert written == [True, False, True, False]
+        assert rows == 2
+        print("✓ No duplicate statistics rows")
+
+    def test_record_after_external_delete(self):
+        """Rows deleted by another process are written again on the next request"""
+        async def scenario():
+            db = mongomock_motor.AsyncMongoMockClient()["t"]
+            cache = StatsCache(db)
+            row = ("p1", "edad", "k", lambda: {"projectId": "p1", "variableName": "edad"})
+            first = await cache.record_many(db.statistics, [row, row])
+            # Cascade delete run by another worker
+            await db.statistics.delete_many({"projectId": "p1"})
+            again = await cache.record_once(db.statistics, *row)
+            return first, again, await db.statistics.count_documents({}), cache.metrics()
+
+        first, again, rows, metrics = _run(scenario())
+        assert (first, again, rows) == (1, True, 1)
+        assert metrics["duplicateWritesSkipped"] == 1
+        print("✓ Rows re-recorded after an external delete")